@@ -1,38 +1,165 @@
 
-from fastapi import FastAPI, HTTPException
-import os
+import json
+import time
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from backend.rag_pipeline import RAGPipeline
+from backend import config
+from backend.query_keys import request_key
+from backend.singleflight import SingleFlight, StreamFlights
 import logging
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
-app = FastAPI()
 
-# Initialize the RAG pipeline
-rag_pipeline = RAGPipeline()
+# Shared async Gemini client: pooled keep-alive connections + cached OAuth token
+# (created on first use, like the pipeline below, to keep this module's import light)
+_gemini = None
+
+def get_gemini():
+    global _gemini
+    if _gemini is None:
+        from backend.generator.gemini_client import GeminiClient
+        _gemini = GeminiClient()
+    return _gemini
+
+# In-flight de-duplication of identical queries (see singleflight.py)
+query_flights = SingleFlight("api_query")
+stream_flights = StreamFlights("api_query_stream")
+
+# The RAG pipeline (LangChain, FAISS, genai imports + index open) is loaded in the
+# background after startup so the worker accepts connections immediately
+_pipeline_task = None
+
+# The stock screener is shared with the pipeline but does not wait for it to load
+_screener = None
+_screener_lock = threading.Lock()
+
+def get_screener():
+    """The shared Screener over the price store, loaded on first use (blocking)."""
+    global _screener
+    with _screener_lock:
+        if _screener is None:
+            from backend.retriever.screener import Screener
+            _screener = Screener()
+        return _screener
+
+def _load_pipeline():
+    from backend.rag_pipeline import RAGPipeline
+    pipeline = RAGPipeline(screener=get_screener())
+    pipeline.warm_up()
+    return pipeline
+
+def start_pipeline_warmup():
+    global _pipeline_task
+    if _pipeline_task is None:
+        _pipeline_task = asyncio.ensure_future(run_in_threadpool(_load_pipeline))
+        _pipeline_task.add_done_callback(_log_warmup_result)
+    return _pipeline_task
+
+def _log_warmup_result(task):
+    if not task.cancelled() and task.exception() is not None:
+        logging.error(f"RAG pipeline failed to load: {task.exception()}")
+
+async def get_pipeline():
+    """The loaded RAGPipeline; waits for the background warm-up if it is still running."""
+    return await asyncio.shield(start_pipeline_warmup())
+
+@asynccontextmanager
+async def lifespan(app):
+    start_pipeline_warmup()
+    yield
+    if _pipeline_task.done() and not _pipeline_task.cancelled() and _pipeline_task.exception() is None:
+        _pipeline_task.result().close()
+    if _gemini is not None:
+        await _gemini.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
-class QueryRequest(BaseModel):
+@app.middleware("http")
+async def record_request_metrics(request, call_next):
+    from backend import metrics
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Route template rather than raw path, to keep label cardinality bounded
+        route = request.scope.get("route")
+        labels = {"method": request.method, "route": getattr(route, "path", "unmatched"), "status": status}
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, **labels)
+        metrics.REQUESTS.inc(**labels)
+
+class QueryFilters(BaseModel):
+    # Optional metadata filters for retrieval, e.g. tickers=["HDFC Bank"], date_from="2025-08-01"
+    tickers: Optional[List[str]] = None
+    sources: Optional[List[str]] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+
+    def filters(self):
+        return {"tickers": self.tickers, "sources": self.sources,
+                "date_from": self.date_from, "date_to": self.date_to}
+
+class QueryRequest(QueryFilters):
     query: str
 
+class BatchQueryRequest(QueryFilters):
+    queries: List[str]
+    # False: retrieval only (sources and chunks per query); True: also an answer per query
+    generate: bool = False
+
 class QueryResponse(BaseModel):
     answer: str
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: the RAG pipeline has finished loading and warming up."""
+    task = start_pipeline_warmup()
+    if not task.done():
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    if task.exception() is not None:
+        return JSONResponse(status_code=503, content={"status": "error", "detail": str(task.exception())})
+    store = task.result().store
+    status = {"status": "ready", "index_version": store.version}
+    if store.rejected:
+        # A newer version embedded with another model is published but not served
+        status["rejected_index_version"] = store.rejected
+    return status
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Stage latencies, request, cache and token counters in the Prometheus text format."""
+    from backend import metrics
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    rag_pipeline = await get_pipeline()
+    return rag_pipeline.cache_stats()
+
 # Endpoint to list available Gemini models
 @app.get("/api/models")
 async def list_gemini_models():
+    from backend.generator.gemini_client import GeminiAPIError
     try:
-        access_token = get_access_token()
-        url = "https://generativelanguage.googleapis.com/v1/models"
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json"
-        }
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            return {"error": response.text}
-        return response.json()
+        return await get_gemini().list_models()
+    except GeminiAPIError as e:
+        return {"error": e.text}
     except Exception as e:
         return {"error": str(e)}
 app.add_middleware(
@@ -43,51 +170,270 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Google Gemini OAuth2 setup
-from google.oauth2 import service_account
-import google.auth.transport.requests
-import requests
-
-# Path to your service account JSON file
-SERVICE_ACCOUNT_FILE = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "service-account.json")
-SCOPES = ["https://www.googleapis.com/auth/generative-language"]
-
-def get_access_token():
-    credentials = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=SCOPES
-    )
-    auth_req = google.auth.transport.requests.Request()
-    credentials.refresh(auth_req)
-    return credentials.token
-
 @app.post("/api/query", response_model=QueryResponse)
 async def handle_query(request: QueryRequest):
+    """
+    One answer, not streamed: screening questions from the screener, anything
+    else from Gemini over the chunks retrieved with ``filters`` (or the answer cache).
+    """
+    from backend.generator.gemini_client import GeminiAPIError
+    from backend.metrics import span, trace_request
+    from backend.retriever.screener import answer_question
+    filters = request.filters()
     try:
         logging.info(f"Received query: {request.query}")
-        # Get OAuth2 access token
-        access_token = get_access_token()
-        url = "https://generativelanguage.googleapis.com/v1/models/models/gemini-2.5-pro:generateContent"
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "contents": [
-                {"role": "user", "parts": [{"text": request.query}]}
-            ]
-        }
-        response = requests.post(url, headers=headers, json=payload)
-        if response.status_code != 200:
-            logging.error(f"Gemini API error: {response.text}")
-            logging.error(f"Full Gemini API response: {response.content}")
-            raise Exception(f"Gemini API error: {response.text}")
-        data = response.json()
-        # Parse Gemini's response
-        answer = data.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "No answer returned.")
+
+        async def generate():
+            with trace_request("api_query") as trace:
+                with span("screener"):
+                    screened = await run_in_threadpool(
+                        lambda: answer_question(get_screener(), request.query, filters.get("tickers")))
+                trace["screener"] = screened is not None
+                if screened is not None:
+                    return screened
+                rag_pipeline = await get_pipeline()
+                with span("retrieve"):
+                    chunks = await run_in_threadpool(rag_pipeline.retrieve_relevant_chunks, request.query,
+                                                     filters=filters)
+                try:
+                    answer, trace["cached"] = await generate_rag_answer(rag_pipeline, request.query, chunks)
+                except GeminiAPIError as e:
+                    logging.error(f"Gemini API error ({e.status_code}): {e.text}")
+                    raise
+                return answer
+
+        if config.SINGLE_FLIGHT:
+            # Identical questions (same normalised text and filters) arriving while this one is
+            # generating share its retrieval and Gemini call
+            answer = await query_flights.do(request_key(request.query, filters), generate)
+        else:
+            answer = await generate()
         logging.info(f"Generated answer: {answer}")
         return QueryResponse(answer=answer)
 
     except Exception as e:
         logging.error(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
-    
\ No newline at end of file
+    
+
+@app.get("/api/screener")
+async def screen_stocks(where: Optional[List[str]] = Query(None), sort: Optional[str] = "Perf",
+                        order: str = Query("desc", pattern="^(asc|desc)$"), limit: int = Query(10, ge=1, le=1000),
+                        tickers: Optional[List[str]] = Query(None), q: Optional[str] = None):
+    """
+    Filters, sorts and cuts the latest row of every stored ticker, e.g.
+    /api/screener?where=Close<1000&where=RSI_14>50&sort=Perf&limit=10, or
+    from a question: /api/screener?q=10 stocks performing well below 1000
+    """
+    from backend.retriever.retriever import resolve_ticker
+    from backend.retriever.screener import parse_condition, parse_query
+    from backend.metrics import span
+    # Loading (and the periodic check for new parts) touches disk; the screen itself is in memory
+    screener = await run_in_threadpool(get_screener)
+    await run_in_threadpool(screener.refresh)
+    try:
+        if q is not None:
+            screen_query = parse_query(q)
+            if screen_query is None:
+                raise ValueError(f"Not a screening question: {q!r}")
+        else:
+            screen_query = {"conditions": [parse_condition(c) for c in where or []], "sort": sort,
+                            "descending": order == "desc", "limit": limit}
+        if tickers:
+            screen_query["tickers"] = [resolve_ticker(t) or t for t in tickers]
+        with span("screener"):
+            start = time.perf_counter()
+            rows = screener.screen(**screen_query)
+            elapsed = time.perf_counter() - start
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"query": screen_query, "count": len(rows), "tickers_screened": len(screener),
+            "elapsed_us": round(elapsed * 1e6, 1), "rows": rows}
+
+def chunk_sources(chunks):
+    """Distinct sources of the retrieved chunks, in retrieval order."""
+    sources, seen = [], set()
+    for chunk in chunks:
+        if chunk["source"] not in seen:
+            seen.add(chunk["source"])
+            sources.append({"title": chunk["title"], "source": chunk["source"]})
+    return sources
+
+async def generate_rag_answer(rag_pipeline, query, chunks):
+    """Answer to one query over its retrieved chunks (answer cache, then Gemini). Returns (answer, cached)."""
+    from backend.rag_pipeline import NO_CONTEXT_ANSWER
+    from backend.generator.gemini_client import extract_text
+    from backend.metrics import span
+    if not chunks:
+        return NO_CONTEXT_ANSWER, False
+    cached, cache_key = await run_in_threadpool(rag_pipeline.lookup_cached_answer, query, chunks)
+    if cached is not None:
+        return cached, True
+    payload = {"contents": [{"role": "user", "parts": [{"text": rag_pipeline.build_prompt(query, chunks)}]}]}
+    with span("llm_generate"):
+        data = await get_gemini().generate_content(payload)
+    answer = extract_text(data)
+    rag_pipeline.store_answer(cache_key, answer)
+    return answer, False
+
+@app.post("/api/query/batch")
+async def batch_query(request: BatchQueryRequest):
+    """
+    Several questions in one request (e.g. one per ticker on a dashboard
+    page). Repeated questions are answered once; the rest are embedded in one
+    batched call and searched with one multi-row FAISS search, and with
+    ``generate`` their answers are generated concurrently. Results come back
+    per query, in order.
+    """
+    if len(request.queries) > config.BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {config.BATCH_MAX_QUERIES} queries per batch")
+    from backend import metrics
+    from backend.metrics import span, trace_request
+    from backend.retriever.screener import answer_question
+    filters = request.filters()
+    keys = [request_key(query, filters) for query in request.queries]
+    distinct = {}
+    for key, query in zip(keys, request.queries):
+        distinct.setdefault(key, query)
+
+    with trace_request("api_query_batch", queries=len(keys), distinct=len(distinct)):
+        results = {}
+        with span("screener"):
+            screened = await run_in_threadpool(
+                lambda: {key: answer_question(get_screener(), query, filters.get("tickers"))
+                         for key, query in distinct.items()})
+        for key, answer in screened.items():
+            if answer is not None:
+                results[key] = {"query": distinct[key], "sources": [], "answer": answer, "screener": True}
+        rest = [key for key in distinct if key not in results]
+
+        if rest:
+            rag_pipeline = await get_pipeline()
+            with span("retrieve"):
+                retrieved = await run_in_threadpool(rag_pipeline.retrieve_many, [distinct[key] for key in rest],
+                                                    filters=filters)
+            for key, chunks in zip(rest, retrieved):
+                results[key] = {"query": distinct[key], "sources": chunk_sources(chunks)}
+                if not request.generate:
+                    results[key]["chunks"] = [{"title": c["title"], "source": c["source"], "content": c["content"]}
+                                              for c in chunks]
+
+            if request.generate:
+                limit = asyncio.Semaphore(config.BATCH_GENERATE_CONCURRENCY)
+
+                async def answer(key, chunks):
+                    async with limit:
+                        try:
+                            results[key]["answer"], results[key]["cached"] = await generate_rag_answer(
+                                rag_pipeline, distinct[key], chunks)
+                        except Exception as e:
+                            # One failed answer does not fail the rest of the batch
+                            metrics.STAGE_ERRORS.inc(stage="api_query_batch")
+                            logging.error(f"Error generating answer for {distinct[key]!r}: {e}")
+                            results[key]["error"] = str(e)
+
+                await asyncio.gather(*(answer(key, chunks) for key, chunks in zip(rest, retrieved)))
+
+    return {"results": [results[key] for key in keys]}
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def rag_answer_events(query, filters=None):
+    """
+    Server-sent events for one RAG answer: a ``sources`` event as soon as
+    retrieval finishes, then ``token`` events as Gemini generates, then ``done``
+    (or ``error``).
+    """
+    from backend import metrics
+    from backend.metrics import observe_stage, span, trace_request
+    with trace_request("api_query_stream") as trace:
+        try:
+            from backend.retriever.screener import answer_question
+            # Screening questions are answered from the price store, without retrieval or Gemini
+            with span("screener"):
+                screened = await run_in_threadpool(
+                    lambda: answer_question(get_screener(), query, (filters or {}).get("tickers")))
+            trace["screener"] = screened is not None
+            if screened is not None:
+                yield sse_event("sources", [])
+                yield sse_event("token", {"text": screened})
+                yield sse_event("done", {"cached": False, "screener": True})
+                return
+
+            from backend.rag_pipeline import NO_CONTEXT_ANSWER
+            rag_pipeline = await get_pipeline()
+            # Retrieval (embedding + FAISS) is blocking; keep it off the event loop
+            with span("retrieve"):
+                chunks = await run_in_threadpool(rag_pipeline.retrieve_relevant_chunks, query, filters=filters)
+            yield sse_event("sources", chunk_sources(chunks))
+
+            if not chunks:
+                yield sse_event("token", {"text": NO_CONTEXT_ANSWER})
+                yield sse_event("done", {"cached": False})
+                return
+
+            with span("answer_cache_lookup"):
+                cached, cache_key = await run_in_threadpool(rag_pipeline.lookup_cached_answer, query, chunks)
+            trace["cached"] = cached is not None
+            if cached is not None:
+                yield sse_event("token", {"text": cached})
+                yield sse_event("done", {"cached": True})
+                return
+
+            with span("build_prompt"):
+                payload = {
+                    "contents": [
+                        {"role": "user", "parts": [{"text": rag_pipeline.build_prompt(query, chunks)}]}
+                    ]
+                }
+            parts = []
+            # Only time spent waiting on Gemini is counted, not on the client reading the stream
+            llm_seconds = 0.0
+            stream = get_gemini().stream_generate_content(payload)
+            while True:
+                wait_start = time.perf_counter()
+                try:
+                    text = await stream.__anext__()
+                except StopAsyncIteration:
+                    llm_seconds += time.perf_counter() - wait_start
+                    break
+                llm_seconds += time.perf_counter() - wait_start
+                if not parts:
+                    observe_stage("llm_time_to_first_token", llm_seconds)
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+            observe_stage("llm_generate", llm_seconds)
+            rag_pipeline.store_answer(cache_key, "".join(parts))
+            yield sse_event("done", {"cached": False})
+
+        except Exception as e:
+            metrics.STAGE_ERRORS.inc(stage="api_query_stream")
+            logging.error(f"Error while streaming answer: {str(e)}")
+            yield sse_event("error", {"detail": str(e)})
+
+def _sse_response(query, filters=None):
+    logging.info(f"Received streaming query: {query}")
+    if config.SINGLE_FLIGHT:
+        # Identical in-flight questions (same normalised text and filters) share one retrieval and Gemini stream
+        key = request_key(query, filters)
+        events = stream_flights.subscribe(key, lambda: rag_answer_events(query, filters))
+    else:
+        events = rag_answer_events(query, filters)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/api/query/stream")
+async def stream_query(request: QueryRequest):
+    return _sse_response(request.query, request.filters())
+
+# GET variant so browsers can consume the stream with EventSource
+@app.get("/api/query/stream")
+async def stream_query_get(query: str, tickers: Optional[List[str]] = Query(None),
+                           sources: Optional[List[str]] = Query(None),
+                           date_from: Optional[str] = None, date_to: Optional[str] = None):
+    filters = {"tickers": tickers, "sources": sources, "date_from": date_from, "date_to": date_to}
+    return _sse_response(query, filters)
@@ -0,0 +1,173 @@
+# benchmarks/ann_benchmark.py
+"""
+Recall / latency / size trade-off of the ANN index types.
+
+Every index type is built from the same vectors (the live vectors of a vector
+store, or a synthetic clustered set) and queried with held-out vectors. Recall@k
+is measured against exact flat search. Each search knob value (IVF nprobe,
+HNSW efSearch) is reported as its own operating point.
+
+    python backend/benchmarks/ann_benchmark.py --types flat,hnsw,ivf,ivf_pq --output ann.json
+    python backend/benchmarks/ann_benchmark.py --synthetic 200000 --dim 768
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import faiss
+import numpy as np
+
+from backend import config
+from backend.retriever.ann_index import (
+    INDEX_TYPES, base_index, build_index, factory_string, index_bytes, reconstruct_rows, search_parameters, stored_ids,
+    training_sample,
+)
+from backend.retriever.vector_store import CHUNKS_FILE, DELETED, current_store_dir, read_shards
+
+
+def store_vectors(vector_store_path):
+    """Live vectors of a vector store, read back from its index shards."""
+    store_dir = current_store_dir(vector_store_path)
+    chunks = np.load(os.path.join(store_dir, CHUNKS_FILE))
+    rows, vectors = [], []
+    for shard in read_shards(store_dir, mmap=False):
+        shard_rows = stored_ids(shard.index)
+        shard_rows = shard_rows[chunks["article"][shard_rows] != DELETED]
+        if len(shard_rows):
+            rows.append(shard_rows)
+            vectors.append(reconstruct_rows(shard.index, shard_rows))
+    # In row order, as read from an unsharded index
+    order = np.argsort(np.concatenate(rows))
+    return np.ascontiguousarray(np.concatenate(vectors)[order], dtype=np.float32)
+
+
+def synthetic_vectors(n, dim, n_clusters=None, seed=0):
+    """Unit vectors drawn around random centres, a rough stand-in for topic-clustered news embeddings."""
+    rng = np.random.default_rng(seed)
+    n_clusters = n_clusters or max(1, int(np.sqrt(n)))
+    centres = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, n_clusters, n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def knob_values(index, nprobes, ef_searches):
+    inner = base_index(index)
+    if isinstance(inner, faiss.IndexIVF):
+        return [{"nprobe": n} for n in nprobes if n <= inner.nlist] or [{"nprobe": inner.nlist}]
+    if isinstance(inner, faiss.IndexHNSW):
+        return [{"ef_search": ef} for ef in ef_searches]
+    return [{}]
+
+
+def timed_search(index, queries, k, **knobs):
+    """Searches one query at a time, as the API does; returns (labels, per-query latencies in ms)."""
+    params = search_parameters(index, **knobs)
+    labels = np.empty((len(queries), k), dtype=np.int64)
+    latencies = np.empty(len(queries))
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, found = index.search(query.reshape(1, -1), k, params=params)
+        latencies[i] = (time.perf_counter() - start) * 1000
+        labels[i] = found[0]
+    return labels, latencies
+
+
+def recall_at_k(labels, truth):
+    k = truth.shape[1]
+    return float(np.mean([len(set(found) & set(exact)) / k for found, exact in zip(labels, truth)]))
+
+
+def run(vectors, index_types, k=10, n_queries=200, nprobes=(1, 4, 16, 64), ef_searches=(16, 64, 256), seed=0):
+    """Benchmarks each index type; returns one result dict per (index type, knob value)."""
+    rng = np.random.default_rng(seed)
+    n_queries = min(n_queries, len(vectors) // 10 or 1)
+    held_out = rng.choice(len(vectors), n_queries, replace=False)
+    is_query = np.zeros(len(vectors), dtype=bool)
+    is_query[held_out] = True
+    queries, corpus = vectors[is_query], vectors[~is_query]
+    ids = np.arange(len(corpus), dtype=np.int64)
+    dim = corpus.shape[1]
+
+    exact = faiss.IndexFlatL2(dim)
+    exact.add(corpus)
+    _, truth = exact.search(queries, k)
+
+    results = []
+    for index_type in index_types:
+        start = time.perf_counter()
+        index = build_index(dim, index_type, corpus)
+        train_s = time.perf_counter() - start
+        index.add_with_ids(corpus, ids)
+        build_s = time.perf_counter() - start
+        size = index_bytes(index)
+        for knobs in knob_values(index, nprobes, ef_searches):
+            labels, latencies = timed_search(index, queries, k, **knobs)
+            result = {
+                "index_type": index_type,
+                "factory": factory_string(index_type, dim, len(training_sample(corpus))),
+                **knobs,
+                "n_vectors": len(corpus),
+                "dim": dim,
+                "k": k,
+                f"recall_at_{k}": round(recall_at_k(labels, truth), 4),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+                "p99_ms": round(float(np.percentile(latencies, 99)), 4),
+                "index_bytes": size,
+                "bytes_per_vector": round(size / len(corpus), 1),
+                "train_s": round(train_s, 3),
+                "build_s": round(build_s, 3),
+            }
+            results.append(result)
+            knob = ", ".join(f"{name}={value}" for name, value in knobs.items())
+            print(f"  {index_type:<9} {knob:<15} recall@{k}={result[f'recall_at_{k}']:.3f}  "
+                  f"p50={result['p50_ms']:.3f}ms  p99={result['p99_ms']:.3f}ms  "
+                  f"{result['bytes_per_vector']:.0f} B/vector  build={result['build_s']:.2f}s")
+    return results
+
+
+def _ints(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall@k vs. latency vs. size of the ANN index types")
+    parser.add_argument("--store", default=config.VECTOR_STORE_DIR, help="vector store to take vectors from")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="benchmark this many synthetic vectors instead of a vector store")
+    parser.add_argument("--dim", type=int, default=768, help="dimension of synthetic vectors")
+    parser.add_argument("--types", default=",".join(INDEX_TYPES),
+                        help="comma-separated index types or faiss factory strings (separate with ';' then)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nprobe", default="1,4,16,64", help="IVF nprobe values to sweep")
+    parser.add_argument("--ef-search", default="16,64,256", help="HNSW efSearch values to sweep")
+    parser.add_argument("--output", default=None, help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        print(f"🧪 Generating {args.synthetic} synthetic {args.dim}-d vectors...")
+        vectors = synthetic_vectors(args.synthetic, args.dim)
+        source = f"synthetic:{args.synthetic}x{args.dim}"
+    else:
+        print(f"📂 Reading vectors from {args.store}...")
+        vectors = store_vectors(args.store)
+        source = args.store
+    index_types = args.types.split(";") if ";" in args.types else args.types.split(",")
+
+    print(f"⏱️  Benchmarking {len(index_types)} index types on {len(vectors)} vectors (k={args.k})")
+    results = run(vectors, index_types, k=args.k, n_queries=args.queries,
+                  nprobes=_ints(args.nprobe), ef_searches=_ints(args.ef_search))
+
+    report = {"source": source, "faiss_version": faiss.__version__, "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
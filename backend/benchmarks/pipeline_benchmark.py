@@ -0,0 +1,256 @@
+# benchmarks/pipeline_benchmark.py
+"""
+Offline end-to-end benchmark of the RAG pipeline; needs no network or API key.
+
+1. scales data/cleaned_news to ~N chunks (synthetic_corpus.py)
+2. embeds it with the deterministic hashing embedder and builds the vector store
+3. times retrieve_relevant_chunks (cold and warm query cache)
+4. times generate_answer with a stub LLM, i.e. the pipeline's own overhead
+5. records peak RSS after every stage
+6. opens the store in a fresh process, i.e. what every extra server worker
+   pays in private memory and start-up time on top of its imports
+
+Results are written as JSON so runs can be compared across commits:
+
+    python backend/benchmarks/pipeline_benchmark.py --chunks 10000 --output bench.json
+    python backend/benchmarks/pipeline_benchmark.py --chunks 1000000 --index-type ivf --queries 500
+"""
+import os
+import sys
+import json
+import time
+import datetime
+import shutil
+import logging
+import platform
+import argparse
+import resource
+import tempfile
+import importlib
+import subprocess
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import numpy as np
+
+from backend.benchmarks.synthetic_corpus import SOURCE_DIR, generate
+from backend.ingestion.stock_fetcher import STOCKS
+
+QUERY_TEMPLATES = (
+    "What is the latest news about {name}?",
+    "How did {name} shares perform this week?",
+    "Market sentiment around {name} based on recent news",
+    "{name} quarterly results and outlook",
+    "Why is {name} stock falling?",
+    "Analyst views on {name} after the results",
+    "{name} dividend and buyback announcements",
+    "Is {name} a good long term investment?",
+)
+TOPICS = ("", " and the banking sector", " compared with the Nifty", " amid FII selling", " given crude oil prices")
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubLLM:
+    """Stands in for the Gemini model: returns a fixed answer after ``latency`` seconds."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return StubResponse(f"Stub answer over a {len(prompt)}-character prompt.")
+
+
+def benchmark_queries(n):
+    queries = []
+    for topic in TOPICS:
+        for template in QUERY_TEMPLATES:
+            for name in STOCKS.values():
+                queries.append(template.format(name=name) + topic)
+    return [queries[i % len(queries)] + ("" if i < len(queries) else f" ({i // len(queries)})") for i in range(n)]
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def private_rss_mb():
+    """Resident memory not backed by files (heap), i.e. not shared with other processes; None off Linux."""
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+WORKER_PROBE = """
+import sys, time, json
+from backend.retriever.vector_store import VectorStore
+from backend.benchmarks.pipeline_benchmark import private_rss_mb
+before = private_rss_mb()
+start = time.perf_counter()
+VectorStore(sys.argv[1]).warm_up()
+after = private_rss_mb()
+print(json.dumps({"open_ms": round((time.perf_counter() - start) * 1000, 3),
+                  "private_mb": None if before is None else round(after - before, 1)}))
+"""
+
+
+def measure_worker_open(store_dir):
+    """Opens and warms up the store in a new interpreter, as one more uvicorn worker would."""
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    result = subprocess.run([sys.executable, "-c", WORKER_PROBE, store_dir], capture_output=True, text=True,
+                            env=env, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def latency_summary(latencies_ms):
+    latencies = np.asarray(latencies_ms)
+    return {
+        "count": int(len(latencies)),
+        "mean_ms": round(float(latencies.mean()), 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p90_ms": round(float(np.percentile(latencies, 90)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "max_ms": round(float(latencies.max()), 3),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(chunks, workdir, n_queries=200, k=None, index_type="flat", llm_latency=0.0, source_dir=SOURCE_DIR, days=30):
+    corpus_dir = os.path.join(workdir, "cleaned_news")
+    store_dir = os.path.join(workdir, "vector_store")
+    # backend.config reads these at import, so they must be set before the pipeline modules load
+    os.environ.update({
+        "FINRAG_CLEANED_NEWS_DIR": corpus_dir,
+        "FINRAG_VECTOR_STORE_DIR": store_dir,
+        "FINRAG_EMBEDDING_BACKEND": "hashing",
+        "FINRAG_INDEX_TYPE": index_type,
+        "FINRAG_QUERY_CACHE_PATH": "",
+    })
+    # Already imported (via stock_fetcher) by the time run() is called: re-read the environment
+    from backend import config
+    importlib.reload(config)
+    report = {"memory": {}}
+
+    print(f"🧪 Generating ~{chunks} chunks of synthetic news in {corpus_dir}...")
+    (n_articles, n_chunks), elapsed = timed(generate, chunks, corpus_dir, source_dir, days)
+    report["corpus"] = {"articles": n_articles, "estimated_chunks": n_chunks, "generate_s": round(elapsed / 1000, 3)}
+    report["memory"]["after_corpus_mb"] = peak_rss_mb()
+
+    from backend.retriever import embedder
+    from backend.retriever.embeddings import get_embeddings
+
+    print("🧮 Embedding and indexing...")
+    summary, elapsed = timed(embedder.embed)
+    summary["total_s"] = round(elapsed / 1000, 3)
+    summary["chunks_per_s"] = round(summary["chunks"] / (elapsed / 1000), 1)
+    report["embed"] = summary
+    report["memory"]["after_embed_mb"] = peak_rss_mb()
+
+    from backend.rag_pipeline import RAGPipeline
+    from backend.generator.answer_cache import SemanticAnswerCache
+    # The pipeline logs every retrieved chunk at INFO, which would dominate the timings
+    logging.getLogger().setLevel(logging.WARNING)
+
+    k = k or config.RETRIEVAL_K
+    llm = StubLLM(llm_latency)
+    pipeline, load_ms = timed(RAGPipeline, store_dir, embeddings=get_embeddings("hashing"), llm=llm)
+    _, warm_up_ms = timed(pipeline.warm_up)
+    report["load"] = {"open_ms": round(load_ms, 3), "warm_up_ms": round(warm_up_ms, 3)}
+
+    queries = benchmark_queries(n_queries)
+    print(f"🔍 Timing retrieval for {len(queries)} queries (k={k})...")
+    cold = [timed(pipeline.retrieve_relevant_chunks, q, k)[1] for q in queries]
+    warm = [timed(pipeline.retrieve_relevant_chunks, q, k)[1] for q in queries]
+    # A date window only searches the index shards it overlaps
+    last_week = {"date_from": (datetime.date.today() - datetime.timedelta(days=6)).isoformat()}
+    windowed = [timed(pipeline.retrieve_relevant_chunks, q, k, last_week)[1] for q in queries]
+    report["retrieval"] = {"k": k, "cold_query_cache": latency_summary(cold), "warm_query_cache": latency_summary(warm),
+                           "last_7_days": latency_summary(windowed)}
+    report["memory"]["after_retrieval_mb"] = peak_rss_mb()
+
+    print("💬 Timing generate_answer with the stub LLM...")
+    pipeline.answer_cache = SemanticAnswerCache(ttl=0)  # every call goes through retrieval + prompt + "model"
+    generate_ms = [timed(pipeline.generate_answer, q)[1] - llm_latency * 1000 for q in queries]
+    overhead_ms = [g - r for g, r in zip(generate_ms, warm)]
+    report["generate"] = {
+        "stub_llm_latency_s": llm_latency,
+        "excluding_model": latency_summary(generate_ms),
+        # Everything generate_answer adds on top of retrieval (prompt building, cache lookups)
+        "overhead_over_retrieval_p50_ms": round(float(np.percentile(overhead_ms, 50)), 3),
+        "llm_calls": llm.calls,
+    }
+    report["memory"]["peak_rss_mb"] = peak_rss_mb()
+
+    print("🧵 Opening the store in a fresh process...")
+    report["worker"] = measure_worker_open(store_dir)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark of embedding, indexing, retrieval and generation")
+    parser.add_argument("--chunks", type=int, default=10000, help="approximate corpus size in chunks")
+    parser.add_argument("--queries", type=int, default=200, help="number of distinct benchmark queries")
+    parser.add_argument("--k", type=int, default=None, help="chunks retrieved per query (default: FINRAG_RETRIEVAL_K)")
+    parser.add_argument("--index-type", default="flat", help="ANN index type (see retriever/ann_index.py)")
+    parser.add_argument("--llm-latency", type=float, default=0.0,
+                        help="seconds the stub LLM sleeps per call (subtracted from the reported times)")
+    parser.add_argument("--days", type=int, default=30, help="spread the synthetic articles over this many days")
+    parser.add_argument("--source", default=SOURCE_DIR, help="cleaned news to scale up")
+    parser.add_argument("--workdir", default=None, help="where to put the corpus and store (default: a temp dir)")
+    parser.add_argument("--keep", action="store_true", help="keep the working directory afterwards")
+    parser.add_argument("--output", default=None, help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="finrag_bench_")
+    try:
+        results = run(args.chunks, workdir, args.queries, args.k, args.index_type, args.llm_latency, args.source,
+                      args.days)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    import faiss
+    report = {
+        "benchmark": "pipeline",
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "params": {key: value for key, value in vars(args).items() if key not in ("output", "keep", "workdir")},
+        "environment": {"python": platform.python_version(), "numpy": np.__version__,
+                        "faiss": faiss.__version__, "cpus": os.cpu_count()},
+        **results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
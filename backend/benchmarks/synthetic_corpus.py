@@ -0,0 +1,116 @@
+# benchmarks/synthetic_corpus.py
+"""
+Scales the cleaned news corpus up to a target number of chunks for benchmarks.
+
+Synthetic articles are variations of the real ones (sentences reordered,
+companies swapped, figures perturbed), with unique URLs and spread over daily
+files like the scraper's, so they go through the embedder unchanged:
+
+    python backend/benchmarks/synthetic_corpus.py --chunks 100000 --output /tmp/finrag_corpus
+"""
+import os
+import re
+import sys
+import json
+import math
+import random
+import argparse
+import datetime
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.ingestion.jsonl import iter_news_files, read_articles
+from backend.ingestion.stock_fetcher import STOCKS
+
+# Default source corpus: the repo's cleaned news (read directly so FINRAG_CLEANED_NEWS_DIR can point elsewhere)
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "cleaned_news")
+# The embedder splits into 512-character chunks with 64 characters of overlap
+CHUNK_STRIDE = 512 - 64
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_COMPANY_RE = re.compile(r"\b(" + "|".join(re.escape(name) for name in STOCKS.values()) + r")\b")
+
+
+def load_articles(source_dir=SOURCE_DIR):
+    return [article for path in iter_news_files(source_dir) for article in read_articles(path)
+            if article.get("cleaned_text") or article.get("text")]
+
+
+def estimate_chunks(text):
+    return max(1, math.ceil(len(text) / CHUNK_STRIDE))
+
+
+def _perturb_number(match, rng):
+    value = match.group(0)
+    if "." in value:
+        decimals = len(value.split(".")[1])
+        return f"{float(value) * rng.uniform(0.8, 1.2):.{decimals}f}"
+    return str(max(0, round(int(value) * rng.uniform(0.8, 1.2))))
+
+
+def synthesize(article, i, rng, date):
+    """One synthetic variation of ``article``."""
+    text = article.get("cleaned_text") or article.get("text")
+    names = list(STOCKS.values())
+    swap = dict(zip(names, rng.sample(names, len(names))))
+
+    def rewrite(s):
+        s = _COMPANY_RE.sub(lambda m: swap[m.group(1)], s)
+        return _NUMBER_RE.sub(lambda m: _perturb_number(m, rng), s)
+
+    paragraphs = []
+    for paragraph in text.split("\n"):
+        sentences = _SENTENCE_RE.split(paragraph)
+        if len(sentences) > 2:
+            middle = sentences[1:-1]
+            rng.shuffle(middle)
+            sentences = [sentences[0]] + middle + [sentences[-1]]
+        paragraphs.append(rewrite(" ".join(sentences)))
+    return {
+        "title": rewrite(article.get("title", "")),
+        "url": f"https://synthetic.finrag.local/{date}/{i}",
+        "source": "synthetic.finrag.local",
+        "published": date,
+        "cleaned_text": "\n".join(paragraphs),
+    }
+
+
+def generate(target_chunks, output_dir, source_dir=SOURCE_DIR, days=30, seed=0):
+    """
+    Writes synthetic articles totalling ~``target_chunks`` chunks to
+    ``output_dir`` as news_<date>_cleaned.jsonl files. Returns (articles, chunks).
+    """
+    rng = random.Random(seed)
+    base = load_articles(source_dir)
+    if not base:
+        raise ValueError(f"No articles to scale up in {source_dir}")
+    os.makedirs(output_dir, exist_ok=True)
+    start = datetime.date.today() - datetime.timedelta(days=days - 1)
+    by_day = {}
+    n_chunks = 0
+    i = 0
+    while n_chunks < target_chunks:
+        date = (start + datetime.timedelta(days=i % days)).isoformat()
+        article = synthesize(base[i % len(base)], i, rng, date)
+        by_day.setdefault(date, []).append(article)
+        n_chunks += estimate_chunks(article["cleaned_text"])
+        i += 1
+    for date, articles in by_day.items():
+        with open(os.path.join(output_dir, f"news_{date}_cleaned.jsonl"), "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(article, ensure_ascii=False) + "\n" for article in articles)
+    return i, n_chunks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic news corpus of a given size")
+    parser.add_argument("--chunks", type=int, default=10000, help="approximate number of chunks to generate")
+    parser.add_argument("--output", required=True, help="directory for the daily JSON files")
+    parser.add_argument("--source", default=SOURCE_DIR, help="cleaned news to base the articles on")
+    parser.add_argument("--days", type=int, default=30, help="spread the articles over this many days")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    n_articles, n_chunks = generate(args.chunks, args.output, args.source, args.days, args.seed)
+    print(f"✅ Wrote {n_articles} articles (~{n_chunks} chunks) to {args.output}")
@@ -0,0 +1,150 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+# --- Paths (anchored to the backend package so scripts work from any cwd) ---
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BACKEND_DIR, "data")
+RAW_NEWS_DIR = os.getenv("FINRAG_RAW_NEWS_DIR", os.path.join(DATA_DIR, "raw_news"))
+CLEANED_NEWS_DIR = os.getenv("FINRAG_CLEANED_NEWS_DIR", os.path.join(DATA_DIR, "cleaned_news"))
+STOCK_DATA_DIR = os.getenv("FINRAG_STOCK_DATA_DIR", os.path.join(DATA_DIR, "stock_data"))
+# Daily prices + indicators of every ticker, as Parquet parts (ingestion/stock_fetcher.py)
+STOCK_STORE_DIR = os.getenv("FINRAG_STOCK_STORE_DIR", os.path.join(STOCK_DATA_DIR, "prices"))
+VECTOR_STORE_DIR = os.getenv("FINRAG_VECTOR_STORE_DIR", os.path.join(BACKEND_DIR, "embeddings", "vector_store"))
+
+# --- RSS scraper (ingestion/rss_scraper.py) ---
+# Feed validators (ETag / Last-Modified) and the seen-URL index
+SCRAPER_STATE_PATH = os.getenv("FINRAG_SCRAPER_STATE_PATH", os.path.join(DATA_DIR, "scraper_state.json"))
+SCRAPER_CONCURRENCY = int(os.getenv("FINRAG_SCRAPER_CONCURRENCY", "16"))
+# Concurrent requests to any one host, so a single site is never hammered
+SCRAPER_PER_HOST = int(os.getenv("FINRAG_SCRAPER_PER_HOST", "4"))
+SCRAPER_TIMEOUT = int(os.getenv("FINRAG_SCRAPER_TIMEOUT", "20"))
+# Seen URLs older than this are forgotten (feeds only list recent items)
+SCRAPER_SEEN_TTL_DAYS = int(os.getenv("FINRAG_SCRAPER_SEEN_TTL_DAYS", "90"))
+
+# --- Embeddings ---
+# "google" uses the Gemini embedding API, "hashing" is a deterministic offline embedder
+EMBEDDING_BACKEND = os.getenv("FINRAG_EMBEDDING_BACKEND", "google")
+EMBEDDING_MODEL = os.getenv("FINRAG_EMBEDDING_MODEL", "models/embedding-001")
+EMBEDDING_BATCH_SIZE = int(os.getenv("FINRAG_EMBEDDING_BATCH_SIZE", "100"))
+EMBEDDING_CONCURRENCY = int(os.getenv("FINRAG_EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("FINRAG_EMBEDDING_MAX_RETRIES", "6"))
+HASHING_EMBEDDING_DIM = int(os.getenv("FINRAG_HASHING_EMBEDDING_DIM", "768"))
+
+# --- Query embedding cache ---
+QUERY_CACHE_SIZE = int(os.getenv("FINRAG_QUERY_CACHE_SIZE", "1024"))
+# SQLite file for the second (on-disk) tier; empty disables it
+QUERY_CACHE_PATH = os.getenv("FINRAG_QUERY_CACHE_PATH", "")
+
+# --- Semantic answer cache ---
+# Cosine similarity between query embeddings above which a cached answer may be reused
+ANSWER_CACHE_THRESHOLD = float(os.getenv("FINRAG_ANSWER_CACHE_THRESHOLD", "0.95"))
+# Seconds a cached answer stays valid; 0 disables the cache
+ANSWER_CACHE_TTL = float(os.getenv("FINRAG_ANSWER_CACHE_TTL", "900"))
+ANSWER_CACHE_SIZE = int(os.getenv("FINRAG_ANSWER_CACHE_SIZE", "512"))
+
+# --- Request coalescing (singleflight.py) ---
+# Identical queries arriving while one is in flight attach to it instead of running their own
+SINGLE_FLIGHT = os.getenv("FINRAG_SINGLE_FLIGHT", "1").lower() not in ("0", "false", "no", "")
+
+# --- Gemini REST client (app.py) ---
+SERVICE_ACCOUNT_FILE = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "service-account.json")
+GEMINI_API_BASE = os.getenv("FINRAG_GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1")
+GEMINI_MODEL = os.getenv("FINRAG_GEMINI_MODEL", "gemini-2.5-pro")
+GEMINI_CONNECT_TIMEOUT = float(os.getenv("FINRAG_GEMINI_CONNECT_TIMEOUT", "5"))
+GEMINI_READ_TIMEOUT = float(os.getenv("FINRAG_GEMINI_READ_TIMEOUT", "120"))
+GEMINI_MAX_CONNECTIONS = int(os.getenv("FINRAG_GEMINI_MAX_CONNECTIONS", "100"))
+GEMINI_MAX_KEEPALIVE = int(os.getenv("FINRAG_GEMINI_MAX_KEEPALIVE", "20"))
+# Refresh the OAuth token this many seconds before it expires
+GEMINI_TOKEN_REFRESH_MARGIN = float(os.getenv("FINRAG_GEMINI_TOKEN_REFRESH_MARGIN", "300"))
+
+# --- Retrieval ---
+RETRIEVAL_K = int(os.getenv("FINRAG_RETRIEVAL_K", "8"))
+# Each of the dense and BM25 retrievers contributes this many candidates per requested chunk
+HYBRID_CANDIDATES_PER_K = int(os.getenv("FINRAG_HYBRID_CANDIDATES_PER_K", "3"))
+RRF_K = int(os.getenv("FINRAG_RRF_K", "60"))
+# Half-life in days of the recency decay applied to fused retrieval scores (newer articles rank higher); 0 disables it
+RECENCY_HALF_LIFE_DAYS = float(os.getenv("FINRAG_RECENCY_HALF_LIFE_DAYS", "0"))
+# Batch queries (/api/query/batch, RAGPipeline.retrieve_many / generate_many)
+BATCH_MAX_QUERIES = int(os.getenv("FINRAG_BATCH_MAX_QUERIES", "50"))
+# Answers generated concurrently for one batch
+BATCH_GENERATE_CONCURRENCY = int(os.getenv("FINRAG_BATCH_GENERATE_CONCURRENCY", "8"))
+
+# --- Vector index (see retriever/ann_index.py) ---
+# flat, sq8, sqfp16, hnsw, hnsw_sq8, ivf, ivf_sq8, ivf_pq, or a raw faiss.index_factory string
+INDEX_TYPE = os.getenv("FINRAG_INDEX_TYPE", "flat")
+# IVF cells; 0 picks ~4 * sqrt(n) for n training vectors
+INDEX_NLIST = int(os.getenv("FINRAG_INDEX_NLIST", "0"))
+# PQ sub-quantizers; 0 picks dim / 8 (8 bytes of code per 64 dims), fewer for small training sets
+INDEX_PQ_M = int(os.getenv("FINRAG_INDEX_PQ_M", "0"))
+INDEX_HNSW_M = int(os.getenv("FINRAG_INDEX_HNSW_M", "32"))
+# Search-time knobs: IVF cells probed per query, HNSW candidate list size
+INDEX_NPROBE = int(os.getenv("FINRAG_INDEX_NPROBE", "16"))
+INDEX_EF_SEARCH = int(os.getenv("FINRAG_INDEX_EF_SEARCH", "64"))
+
+# --- Time-partitioned index shards (see retriever/shards.py) ---
+# Period each index shard covers: day, week, month, or none for a single index
+SHARD_PERIOD = os.getenv("FINRAG_SHARD_PERIOD", "week")
+# Day / week shards whose newest article is older than this are merged into monthly shards; 0 never merges
+SHARD_COMPACT_AFTER_DAYS = int(os.getenv("FINRAG_SHARD_COMPACT_AFTER_DAYS", "90"))
+# Threads searching shards in parallel; 0 uses one per CPU
+SHARD_SEARCH_THREADS = int(os.getenv("FINRAG_SHARD_SEARCH_THREADS", "0"))
+# Articles published more than this many days ago are dropped from the store on the next embed; 0 keeps everything
+RETENTION_DAYS = int(os.getenv("FINRAG_RETENTION_DAYS", "0"))
+
+# --- Vector store versions (see retriever/vector_store.py, retriever/versioned_store.py) ---
+# Published versions kept on disk (servers may still be reading the older ones)
+VECTOR_STORE_KEEP_VERSIONS = int(os.getenv("FINRAG_VECTOR_STORE_KEEP_VERSIONS", "3"))
+# Removed chunks stay in a store as tombstoned rows until they exceed this fraction of the chunk table;
+# the next save then rewrites the store without them (as does dropping articles past the retention window)
+VECTOR_STORE_COMPACT_DEAD_FRACTION = float(os.getenv("FINRAG_VECTOR_STORE_COMPACT_DEAD_FRACTION", "0.2"))
+# How often a running pipeline checks for a newly published version; 0 disables the check
+VECTOR_STORE_POLL_SECONDS = float(os.getenv("FINRAG_VECTOR_STORE_POLL_SECONDS", "5"))
+# Longest a swapped-out version waits for its in-flight searches before it is released anyway
+VECTOR_STORE_DRAIN_SECONDS = float(os.getenv("FINRAG_VECTOR_STORE_DRAIN_SECONDS", "60"))
+
+# --- Observability (see metrics.py) ---
+# Log one structured line of per-stage timings per request
+TRACE_LOG = os.getenv("FINRAG_TRACE_LOG", "1").lower() not in ("0", "false", "no", "")
+# Fraction of retrievals whose individual chunks are logged (0 = never, 1 = every query)
+DEBUG_CHUNK_SAMPLE_RATE = float(os.getenv("FINRAG_DEBUG_CHUNK_SAMPLE_RATE", "0"))
+
+# --- Context packing (see generator/context_packer.py) ---
+# Approximate Gemini input tokens the retrieved context may use
+CONTEXT_TOKEN_BUDGET = int(os.getenv("FINRAG_CONTEXT_TOKEN_BUDGET", "1500"))
+# Word-shingle Jaccard similarity above which a passage counts as a near-duplicate
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("FINRAG_CONTEXT_DEDUP_THRESHOLD", "0.8"))
+# MMR trade-off between relevance (1.0 = rank order only, MMR off) and diversity (0.0)
+CONTEXT_MMR_LAMBDA = float(os.getenv("FINRAG_CONTEXT_MMR_LAMBDA", "1.0"))
+
+# --- Streaming ingestion (ingestion/pipeline.py) ---
+# Items buffered between two pipeline stages; a full queue blocks the stage upstream
+PIPELINE_QUEUE_SIZE = int(os.getenv("FINRAG_PIPELINE_QUEUE_SIZE", "64"))
+# Chunks the embedder collects before embedding and adding them to the index
+EMBED_STREAM_BATCH = int(os.getenv("FINRAG_EMBED_STREAM_BATCH", "2000"))
+# Vectors IVF / PQ / SQ indexes are trained on (a random sample of larger sets; buffered
+# first when a store is built from a stream)
+INDEX_TRAIN_SIZE = int(os.getenv("FINRAG_INDEX_TRAIN_SIZE", "20000"))
+
+# --- Near-duplicate articles (see retriever/near_duplicates.py) ---
+# Estimated Jaccard similarity of word shingles above which an article is collapsed into the
+# stored one it duplicates instead of being embedded; 0 embeds every article
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("FINRAG_NEAR_DUPLICATE_THRESHOLD", "0.8"))
+# Words per shingle
+NEAR_DUPLICATE_SHINGLE_SIZE = int(os.getenv("FINRAG_NEAR_DUPLICATE_SHINGLE_SIZE", "5"))
+# MinHash signature length, cut into this many LSH bands (more bands: more candidates checked)
+NEAR_DUPLICATE_PERMUTATIONS = int(os.getenv("FINRAG_NEAR_DUPLICATE_PERMUTATIONS", "128"))
+NEAR_DUPLICATE_BANDS = int(os.getenv("FINRAG_NEAR_DUPLICATE_BANDS", "16"))
+
+# --- News cleaner (ingestion/news_cleaner.py) ---
+# Worker processes; 0 uses one per CPU
+CLEANER_WORKERS = int(os.getenv("FINRAG_CLEANER_WORKERS", "0"))
+
+# --- Stock screener (retriever/screener.py) ---
+# How often the screener checks the price store for new parts
+SCREENER_REFRESH_SECONDS = float(os.getenv("FINRAG_SCREENER_REFRESH_SECONDS", "60"))
+# Answer screening questions ("10 stocks below 1000") from the screener instead of retrieval + Gemini
+SCREENER_ROUTING = os.getenv("FINRAG_SCREENER_ROUTING", "1").lower() not in ("0", "false", "no", "")
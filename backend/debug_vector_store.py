@@ -1,18 +1,40 @@
 # debug_vector_store.py
-import pickle
 import os
+import sys
 from collections import Counter
 
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from backend import config
+from backend.retriever.vector_store import VectorStore, store_exists
+
+def load_chunks(store, rows=None):
+    """Chunks of the store (all live ones by default) as {'content', 'source', 'title'} dicts"""
+    chunks = []
+    for row in store.live_rows() if rows is None else rows:
+        doc = store.get_document(row)
+        chunks.append({
+            'content': doc.page_content,
+            'source': doc.metadata.get('url', 'unknown'),
+            'title': doc.metadata.get('title', 'No title'),
+        })
+    return chunks
+
+def keyword_rows(store, keyword):
+    """Rows whose text contains the keyword, from the BM25 postings (no text scan)"""
+    if store.bm25 is None:
+        return []
+    return store.bm25.term_rows(keyword)
+
 def analyze_vector_store():
     """Analyze what's in the vector store"""
-    chunks_path = "embeddings/vector_store/chunks.pkl"
-    
-    if not os.path.exists(chunks_path):
+    if not store_exists(config.VECTOR_STORE_DIR):
         print("❌ Vector store not found!")
         return
     
-    with open(chunks_path, "rb") as f:
-        chunks = pickle.load(f)
+    store = VectorStore(config.VECTOR_STORE_DIR)
+    chunks = load_chunks(store)
     
     print(f"📊 Total chunks in vector store: {len(chunks)}")
     print("\n" + "="*50)
@@ -32,9 +54,7 @@ def analyze_vector_store():
         print(f"   Content: {chunk.get('content', 'No content')[:200]}...")
     
     # Search for Reliance-related content
-    reliance_chunks = [chunk for chunk in chunks 
-                      if 'reliance' in chunk.get('content', '').lower() or 
-                         'reliance' in chunk.get('title', '').lower()]
+    reliance_chunks = load_chunks(store, keyword_rows(store, 'reliance'))
     
     print(f"\n🔍 Reliance-related chunks found: {len(reliance_chunks)}")
     
@@ -50,10 +70,9 @@ def analyze_vector_store():
     print("\n🏢 Companies mentioned in content:")
     company_keywords = ['hdfc', 'icici', 'tcs', 'infy', 'sbin', 'itc', 'bank', 'stock', 'reliance']
     for keyword in company_keywords:
-        matching_chunks = [chunk for chunk in chunks 
-                         if keyword in chunk.get('content', '').lower()]
-        if matching_chunks:
-            print(f"  {keyword.upper()}: {len(matching_chunks)} chunks")
+        matching_rows = keyword_rows(store, keyword)
+        if len(matching_rows):
+            print(f"  {keyword.upper()}: {len(matching_rows)} chunks")
 
 def test_query_retrieval():
     """Test what chunks are retrieved for the Reliance query"""
@@ -62,13 +81,12 @@ def test_query_retrieval():
     sys.path.append('..')
     
     try:
-        from rag_pipeline import RAGPipeline, configure_genai
+        from backend.rag_pipeline import RAGPipeline
         
         print("\n" + "="*60)
         print("🔍 TESTING QUERY RETRIEVAL")
         print("="*60)
         
-        configure_genai()
         rag = RAGPipeline()
         
         query = "What is the market sentiment around Reliance Industries based on recent news?"
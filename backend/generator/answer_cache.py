@@ -0,0 +1,109 @@
+import time
+import hashlib
+import threading
+
+import numpy as np
+
+from backend import config
+from backend.metrics import CACHE_LOOKUPS
+
+
+def chunk_set_key(chunks):
+    """Order-insensitive fingerprint of a set of retrieved chunks"""
+    digests = sorted(
+        hashlib.sha1(f"{chunk['source']}\0{chunk['content']}".encode("utf-8")).hexdigest()
+        for chunk in chunks
+    )
+    return hashlib.sha1("".join(digests).encode("ascii")).hexdigest()
+
+
+class SemanticAnswerCache:
+    """
+    Caches generated answers and reuses them for paraphrased questions.
+
+    A cached answer is served only if the new query embedding has cosine
+    similarity >= ``threshold`` with the cached one, retrieval returned exactly
+    the same chunk set, the entry is younger than ``ttl`` seconds and the vector
+    store version is unchanged. A new index version drops every entry.
+    """
+
+    def __init__(self, threshold=None, ttl=None, max_size=None):
+        self.threshold = config.ANSWER_CACHE_THRESHOLD if threshold is None else threshold
+        self.ttl = config.ANSWER_CACHE_TTL if ttl is None else ttl
+        self.max_size = config.ANSWER_CACHE_SIZE if max_size is None else max_size
+        self._lock = threading.Lock()
+        self._entries = []  # (unit query vector, chunk set key, answer, expires_at)
+        self._matrix = None
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_size > 0
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _check_version(self, index_version):
+        if index_version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries = []
+            self._matrix = None
+            self._version = index_version
+
+    def _expire(self, now):
+        live = [entry for entry in self._entries if entry[3] > now]
+        if len(live) != len(self._entries):
+            self._entries = live
+            self._matrix = None
+
+    def lookup(self, query_vector, chunks_key, index_version):
+        """Returns a cached answer or None."""
+        if not self.enabled:
+            return None
+        query = self._unit(query_vector)
+        with self._lock:
+            self._check_version(index_version)
+            self._expire(time.monotonic())
+            if self._entries:
+                if self._matrix is None:
+                    self._matrix = np.stack([entry[0] for entry in self._entries])
+                scores = self._matrix @ query
+                # Best-scoring entry that also saw the same retrieved context
+                for i in np.argsort(-scores):
+                    if scores[i] < self.threshold:
+                        break
+                    if self._entries[i][1] == chunks_key:
+                        self.hits += 1
+                        CACHE_LOOKUPS.inc(cache="answer", result="hit")
+                        return self._entries[i][2]
+            self.misses += 1
+            CACHE_LOOKUPS.inc(cache="answer", result="miss")
+            return None
+
+    def store(self, query_vector, chunks_key, index_version, answer):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._check_version(index_version)
+            self._entries.append((self._unit(query_vector), chunks_key, answer, time.monotonic() + self.ttl))
+            if len(self._entries) > self.max_size:
+                self._entries = self._entries[-self.max_size:]
+            self._matrix = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
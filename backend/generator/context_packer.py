@@ -0,0 +1,183 @@
+import re
+
+from backend import config
+
+# Gemini averages roughly four characters of English text per token
+CHARS_PER_TOKEN = 4
+# Passages that would be cut below this many tokens are skipped rather than truncated
+MIN_TRUNCATED_TOKENS = 48
+# Chunks this few bytes apart (whitespace the splitter dropped) still count as adjacent
+MERGE_GAP_BYTES = 2
+
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_END_RE = re.compile(r"[.!?](?=\s)")
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _shingles(text, n=3):
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < n:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def _similarity(a, b):
+    """Jaccard similarity of two shingle sets, or containment if one is mostly inside the other."""
+    if not a or not b:
+        return 0.0
+    common = len(a & b)
+    return max(common / len(a | b), common / min(len(a), len(b)) if min(len(a), len(b)) >= 8 else 0.0)
+
+
+def merge_adjacent(chunks):
+    """
+    Merges chunks of the same article whose byte spans overlap or touch, so the
+    text shared by neighbouring chunks (the splitter's overlap) appears once.
+    Returns passages (dicts with source, title, content, span, rank) in rank order;
+    a merged passage keeps the best rank of its chunks.
+    """
+    by_article = {}
+    for rank, chunk in enumerate(chunks):
+        metadata = chunk.get("metadata") or {}
+        article = metadata.get("article_id", chunk["source"])
+        span = metadata.get("span")
+        by_article.setdefault(article, []).append((span, rank, chunk))
+
+    passages = []
+    for parts in by_article.values():
+        # Chunks without a span (e.g. stores built before spans were exposed) stay as they are
+        spanned = sorted((p for p in parts if p[0] is not None), key=lambda p: p[0])
+        for span, rank, chunk in parts:
+            if span is None:
+                passages.append({"source": chunk["source"], "title": chunk["title"],
+                                 "content": chunk["content"], "span": None, "rank": rank})
+        current = None
+        for (start, end), rank, chunk in spanned:
+            if current is not None and start <= current["span"][1] + MERGE_GAP_BYTES:
+                cur_start, cur_end = current["span"]
+                if start >= cur_end:
+                    current["content"] += " " + chunk["content"]
+                    current["span"] = (cur_start, end)
+                elif end > cur_end:
+                    # Spans are byte offsets into the article text: skip the bytes already covered
+                    tail = chunk["content"].encode("utf-8")[cur_end - start:]
+                    current["content"] += tail.decode("utf-8", errors="ignore")
+                    current["span"] = (cur_start, end)
+                current["rank"] = min(current["rank"], rank)
+                continue
+            current = {"source": chunk["source"], "title": chunk["title"],
+                       "content": chunk["content"], "span": (start, end), "rank": rank}
+            passages.append(current)
+    return sorted(passages, key=lambda p: p["rank"])
+
+
+def drop_near_duplicates(passages, threshold=None):
+    """Drops passages whose text near-duplicates a better-ranked one (syndicated stories, reposts)."""
+    threshold = config.CONTEXT_DEDUP_THRESHOLD if threshold is None else threshold
+    kept, kept_shingles = [], []
+    for passage in passages:
+        shingles = _shingles(passage["content"])
+        if any(_similarity(shingles, other) >= threshold for other in kept_shingles):
+            continue
+        kept.append(passage)
+        kept_shingles.append(shingles)
+    return kept
+
+
+def mmr_order(passages, lambda_=None):
+    """
+    Maximal marginal relevance re-ordering. Relevance is the retrieval rank
+    (scaled to 1..0), redundancy the word-shingle similarity to passages
+    already picked. ``lambda_`` = 1 keeps the rank order.
+    """
+    lambda_ = config.CONTEXT_MMR_LAMBDA if lambda_ is None else lambda_
+    if lambda_ >= 1 or len(passages) < 3:
+        return list(passages)
+    n = len(passages)
+    relevance = [1 - i / n for i in range(n)]
+    shingles = [_shingles(p["content"]) for p in passages]
+    remaining, picked = list(range(n)), []
+    while remaining:
+        best = max(remaining, key=lambda i: lambda_ * relevance[i] - (1 - lambda_) * max(
+            (_similarity(shingles[i], shingles[j]) for j in picked), default=0.0))
+        picked.append(best)
+        remaining.remove(best)
+    return [passages[i] for i in picked]
+
+
+def _truncate(text, max_chars):
+    """Cuts ``text`` to at most ``max_chars``, at the last sentence end if there is one."""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    ends = [m.end() for m in _SENTENCE_END_RE.finditer(cut + " ")]
+    if ends and ends[-1] > max_chars // 2:
+        return cut[:ends[-1]]
+    return cut.rsplit(" ", 1)[0] + " …"
+
+
+def pack(passages, budget=None):
+    """
+    Greedily fills the token budget in the given order. A passage that does not
+    fit is truncated to the remaining budget, or skipped if too little is left.
+    """
+    budget = config.CONTEXT_TOKEN_BUDGET if budget is None else budget
+    packed, used = [], 0
+    for passage in passages:
+        # Citation header of a new source counts against the budget too
+        header = 0 if any(p["source"] == passage["source"] for p in packed) else \
+            estimate_tokens(f"[00] {passage['title']}\nSource: {passage['source']}\n")
+        tokens = estimate_tokens(passage["content"]) + header
+        if used + tokens <= budget:
+            packed.append(passage)
+            used += tokens
+            continue
+        remaining = budget - used - header
+        if remaining >= MIN_TRUNCATED_TOKENS:
+            packed.append({**passage, "content": _truncate(passage["content"], remaining * CHARS_PER_TOKEN)})
+            used += header + estimate_tokens(packed[-1]["content"])
+    return packed
+
+
+def format_context(passages):
+    """
+    Groups passages by source, numbered in order of their best passage, so each
+    source is cited once: "[1] Title / Source: url / passages...". Passages of
+    one article are kept in document order.
+    """
+    groups = {}
+    for passage in passages:
+        groups.setdefault(passage["source"], []).append(passage)
+    blocks = []
+    for number, (source, group) in enumerate(groups.items(), 1):
+        group.sort(key=lambda p: p["span"] or (0, 0))
+        text = "\n…\n".join(p["content"].strip() for p in group)
+        blocks.append(f"[{number}] {group[0]['title']}\nSource: {source}\n{text}")
+    return "\n\n".join(blocks)
+
+
+def build_context(retrieved_chunks, budget=None):
+    """
+    Context assembly for the prompt: merge overlapping chunks of an article,
+    drop near-duplicates, optionally MMR-diversify, pack into the token budget
+    and format with one citation per source. Returns (context, stats).
+    """
+    passages = merge_adjacent(retrieved_chunks)
+    merged = len(passages)
+    passages = drop_near_duplicates(passages)
+    deduplicated = len(passages)
+    passages = pack(mmr_order(passages), budget)
+    context = format_context(passages)
+    stats = {
+        "chunks": len(retrieved_chunks),
+        "merged_passages": merged,
+        "duplicates_dropped": merged - deduplicated,
+        "packed_passages": len(passages),
+        "sources": len({p["source"] for p in passages}),
+        "retrieved_tokens": sum(estimate_tokens(c["content"]) for c in retrieved_chunks),
+        "context_tokens": estimate_tokens(context),
+    }
+    return context, stats
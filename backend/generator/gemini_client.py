@@ -0,0 +1,149 @@
+import json
+import asyncio
+import datetime
+import logging
+
+import httpx
+
+from backend import config
+from backend.metrics import record_llm_usage
+
+SCOPES = ["https://www.googleapis.com/auth/generative-language"]
+
+
+class GeminiAPIError(Exception):
+    def __init__(self, status_code, text):
+        super().__init__(f"Gemini API error: {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+class GeminiClient:
+    """
+    Async client for the Gemini REST API.
+
+    One pooled ``httpx.AsyncClient`` (keep-alive connections) is shared by all
+    requests, so concurrent handlers never block the event loop. The service
+    account credentials are loaded once and the OAuth token is reused until it
+    is within ``refresh_margin`` seconds of expiry; concurrent callers wait on a
+    single refresh instead of each fetching their own token.
+    """
+
+    def __init__(self, service_account_file=None, base_url=None, timeout=None,
+                 max_connections=None, max_keepalive=None, refresh_margin=None):
+        self.service_account_file = service_account_file or config.SERVICE_ACCOUNT_FILE
+        self.base_url = (base_url or config.GEMINI_API_BASE).rstrip("/")
+        self.timeout = timeout or httpx.Timeout(config.GEMINI_READ_TIMEOUT, connect=config.GEMINI_CONNECT_TIMEOUT)
+        self.limits = httpx.Limits(
+            max_connections=max_connections or config.GEMINI_MAX_CONNECTIONS,
+            max_keepalive_connections=max_keepalive or config.GEMINI_MAX_KEEPALIVE,
+        )
+        self.refresh_margin = config.GEMINI_TOKEN_REFRESH_MARGIN if refresh_margin is None else refresh_margin
+        self._http = None
+        self._credentials = None
+        self._token_lock = asyncio.Lock()
+
+    @property
+    def http(self):
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return self._http
+
+    def _token_is_fresh(self):
+        creds = self._credentials
+        if creds is None or not creds.token:
+            return False
+        if creds.expiry is None:
+            return True
+        expiry = creds.expiry
+        # google-auth keeps expiry as a naive UTC datetime; newer versions may make it aware
+        if expiry.tzinfo is None:
+            expiry = expiry.replace(tzinfo=datetime.timezone.utc)
+        remaining = expiry - datetime.datetime.now(datetime.timezone.utc)
+        return remaining.total_seconds() > self.refresh_margin
+
+    def _refresh_credentials(self):
+        from google.oauth2 import service_account
+        import google.auth.transport.requests
+
+        if self._credentials is None:
+            self._credentials = service_account.Credentials.from_service_account_file(
+                self.service_account_file, scopes=SCOPES
+            )
+        self._credentials.refresh(google.auth.transport.requests.Request())
+        logging.info(f"Refreshed Gemini OAuth token (expires {self._credentials.expiry})")
+
+    async def get_access_token(self):
+        if self._token_is_fresh():
+            return self._credentials.token
+        async with self._token_lock:
+            if not self._token_is_fresh():
+                # google-auth is blocking; keep it off the event loop
+                await asyncio.to_thread(self._refresh_credentials)
+            return self._credentials.token
+
+    async def _headers(self):
+        return {
+            "Authorization": f"Bearer {await self.get_access_token()}",
+            "Content-Type": "application/json"
+        }
+
+    async def request(self, method, path, **kwargs):
+        """Authenticated request against the API; returns the httpx.Response."""
+        return await self.http.request(method, f"{self.base_url}/{path}", headers=await self._headers(), **kwargs)
+
+    async def list_models(self):
+        response = await self.request("GET", "models")
+        if response.status_code != 200:
+            raise GeminiAPIError(response.status_code, response.text)
+        return response.json()
+
+    async def generate_content(self, payload, model=None):
+        model = model or config.GEMINI_MODEL
+        response = await self.request("POST", f"models/{model}:generateContent", json=payload)
+        if response.status_code != 200:
+            raise GeminiAPIError(response.status_code, response.text)
+        data = response.json()
+        record_llm_usage(data.get("usageMetadata"))
+        return data
+
+    async def stream_generate_content(self, payload, model=None):
+        """
+        Streams a generation via ``streamGenerateContent?alt=sse``.
+        Yields text fragments as soon as Gemini emits them.
+        """
+        model = model or config.GEMINI_MODEL
+        usage = None
+        async with self.http.stream(
+            "POST", f"{self.base_url}/models/{model}:streamGenerateContent",
+            params={"alt": "sse"}, headers=await self._headers(), json=payload
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise GeminiAPIError(response.status_code, response.text)
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = json.loads(line[len("data:"):])
+                # usageMetadata is cumulative; the last chunk carries the totals
+                usage = data.get("usageMetadata", usage)
+                text = chunk_text(data)
+                if text:
+                    yield text
+        record_llm_usage(usage)
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+def extract_text(data):
+    """First candidate's text from a generateContent response."""
+    return data.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "No answer returned.")
+
+
+def chunk_text(data):
+    """All text parts of one streamed generateContent chunk, concatenated."""
+    parts = data.get("candidates", [{}])[0].get("content", {}).get("parts", [])
+    return "".join(part.get("text", "") for part in parts)
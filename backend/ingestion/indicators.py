@@ -0,0 +1,133 @@
+"""
+Vectorised technical indicators that can be extended row by row.
+
+Every indicator is a recursion over the previous row (an EMA or Wilder
+average), so appending new rows only needs the last stored row's state
+(EMA_12, EMA_26, MACDs_12_26_9, AvgGain_14, AvgLoss_14, a few closes),
+never the whole history. The recursions are evaluated with NumPy in closed
+form, a block of rows at a time.
+"""
+import numpy as np
+
+RSI_PERIOD = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+PERF_PERIOD = 5
+
+INDICATOR_COLUMNS = ["RSI_14", "MACD_12_26_9", "MACDh_12_26_9", "MACDs_12_26_9", "Returns", "Perf"]
+STATE_COLUMNS = ["EMA_12", "EMA_26", "AvgGain_14", "AvgLoss_14"]
+
+# Keeps (1 - alpha) ** -BLOCK far from overflow for every alpha used here
+_BLOCK = 64
+
+
+def ema(x, alpha, prev=np.nan):
+    """
+    y[t] = alpha * x[t] + (1 - alpha) * y[t - 1], with y[-1] = ``prev``.
+    Uses the closed form y[t] = b^(t+1) * (prev + alpha * sum_k x[k] / b^(k+1)),
+    b = 1 - alpha, evaluated per block of rows so b^-t stays well in range.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = np.empty_like(x)
+    b = 1.0 - alpha
+    powers = b ** np.arange(1, _BLOCK + 1)
+    for start in range(0, len(x), _BLOCK):
+        block = x[start:start + _BLOCK]
+        p = powers[:len(block)]
+        out[start:start + len(block)] = p * (prev + alpha * np.cumsum(block / p))
+        prev = out[start + len(block) - 1]
+    return out
+
+
+def seeded_ema(x, period, alpha, prev=np.nan):
+    """
+    EMA seeded with the simple mean of its first ``period`` valid inputs (NaN
+    until then). ``prev`` is the last EMA value when extending a series.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full_like(x, np.nan)
+    if not np.isnan(prev):
+        valid = ~np.isnan(x)
+        first = int(np.argmax(valid)) if valid.any() else len(x)
+        out[first:] = ema(x[first:], alpha, prev)
+        return out
+    valid = np.flatnonzero(~np.isnan(x))
+    if len(valid) < period:
+        return out
+    seed_at = valid[period - 1]
+    out[seed_at] = x[valid[:period]].mean()
+    out[seed_at + 1:] = ema(x[seed_at + 1:], alpha, out[seed_at])
+    return out
+
+
+def compute(close, state=None):
+    """
+    Indicator and state columns for the rows of ``close``.
+
+    ``state`` (a dict with the STATE_COLUMNS, MACDs_12_26_9 and the list
+    ``closes`` of up to PERF_PERIOD preceding closes) continues a stored
+    series; None computes from scratch. Returns a dict of NumPy columns.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    state = state or {}
+    history = np.asarray(state.get("closes", []), dtype=np.float64)
+    extended = np.concatenate([history, close])
+    n_hist = len(history)
+
+    # Close-to-close changes of the new rows (the first needs the last stored close)
+    diff = np.diff(extended)[max(n_hist - 1, 0):] if n_hist else np.concatenate([[np.nan], np.diff(close)])
+    gain, loss = np.clip(diff, 0, None), np.clip(-diff, 0, None)
+    gain[np.isnan(diff)], loss[np.isnan(diff)] = np.nan, np.nan
+    alpha = 1.0 / RSI_PERIOD
+    avg_gain = seeded_ema(gain, RSI_PERIOD, alpha, state.get("AvgGain_14", np.nan))
+    avg_loss = seeded_ema(loss, RSI_PERIOD, alpha, state.get("AvgLoss_14", np.nan))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+    rsi[np.isnan(avg_gain) | np.isnan(avg_loss)] = np.nan
+
+    ema_fast = seeded_ema(close, MACD_FAST, 2.0 / (MACD_FAST + 1), state.get("EMA_12", np.nan))
+    ema_slow = seeded_ema(close, MACD_SLOW, 2.0 / (MACD_SLOW + 1), state.get("EMA_26", np.nan))
+    macd = ema_fast - ema_slow
+    signal = seeded_ema(macd, MACD_SIGNAL, 2.0 / (MACD_SIGNAL + 1), state.get("MACDs_12_26_9", np.nan))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        previous = extended[n_hist - 1:-1] if n_hist else np.concatenate([[np.nan], close[:-1]])
+        returns = (close / previous - 1.0) * 100
+        base = np.concatenate([np.full(PERF_PERIOD, np.nan), extended])[n_hist:n_hist + len(close)]
+        perf = (close / base - 1.0) * 100
+
+    return {
+        "RSI_14": rsi,
+        "MACD_12_26_9": macd,
+        "MACDh_12_26_9": macd - signal,
+        "MACDs_12_26_9": signal,
+        "Returns": returns,
+        "Perf": perf,
+        "EMA_12": ema_fast,
+        "EMA_26": ema_slow,
+        "AvgGain_14": avg_gain,
+        "AvgLoss_14": avg_loss,
+    }
+
+
+def state_of(rows):
+    """
+    State to continue a series from its stored rows (oldest first), or None
+    if the averages are not all seeded yet, in which case the caller
+    recomputes the whole (short) series.
+    """
+    if rows is None or len(rows) == 0:
+        return None
+    last = rows.iloc[-1]
+    state = {name: float(last[name]) for name in STATE_COLUMNS + ["MACDs_12_26_9"]}
+    if any(np.isnan(value) for value in state.values()):
+        return None
+    state["closes"] = rows["Close"].to_numpy(dtype=np.float64)[-PERF_PERIOD:].tolist()
+    return state
+
+
+def calculate_indicators(df):
+    """Adds the indicator and state columns to a single-ticker frame with a Close column."""
+    for name, values in compute(df["Close"].to_numpy()).items():
+        df[name] = values
+    return df
+
@@ -0,0 +1,71 @@
+import os
+import json
+import logging
+import threading
+
+# News files are one JSON article per line (news_<date>.jsonl, news_<date>_cleaned.jsonl).
+# Older files are a single JSON array (.json, .json.txt); both are read.
+NEWS_SUFFIXES = (".jsonl", ".json", ".json.txt")
+
+
+def is_news_file(file):
+    return file.endswith(NEWS_SUFFIXES)
+
+
+def read_articles(path):
+    """
+    Yields the articles of a news file one at a time. JSONL files are read
+    line by line; a truncated last line (a writer interrupted mid-append) is skipped.
+    """
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logging.warning(f"Skipping unreadable line {number} of {path}")
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    yield from data if isinstance(data, list) else [data]
+
+
+def iter_news_files(directory):
+    """News files of ``directory``, oldest day first."""
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, file) for file in sorted(os.listdir(directory)) if is_news_file(file)]
+
+
+class JsonlWriter:
+    """
+    Append-only JSONL sink. Each record is written as one line and flushed,
+    so readers (and a crashed run) only ever see whole, already-persisted
+    articles. Safe to share between threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self.written = 0
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self.written += 1
+        return record
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,72 +1,248 @@
 import os
 import re
+import sys
 import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from bs4 import BeautifulSoup
 
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend import config
+from backend.ingestion.jsonl import JsonlWriter
+
 # Use absolute paths relative to the project root
-RAW_DIR = "../data/raw_news/"
-CLEANED_DIR = "../data/cleaned_news/"
-os.makedirs(CLEANED_DIR, exist_ok=True)
+RAW_DIR = config.RAW_NEWS_DIR
+CLEANED_DIR = config.CLEANED_NEWS_DIR
+# Records which raw files were cleaned, as of which size / mtime / content hash
+MANIFEST_FILE = ".clean_manifest.json"
+
+try:
+    import lxml.html
+    from lxml.etree import ParserError
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_MARKUP_RE = re.compile(r"[<&]")
+
+def _html_to_text(html):
+    if HTML_PARSER == "lxml":
+        try:
+            # Same text as BeautifulSoup's get_text(), without building a soup tree
+            return lxml.html.fragment_fromstring(html, create_parent="div").text_content()
+        except (ParserError, ValueError):
+            pass
+    return BeautifulSoup(html, "html.parser").get_text()
 
 def clean_text(html):
-    soup = BeautifulSoup(html, "html.parser")
-    text = soup.get_text()
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
-
-def clean_articles():
-    """Clean all articles from raw news files"""
-    print(f"Looking for files in: {os.path.abspath(RAW_DIR)}")
-    
-    if not os.path.exists(RAW_DIR):
-        print(f"❌ Raw news directory not found: {RAW_DIR}")
+    # Scraped article text is mostly plain already; only markup or entities need a parser
+    if _MARKUP_RE.search(html):
+        html = _html_to_text(html)
+    return _WHITESPACE_RE.sub(" ", html).strip()
+
+def clean_article(article):
+    """Copy of a raw article with ``cleaned_text`` added, or None if it has no text."""
+    if not article.get("text"):
+        return None
+    cleaned_article = article.copy()
+    cleaned_article["cleaned_text"] = clean_text(article["text"])
+    return cleaned_article
+
+def cleaned_name(file):
+    """news_2025-08-03.jsonl -> news_2025-08-03_cleaned.jsonl (.json and .json.txt -> _cleaned.json)"""
+    if file.endswith(".jsonl"):
+        return file[:-len(".jsonl")] + "_cleaned.jsonl"
+    return file.replace('.json.txt', '.json').replace('.json', '_cleaned.json')
+
+def _sha1(path, size=None):
+    """SHA-1 of the file, or of its first ``size`` bytes."""
+    h = hashlib.sha1()
+    remaining = size
+    with open(path, "rb") as f:
+        while remaining is None or remaining > 0:
+            block = f.read(1 << 20 if remaining is None else min(1 << 20, remaining))
+            if not block:
+                break
+            h.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return h.hexdigest()
+
+def _fingerprint(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def load_manifest(cleaned_dir=CLEANED_DIR):
+    path = os.path.join(cleaned_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest, cleaned_dir=CLEANED_DIR):
+    path = os.path.join(cleaned_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def plan_file(file_path, out_path, recorded):
+    """
+    What to do with one raw file given its manifest entry: ("skip", 0) if it
+    is unchanged (same size and mtime), ("touched", 0) if only its mtime
+    changed, ("append", offset) if a JSONL file only grew since it was
+    cleaned, else ("full", 0).
+    """
+    if not recorded or not os.path.exists(out_path):
+        return "full", 0
+    current = _fingerprint(file_path)
+    if current["size"] == recorded["size"] and current["mtime_ns"] == recorded["mtime_ns"]:
+        return "skip", 0
+    if current["size"] == recorded["size"] and _sha1(file_path) == recorded["sha1"]:
+        return "touched", 0
+    if (file_path.endswith(".jsonl") and current["size"] > recorded["size"]
+            and _sha1(file_path, recorded["size"]) == recorded["sha1"]):
+        return "append", recorded["size"]
+    return "full", 0
+
+def _read_jsonl_range(path, offset, end):
+    """Articles of the JSONL lines between two byte offsets."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        position = offset
+        for line in f:
+            position += len(line)
+            if position > end:
+                break  # appended after the snapshot was taken
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+def clean_file(file_path, out_path, offset=0, end=None):
+    """
+    Cleans one raw news file into ``out_path`` (runs in a worker process).
+    JSONL is streamed line by line up to byte ``end`` (the size it had when
+    the run was planned); with ``offset`` only the lines appended after that
+    byte offset are cleaned and appended to the existing output.
+    Returns the file's stats.
+    """
+    start = time.perf_counter()
+    end = os.path.getsize(file_path) if end is None else end
+    count = 0
+    if file_path.endswith(".jsonl"):
+        if offset:
+            with JsonlWriter(out_path) as out:
+                for article in _read_jsonl_range(file_path, offset, end):
+                    cleaned_article = clean_article(article)
+                    if cleaned_article:
+                        out.write(cleaned_article)
+                count = out.written
+        else:
+            tmp_path = out_path + ".tmp"
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            with JsonlWriter(tmp_path) as out:
+                for article in _read_jsonl_range(file_path, 0, end):
+                    cleaned_article = clean_article(article)
+                    if cleaned_article:
+                        out.write(cleaned_article)
+            os.replace(tmp_path, out_path)
+            count = out.written
+    else:
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # Handle array of articles
+        if isinstance(data, list):
+            cleaned_articles = [a for a in map(clean_article, data) if a]
+            with open(out_path, "w", encoding="utf-8") as out:
+                json.dump(cleaned_articles, out, ensure_ascii=False, indent=2)
+            count = len(cleaned_articles)
+        # Handle single article (legacy support)
+        elif isinstance(data, dict) and data.get("text"):
+            with open(out_path, "w", encoding="utf-8") as out:
+                json.dump(clean_article(data), out, ensure_ascii=False, indent=2)
+            count = 1
+    return {"articles": count, "bytes": end - offset, "seconds": time.perf_counter() - start}
+
+def snapshot(file_path):
+    """Manifest entry of a raw file as it is now (hash taken over exactly the recorded size)."""
+    fingerprint = _fingerprint(file_path)
+    return {**fingerprint, "sha1": _sha1(file_path, fingerprint["size"])}
+
+def clean_articles(raw_dir=RAW_DIR, cleaned_dir=CLEANED_DIR, workers=None, force=False):
+    """
+    Cleans the raw news files that changed since they were last cleaned, one
+    file per worker process. Returns the aggregate stats.
+    """
+    print(f"Looking for files in: {os.path.abspath(raw_dir)}")
+
+    if not os.path.exists(raw_dir):
+        print(f"❌ Raw news directory not found: {raw_dir}")
         return
-        
-    files_found = [f for f in os.listdir(RAW_DIR) if f.endswith(('.json', '.json.txt'))]
-    print(f"Found {len(files_found)} files to process: {files_found}")
-    
+    os.makedirs(cleaned_dir, exist_ok=True)
+
+    files_found = sorted(f for f in os.listdir(raw_dir) if f.endswith(('.jsonl', '.json', '.json.txt')))
+    manifest = {} if force else load_manifest(cleaned_dir)
+    tasks, skipped, touched = [], 0, False
     for file in files_found:
-        file_path = os.path.join(RAW_DIR, file)
-        print(f"\n📄 Processing: {file}")
-        
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            
-            # Handle array of articles
-            if isinstance(data, list):
-                cleaned_articles = []
-                for i, article in enumerate(data):
-                    if article.get("text"):
-                        cleaned_article = article.copy()
-                        cleaned_article["cleaned_text"] = clean_text(article["text"])
-                        cleaned_articles.append(cleaned_article)
-                        print(f"  ✅ Cleaned article {i+1}: {article.get('title', 'No title')[:50]}...")
-                
-                # Save cleaned articles
-                out_file = file.replace('.json.txt', '.json').replace('.json', '_cleaned.json')
-                out_path = os.path.join(CLEANED_DIR, out_file)
-                
-                with open(out_path, "w", encoding="utf-8") as out:
-                    json.dump(cleaned_articles, out, ensure_ascii=False, indent=2)
-                
-                print(f"  💾 Saved {len(cleaned_articles)} cleaned articles to: {out_file}")
-            
-            # Handle single article (legacy support)
-            elif isinstance(data, dict) and data.get("text"):
-                data["cleaned_text"] = clean_text(data["text"])
-                out_path = os.path.join(CLEANED_DIR, file)
-                with open(out_path, "w", encoding="utf-8") as out:
-                    json.dump(data, out, ensure_ascii=False, indent=2)
-                print(f"  ✅ Cleaned single article: {data.get('title', 'No title')[:50]}...")
-            
-            else:
-                print(f"  ⚠️  Skipped {file}: No text content found")
-                
-        except Exception as e:
-            print(f"  ❌ Error processing {file}: {e}")
-    
-    print(f"\n🎉 Cleaning complete! Check results in: {os.path.abspath(CLEANED_DIR)}")
+        file_path = os.path.join(raw_dir, file)
+        out_path = os.path.join(cleaned_dir, cleaned_name(file))
+        action, offset = plan_file(file_path, out_path, manifest.get(file))
+        if action == "touched":
+            # Same content: remember the new mtime so it is not hashed again next run
+            manifest[file]["mtime_ns"] = _fingerprint(file_path)["mtime_ns"]
+            touched = True
+        if action in ("skip", "touched"):
+            skipped += 1
+        else:
+            # Taken before cleaning: lines appended meanwhile are left for the next run
+            tasks.append((file, file_path, out_path, offset, snapshot(file_path)))
+    print(f"Found {len(files_found)} files: {len(tasks)} to clean, {skipped} unchanged (parser: {HTML_PARSER})")
+
+    start = time.perf_counter()
+    totals = {"files": 0, "failed": 0, "skipped": skipped, "articles": 0, "bytes": 0}
+    if tasks:
+        workers = workers or config.CLEANER_WORKERS or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            futures = [(task, pool.submit(clean_file, task[1], task[2], task[3], task[4]["size"])) for task in tasks]
+            for (file, file_path, out_path, offset, state), future in futures:
+                try:
+                    stats = future.result()
+                except Exception as e:
+                    print(f"  ❌ Error processing {file}: {e}")
+                    totals["failed"] += 1
+                    continue
+                mode = " (appended lines)" if offset else ""
+                rate = stats["articles"] / stats["seconds"] if stats["seconds"] else 0.0
+                print(f"  ✅ {file}{mode}: {stats['articles']} articles, {stats['bytes'] / 1e6:.2f} MB "
+                      f"in {stats['seconds']:.2f}s ({rate:.0f} articles/s)")
+                manifest[file] = {**state, "output": os.path.basename(out_path)}
+                totals["files"] += 1
+                totals["articles"] += stats["articles"]
+                totals["bytes"] += stats["bytes"]
+    if tasks or touched:
+        save_manifest(manifest, cleaned_dir)
+
+    elapsed = time.perf_counter() - start
+    totals["seconds"] = round(elapsed, 3)
+    if elapsed and totals["articles"]:
+        print(f"⏱️  {totals['articles']} articles / {totals['bytes'] / 1e6:.2f} MB in {elapsed:.2f}s: "
+              f"{totals['articles'] / elapsed:.0f} articles/s, {totals['bytes'] / 1e6 / elapsed:.2f} MB/s")
+    print(f"\n🎉 Cleaning complete! Check results in: {os.path.abspath(cleaned_dir)}")
+    return totals
 
 if __name__ == "__main__":
-    clean_articles()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Clean the scraped news (only files that changed)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="re-clean every file")
+    args = parser.parse_args()
+    clean_articles(workers=args.workers, force=args.force)
@@ -0,0 +1,164 @@
+# ingestion/pipeline.py
+"""
+Streaming ingestion: scrape -> clean -> split/embed, one article at a time.
+
+Each stage runs in its own thread and hands articles to the next through a
+bounded queue, so a slow stage (usually embedding) blocks the ones upstream
+instead of letting them pile articles up in memory, and embedding starts as
+soon as the first articles are scraped. Raw and cleaned articles are appended
+to the day's JSONL files on the way through.
+
+    python backend/ingestion/pipeline.py
+    python backend/ingestion/pipeline.py --backend hashing --feeds https://example.com/rss
+"""
+import os
+import sys
+import time
+import queue
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend import config
+from backend.ingestion.jsonl import JsonlWriter
+
+_DONE = object()
+
+# Example financial RSS feeds (as in rss_scraper.py)
+DEFAULT_FEEDS = [
+    'https://economictimes.indiatimes.com/markets/rssfeeds/1977021501.cms',
+    'https://www.livemint.com/rss/markets',
+    'http://feeds.reuters.com/reuters/businessNews'
+]
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+def stage(items, fn, maxsize=config.PIPELINE_QUEUE_SIZE, name=None):
+    """
+    Runs ``fn`` over ``items`` in a background thread and yields the results
+    (``None`` results are dropped). At most ``maxsize`` results wait in the
+    queue; beyond that the thread, and with it everything upstream, blocks.
+    An exception in the stage is re-raised in the consumer; closing the
+    generator early stops the stage.
+    """
+    results = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run():
+        try:
+            for item in items:
+                result = fn(item)
+                if result is not None and not put(result):
+                    return
+        except BaseException as e:
+            put(_Failure(e))
+            return
+        finally:
+            # Stops the upstream stages too when this one ends early
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+        put(_DONE)
+
+    thread = threading.Thread(target=run, name=name or getattr(fn, "__name__", "stage"), daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = results.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+
+
+class Throughput:
+    """Counts the items passing a point of the pipeline."""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.start = time.perf_counter()
+
+    def __call__(self, item):
+        self.count += 1
+        return item
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.start
+        return f"{self.name}: {self.count} ({self.count / elapsed:.1f}/s)" if elapsed else f"{self.name}: {self.count}"
+
+
+def to_doc(article, date=None):
+    """A cleaned article in the shape the embedder expects."""
+    text = article.get("cleaned_text") or article.get("text")
+    return {"content": text, "metadata": article, "date": date} if text else None
+
+
+def ingest(articles, date_str=None, raw_dir=config.RAW_NEWS_DIR, cleaned_dir=config.CLEANED_NEWS_DIR,
+           incremental=True, backend=None, index_type=None):
+    """
+    Streams ``articles`` (raw: title, url, text, ...) through clean and embed:
+    each is appended to the day's raw JSONL, cleaned,
+    appended to the day's cleaned JSONL and handed to the embedder, which
+    embeds and indexes them in batches and only keeps what it has not stored yet.
+    Returns the embedder's summary.
+    """
+    from backend.ingestion.news_cleaner import clean_article
+    from backend.retriever import embedder
+
+    date_str = date_str or datetime.now().strftime("%Y-%m-%d")
+    raw = Throughput("scraped")
+    cleaned = Throughput("cleaned")
+    with JsonlWriter(os.path.join(raw_dir, f"news_{date_str}.jsonl")) as raw_out, \
+            JsonlWriter(os.path.join(cleaned_dir, f"news_{date_str}_cleaned.jsonl")) as cleaned_out:
+        stream = stage(articles, lambda a: raw(raw_out.write(a)), name="scrape")
+        stream = stage(stream, clean_article, name="clean")
+        stream = stage(stream, lambda a: to_doc(cleaned(cleaned_out.write(a)), date_str), name="write_cleaned")
+        try:
+            summary = embedder.embed(incremental=incremental, backend=backend, index_type=index_type,
+                                     docs=stream, prune=False)
+        finally:
+            # Stops the stage threads (and the source) if the embedder failed part-way
+            stream.close()
+    print(f"⏱️  {raw.summary()}, {cleaned.summary()}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape, clean and embed news as one streaming pipeline")
+    parser.add_argument("--feeds", nargs="*", default=DEFAULT_FEEDS, help="RSS feeds to scrape")
+    parser.add_argument("--backend", choices=["google", "hashing"], default=None,
+                        help="embeddings backend (default: FINRAG_EMBEDDING_BACKEND or 'google')")
+    parser.add_argument("--index-type", default=None, help="ANN index type (see retriever/ann_index.py)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from backend.ingestion.rss_scraper import ScraperState, scrape_articles
+    state = ScraperState()
+    if not os.path.exists(config.SCRAPER_STATE_PATH):
+        # First run with a state file: don't re-download what earlier runs saved
+        state.seed_from(config.RAW_NEWS_DIR)
+
+    result = ingest(scrape_articles(args.feeds, state), backend=args.backend, index_type=args.index_type)
+    if result:
+        print(f"✅ Ingested {result['embedded']} new chunks; the store now holds {result['vectors']} vectors")
@@ -1,53 +1,265 @@
 # ingestion/rss_scraper.py
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
 import feedparser
 from newspaper import Article, Config
-import logging
-import json
-from datetime import datetime
-import os
+
+from backend import config
+from backend.ingestion.jsonl import JsonlWriter, iter_news_files, read_articles
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # User agent to mimic a browser
 USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-config = Config()
-config.browser_user_agent = USER_AGENT
-config.request_timeout = 20
+newspaper_config = Config()
+newspaper_config.browser_user_agent = USER_AGENT
+newspaper_config.request_timeout = config.SCRAPER_TIMEOUT
+
+
+class ArticleDownloadError(Exception):
+    pass
+
 
-def fetch_and_parse_articles(rss_feeds):
+def fetch_feed(url, etag=None, modified=None):
+    """
+    Default feed fetcher: a conditional GET through feedparser. Returns the
+    parsed feed; ``status`` is 304 (and ``entries`` empty) if it is unchanged.
+    """
+    return feedparser.parse(url, etag=etag, modified=modified, agent=USER_AGENT)
+
+
+def download_article(url):
+    """Default article fetcher: downloads and parses a page with newspaper3k. Returns (text, publish_date)."""
+    article = Article(url, config=newspaper_config)
+    article.download()
+    # download_state 2 is ArticleDownloadState.SUCCESS
+    if article.download_state != 2:
+        raise ArticleDownloadError(f"Failed to download article: {url}")
+    article.parse()
+    return article.text, article.publish_date
+
+
+def _host(url):
+    return urlparse(url).netloc.lower().removeprefix('www.')
+
+
+class ScraperState:
+    """
+    What the scraper remembers between runs, persisted as one JSON file:
+    the ETag / Last-Modified validators of each feed and the URLs already
+    scraped (with the date first seen), so known articles are never re-downloaded.
+    """
+
+    def __init__(self, path=config.SCRAPER_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.feeds = {}
+        self.seen = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.feeds = data.get("feeds", {})
+            self.seen = data.get("seen", {})
+
+    def validators(self, feed_url):
+        entry = self.feeds.get(feed_url, {})
+        return entry.get("etag"), entry.get("modified")
+
+    def set_validators(self, feed_url, etag, modified):
+        with self._lock:
+            self.feeds[feed_url] = {"etag": etag, "modified": modified}
+
+    def is_seen(self, url):
+        return url in self.seen
+
+    def mark_seen(self, url):
+        with self._lock:
+            self.seen.setdefault(url, datetime.now().date().isoformat())
+
+    def seed_from(self, raw_dir):
+        """Marks the URLs of already scraped raw news files as seen (first run with a state file)."""
+        for path in iter_news_files(raw_dir):
+            for article in read_articles(path):
+                if article.get("url"):
+                    self.mark_seen(article["url"])
+
+    def prune(self, ttl_days=config.SCRAPER_SEEN_TTL_DAYS):
+        cutoff = (datetime.now().date() - timedelta(days=ttl_days)).isoformat()
+        with self._lock:
+            self.seen = {url: day for url, day in self.seen.items() if day >= cutoff}
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            data = {"feeds": self.feeds, "seen": self.seen}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+
+class HostLimiter:
+    """Per-host semaphores, created on first use."""
+
+    def __init__(self, per_host):
+        self.per_host = per_host
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def __call__(self, url):
+        host = _host(url)
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return self._semaphores[host]
+
+
+def _interleave_by_host(entries):
+    """Round-robin over hosts, so the pool's workers are not all queued behind one host's limit."""
+    by_host = {}
+    for entry in entries:
+        by_host.setdefault(_host(entry[1].link), []).append(entry)
+    queues = list(by_host.values())
+    ordered = []
+    while queues:
+        ordered.extend(queue.pop(0) for queue in queues)
+        queues = [queue for queue in queues if queue]
+    return ordered
+
+
+def scrape_articles(rss_feeds, state=None, feed_fetcher=fetch_feed, article_fetcher=download_article,
+                    max_workers=config.SCRAPER_CONCURRENCY, per_host=config.SCRAPER_PER_HOST):
+    """
+    Fetches the articles of a list of RSS feeds and yields each one (title,
+    url, source, published, text) as soon as it is downloaded and parsed.
+
+    Feeds and articles are fetched concurrently (at most ``max_workers``
+    requests in flight, ``per_host`` per host). Feeds are fetched
+    conditionally and URLs already in ``state`` are skipped; pass a
+    ScraperState(None) to scrape everything without persisting anything.
+    ``feed_fetcher(url, etag, modified)`` and ``article_fetcher(url)`` can be
+    swapped, e.g. for a local HTTP stand-in.
+    """
+    state = state if state is not None else ScraperState()
+    limit = HostLimiter(per_host)
+    start = time.perf_counter()
+    scraped = 0
+    # Feed validators are only committed once every new entry of the feed is scraped;
+    # otherwise a 304 next run would hide the entries that failed or were not reached
+    validators, failed_feeds, finished = {}, set(), False
+
+    def read_feed(url):
+        etag, modified = state.validators(url)
+        with limit(url):
+            return feed_fetcher(url, etag, modified)
+
+    def read_article(feed_url, entry):
+        with limit(entry.link):
+            text, publish_date = article_fetcher(entry.link)
+        # Publish date from the feed, falling back to the one parsed from the page
+        published = entry.get('published_parsed') or entry.get('updated_parsed')
+        if published:
+            published = datetime(*published[:6]).isoformat()
+        elif publish_date:
+            published = publish_date.isoformat()
+        return {
+            'title': entry.title,
+            'url': entry.link,
+            # Feed host, e.g. "economictimes.indiatimes.com"; used for source filters at search time
+            'source': _host(feed_url),
+            'published': published,
+            'text': text
+        }
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            pending, queued = [], set()
+            futures = {pool.submit(read_feed, url): url for url in rss_feeds}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    feed = future.result()
+                except Exception as e:
+                    logging.error(f"Error fetching feed {url}: {e}")
+                    continue
+                status = feed.get('status')
+                if status == 304:
+                    logging.info(f"Feed not modified: {url}")
+                    continue
+                validators[url] = (feed.get('etag'), feed.get('modified'))
+                new = [entry for entry in feed.entries
+                       if entry.get('link') and not state.is_seen(entry.link) and entry.link not in queued]
+                queued.update(entry.link for entry in new)
+                pending.extend((url, entry) for entry in new)
+                logging.info(f"Fetched feed {url}: {len(feed.entries)} entries, {len(new)} new")
+
+            futures = {pool.submit(read_article, feed_url, entry): (feed_url, entry)
+                       for feed_url, entry in _interleave_by_host(pending)}
+            try:
+                for future in as_completed(futures):
+                    feed_url, entry = futures[future]
+                    try:
+                        article = future.result()
+                    except Exception as e:
+                        # Not marked as seen, so it is retried on the next run
+                        logging.error(f"Error processing article {entry.link}: {e}")
+                        failed_feeds.add(feed_url)
+                        continue
+                    logging.info(f"Successfully parsed: {entry.title}")
+                    yield article
+                    # Only once the consumer has taken it, so an interrupted run loses nothing
+                    state.mark_seen(entry.link)
+                    scraped += 1
+                finished = True
+            finally:
+                for future in futures:
+                    future.cancel()
+    finally:
+        for url, (etag, modified) in validators.items():
+            if finished and url not in failed_feeds:
+                state.set_validators(url, etag, modified)
+        state.prune()
+        state.save()
+        logging.info(f"Scraped {scraped} new articles from {len(rss_feeds)} feeds "
+                     f"in {time.perf_counter() - start:.1f}s")
+
+
+def fetch_and_parse_articles(rss_feeds, state=None, **kwargs):
     """
     Fetches articles from a list of RSS feeds, parses them,
     and returns a list of dictionaries with title, url, and clean text.
+    See scrape_articles for the options.
     """
-    articles_data = []
-    for url in rss_feeds:
-        logging.info(f"Fetching feed from: {url}")
-        feed = feedparser.parse(url)
-        for entry in feed.entries:
-            try:
-                # Use newspaper3k to download and parse the article
-                article = Article(entry.link, config=config)
-                article.download()
-                # Some articles might fail downloading, handle this
-                if article.download_state != 2:
-                    logging.warning(f"Failed to download article: {entry.link}")
-                    continue
-                
-                article.parse()
+    return list(scrape_articles(rss_feeds, state, **kwargs))
+
+
+def raw_news_path(output_dir=config.RAW_NEWS_DIR, date_str=None):
+    date_str = date_str or datetime.now().strftime("%Y-%m-%d")
+    return os.path.join(output_dir, f"news_{date_str}.jsonl")
 
-                # Append cleaned data
-                articles_data.append({
-                    'title': entry.title,
-                    'url': entry.link,
-                    'text': article.text
-                })
-                logging.info(f"Successfully parsed: {entry.title}")
 
-            except Exception as e:
-                logging.error(f"Error processing article {entry.link}: {e}")
+def save_articles(articles, output_dir=config.RAW_NEWS_DIR, date_str=None):
+    """Appends articles to the day's raw news file (news_<date>.jsonl, one article per line)."""
+    filename = raw_news_path(output_dir, date_str)
+    with JsonlWriter(filename) as writer:
+        for article in articles:
+            writer.write(article)
+    return filename
 
-    return articles_data
 
 if __name__ == '__main__':
     # Example financial RSS feeds (you can add more)
@@ -56,18 +268,15 @@ if __name__ == '__main__':
         'https://www.livemint.com/rss/markets',
         'http://feeds.reuters.com/reuters/businessNews'
     ]
-    
-    scraped_articles = fetch_and_parse_articles(financial_feeds)
-    
-    # --- SAVE THE DATA TO A JSON FILE ---
-    output_dir = "data/raw_news"
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Create a filename with the current date
-    date_str = datetime.now().strftime("%Y-%m-%d")
-    filename = os.path.join(output_dir, f"news_{date_str}.json")
-    
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(scraped_articles, f, ensure_ascii=False, indent=4)
-        
-    print(f"\n✅ Successfully scraped {len(scraped_articles)} articles and saved to {filename}")
\ No newline at end of file
+
+    scraper_state = ScraperState()
+    if not os.path.exists(config.SCRAPER_STATE_PATH):
+        # First run with a state file: don't re-download what earlier runs saved
+        scraper_state.seed_from(config.RAW_NEWS_DIR)
+
+    # --- APPEND EACH ARTICLE TO TODAY'S JSONL FILE AS IT ARRIVES ---
+    with JsonlWriter(raw_news_path()) as writer:
+        for article in scrape_articles(financial_feeds, scraper_state):
+            writer.write(article)
+
+    print(f"\n✅ Successfully scraped {writer.written} new articles and saved to {writer.path}")
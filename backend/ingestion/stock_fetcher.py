@@ -1,6 +1,31 @@
-import yfinance as yf
-import pandas as pd
+# ingestion/stock_fetcher.py
+"""
+Incremental daily price store for the tracked tickers.
+
+Prices and indicators live in one long table (Date, Ticker, OHLCV, indicator
+and indicator-state columns) stored as a directory of Parquet parts. Each
+update fetches only the days after the last stored row, for all tickers in
+one batched call to the data source, computes the indicators of the new rows
+from the last stored state (see indicators.py) and appends them as a new part.
+
+    python backend/ingestion/stock_fetcher.py                 # fetch from Yahoo Finance
+    python backend/ingestion/stock_fetcher.py --from-csv backend/data/stock_data
+"""
 import os
+import sys
+import glob
+import logging
+import argparse
+import datetime
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import numpy as np
+import pandas as pd
+
+from backend import config
+from backend.ingestion.indicators import INDICATOR_COLUMNS, STATE_COLUMNS, calculate_indicators, compute, state_of  # noqa: F401
 
 STOCKS = {
     "RELIANCE.NS": "Reliance",
@@ -10,21 +35,213 @@ STOCKS = {
     "HDFCBANK.NS": "HDFC Bank",
 }
 
-OUTPUT_DIR = "data/stock_data/"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+COLUMNS = ["Date", "Ticker"] + PRICE_COLUMNS + INDICATOR_COLUMNS + STATE_COLUMNS
+
+
+class YahooFinanceSource:
+    """Daily bars from Yahoo Finance: one yf.download call for all tickers."""
+
+    def fetch(self, tickers, start, end):
+        # Imported here so STOCKS can be used (e.g. by the embedder) without yfinance installed
+        import yfinance as yf
+
+        data = yf.download(list(tickers), start=start.isoformat(), end=(end + datetime.timedelta(days=1)).isoformat(),
+                           interval="1d", group_by="ticker", auto_adjust=False, progress=False, threads=True)
+        if data.empty:
+            return pd.DataFrame(columns=["Date", "Ticker"] + PRICE_COLUMNS)
+        if not isinstance(data.columns, pd.MultiIndex):
+            data.columns = pd.MultiIndex.from_product([list(tickers), data.columns])
+        frames = []
+        for ticker in data.columns.get_level_values(0).unique():
+            frame = data[ticker][PRICE_COLUMNS].dropna(subset=["Close"]).reset_index()
+            frame = frame.rename(columns={frame.columns[0]: "Date"})
+            frame["Ticker"] = ticker
+            frames.append(frame)
+        return pd.concat(frames, ignore_index=True)
+
+
+class CsvDirectorySource:
+    """
+    Daily bars read from per-company CSV files (Date, Open, High, Low, Close,
+    Volume, ...) named after the ticker without its exchange suffix, such as
+    the older data/stock_data/*.csv. Works offline, e.g. for tests or to
+    import those files into the store.
+    """
+
+    def __init__(self, directory, suffix=".NS"):
+        self.directory = directory
+        self.suffix = suffix
+
+    def tickers(self):
+        """The tickers with a CSV file in the directory."""
+        return [os.path.basename(path)[:-len(".csv")] + self.suffix
+                for path in sorted(glob.glob(os.path.join(self.directory, "*.csv")))]
+
+    def fetch(self, tickers, start, end):
+        frames = []
+        for ticker in tickers:
+            path = os.path.join(self.directory, ticker.removesuffix(self.suffix) + ".csv")
+            if not os.path.exists(path):
+                continue
+            frame = pd.read_csv(path, usecols=["Date"] + PRICE_COLUMNS, parse_dates=["Date"])
+            frame = frame[(frame["Date"].dt.date >= start) & (frame["Date"].dt.date <= end)]
+            frame["Ticker"] = ticker
+            frames.append(frame)
+        if not frames:
+            return pd.DataFrame(columns=["Date", "Ticker"] + PRICE_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+
+class PriceStore:
+    """
+    The price table on disk: a directory of Parquet parts, each one appended
+    batch of rows. Parts are compacted into one once there are more than
+    ``max_parts``.
+    """
+
+    def __init__(self, path=config.STOCK_STORE_DIR, max_parts=32):
+        self.path = path
+        self.max_parts = max_parts
+
+    def parts(self):
+        return sorted(glob.glob(os.path.join(self.path, "part-*.parquet")))
+
+    def _next_name(self):
+        # part-<sequence>.parquet: names sort in the order the parts were written
+        parts = self.parts()
+        last = int(os.path.basename(parts[-1])[5:13]) if parts else -1
+        return f"part-{last + 1:08d}.parquet"
+
+    def load(self, columns=None):
+        parts = self.parts()
+        if not parts:
+            return pd.DataFrame(columns=columns or COLUMNS)
+        frame = pd.concat([pd.read_parquet(part, columns=columns) for part in parts], ignore_index=True)
+        return frame.sort_values(["Ticker", "Date"], kind="stable", ignore_index=True) if "Date" in frame else frame
+
+    def _write(self, frame, name):
+        os.makedirs(self.path, exist_ok=True)
+        # Per process: workers importing the same part at once must not share a temporary file
+        tmp_path = os.path.join(self.path, f".{name}.{os.getpid()}.tmp")
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, os.path.join(self.path, name))
+
+    def append(self, frame):
+        if frame.empty:
+            return
+        self._write(frame[COLUMNS], self._next_name())
+        if len(self.parts()) > self.max_parts:
+            self.compact()
+
+    def compact(self):
+        parts = self.parts()
+        if len(parts) < 2:
+            return
+        frame = self.load()
+        # Written under the next name, so it sorts after the parts it replaces; they go once it is in place
+        self._write(frame, self._next_name())
+        for part in parts:
+            os.remove(part)
+
+    def tails(self, n=5):
+        """The last ``n`` stored rows of each ticker, oldest first."""
+        frame = self.load(["Date", "Ticker", "Close"] + INDICATOR_COLUMNS + STATE_COLUMNS)
+        return {ticker: rows.tail(n) for ticker, rows in frame.groupby("Ticker", sort=False)}
+
+
+def _new_rows(ticker, bars, stored_tail, store):
+    """Indicator columns for one ticker's new bars, continuing from its stored rows."""
+    bars = bars.sort_values("Date", ignore_index=True)
+    state = state_of(stored_tail)
+    if state is None and stored_tail is not None and len(stored_tail):
+        # Too little history for seeded averages: recompute the ticker's whole (short) series
+        history = store.load()
+        history = history[history["Ticker"] == ticker][["Date", "Ticker"] + PRICE_COLUMNS]
+        bars = pd.concat([history, bars], ignore_index=True)
+        columns = compute(bars["Close"].to_numpy())
+        frame = bars.assign(**columns)
+        return frame.iloc[len(history):], True
+    return bars.assign(**compute(bars["Close"].to_numpy(), state)), False
+
+
+def update(tickers=None, source=None, store=None, lookback_days=365, today=None):
+    """
+    Fetches the days after the last stored row (``lookback_days`` of history
+    for a ticker not stored yet) in one batched call and appends them with
+    their indicators. Returns the number of rows added.
+    """
+    tickers = list(tickers or STOCKS)
+    source = source or YahooFinanceSource()
+    store = store or PriceStore()
+    today = today or datetime.date.today()
+
+    tails = store.tails()
+    last = {ticker: pd.Timestamp(rows["Date"].iloc[-1]).date() for ticker, rows in tails.items()}
+    starts = {ticker: last[ticker] + datetime.timedelta(days=1) if ticker in last
+              else today - datetime.timedelta(days=lookback_days) for ticker in tickers}
+    start = min(starts.values())
+    if start > today:
+        logging.info("Stock data is up to date")
+        return 0
+
+    logging.info(f"Fetching {len(tickers)} tickers from {start} to {today}")
+    bars = source.fetch(tickers, start, today)
+    if bars.empty:
+        return 0
+    bars["Date"] = pd.to_datetime(bars["Date"]).dt.tz_localize(None).dt.normalize()
+
+    frames, rebuilt = [], []
+    for ticker, rows in bars.groupby("Ticker", sort=False):
+        rows = rows[rows["Date"].dt.date >= starts.get(ticker, start)]
+        if rows.empty:
+            continue
+        frame, recomputed = _new_rows(ticker, rows, tails.get(ticker), store)
+        frames.append(frame)
+        if recomputed:
+            rebuilt.append(ticker)
+    if rebuilt:
+        logging.info(f"Recomputed indicators over the short stored history of {rebuilt}")
+    if not frames:
+        return 0
+    new = pd.concat(frames, ignore_index=True)
+    new["Volume"] = new["Volume"].astype(np.float64)
+    store.append(new)
+    logging.info(f"Appended {len(new)} rows for {new['Ticker'].nunique()} tickers")
+    return len(new)
+
+
+def import_csv_if_empty(store=None, directory=config.STOCK_DATA_DIR):
+    """
+    Imports every per-company CSV in ``directory`` (all of their history, for
+    tickers beyond STOCKS too) into ``store`` if it has no parts yet, so the
+    screener has prices before the first fetch. Returns the number of rows added.
+    """
+    store = store or PriceStore()
+    if store.parts() or not glob.glob(os.path.join(directory, "*.csv")):
+        return 0
+    # Workers starting together each write the same rows as part-00000000, so a race is harmless
+    today = datetime.date.today()
+    source = CsvDirectorySource(directory)
+    added = update(source.tickers(), source=source, store=store,
+                   lookback_days=(today - datetime.date(1970, 1, 1)).days, today=today)
+    logging.info(f"Imported {added} rows from {directory} into the empty price store {store.path}")
+    return added
 
-def calculate_indicators(df):
-    df["RSI"] = df["Close"].rolling(window=14).mean()
-    df["Returns"] = df["Close"].pct_change() * 100
-    df["Perf"] = df["Close"].pct_change(periods=5) * 100
-    return df
 
 def fetch():
-    for ticker, name in STOCKS.items():
-        stock = yf.download(ticker, period="1mo", interval="1d")
-        if stock.empty: continue
-        stock = calculate_indicators(stock)
-        stock.to_csv(os.path.join(OUTPUT_DIR, f"{name}.csv"))
+    """Updates the price store from Yahoo Finance."""
+    return update()
+
 
 if __name__ == "__main__":
-    fetch()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Incrementally update the stock price store")
+    parser.add_argument("--tickers", nargs="*", default=None, help="tickers to update (default: STOCKS)")
+    parser.add_argument("--from-csv", default=None, help="import from per-company CSV files instead of Yahoo Finance")
+    parser.add_argument("--lookback-days", type=int, default=365, help="history fetched for a new ticker")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    data_source = CsvDirectorySource(args.from_csv) if args.from_csv else YahooFinanceSource()
+    added = update(args.tickers, data_source, lookback_days=args.lookback_days)
+    print(f"✅ Added {added} rows to {config.STOCK_STORE_DIR}")
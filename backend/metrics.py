@@ -0,0 +1,201 @@
+import json
+import time
+import bisect
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from backend import config
+
+# Latency buckets (seconds) from sub-millisecond index lookups up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}_total{_format_labels(self.labelnames, key)} {value}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_sample(self, key, state):
+        counts, total, count = state
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', bound)])} {cumulative}")
+        lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {count}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    """
+    Process-local metric registry rendered in the Prometheus text format.
+    Each uvicorn worker keeps its own values; scrape every worker (or run one).
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = Histogram("finrag_stage_duration_seconds", "Time spent in each stage of the RAG path", ["stage"])
+STAGE_ERRORS = Counter("finrag_stage_errors", "Exceptions raised inside a RAG stage", ["stage"])
+REQUEST_SECONDS = Histogram("finrag_http_request_duration_seconds", "HTTP handler latency (until the response "
+                            "starts, for streams)", ["method", "route", "status"])
+REQUESTS = Counter("finrag_http_requests", "HTTP requests handled", ["method", "route", "status"])
+CACHE_LOOKUPS = Counter("finrag_cache_lookups", "Cache lookups by cache and outcome", ["cache", "result"])
+COALESCED_REQUESTS = Counter("finrag_coalesced_requests", "Requests that joined an identical in-flight request "
+                             "instead of running their own", ["path"])
+LLM_TOKENS = Counter("finrag_llm_tokens", "Gemini tokens, as reported in usageMetadata", ["direction"])
+RETRIEVED_CHUNKS = Histogram("finrag_retrieved_chunks", "Chunks returned per retrieval", [],
+                             buckets=(0, 1, 2, 4, 8, 16, 32, 64))
+CONTEXT_TOKENS = Histogram("finrag_context_tokens", "Estimated tokens of retrieved chunks vs. the packed prompt "
+                          "context", ["stage"], buckets=(128, 256, 512, 1024, 2048, 4096, 8192, 16384))
+
+_trace = contextvars.ContextVar("finrag_trace", default=None)
+
+
+def observe_stage(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    trace = _trace.get()
+    if trace is not None:
+        trace.append((stage, seconds))
+
+
+@contextmanager
+def span(stage):
+    """Times a stage into finrag_stage_duration_seconds (and the current request trace, if any)."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        # Not BaseException: a client disconnecting (CancelledError, GeneratorExit) is not a stage error
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def trace_request(name, **fields):
+    """
+    Collects the spans of one request and logs them as a single structured line:
+    {"trace": name, "total_ms": ..., "spans": {stage: ms, ...}, **fields}
+    Nested traces fold their spans into the outermost one.
+    """
+    if _trace.get() is not None:
+        yield fields
+        return
+    spans = []
+    # Set/restore rather than ContextVar.reset: async generators (SSE streams)
+    # may be finalised from another context
+    _trace.set(spans)
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        _trace.set(None)
+        if config.TRACE_LOG:
+            timings = {}
+            for stage, seconds in spans:
+                timings[stage] = round(timings.get(stage, 0.0) + seconds * 1000, 3)
+            record = {"trace": name, "total_ms": round((time.perf_counter() - start) * 1000, 3),
+                      "spans": timings, **fields}
+            logging.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+def record_llm_usage(usage):
+    """Counts tokens from a Gemini ``usageMetadata`` dict (REST) or ``usage_metadata`` object (SDK)."""
+    if usage is None:
+        return
+    get = usage.get if isinstance(usage, dict) else lambda name: getattr(usage, _snake(name), None)
+    prompt, candidates = get("promptTokenCount"), get("candidatesTokenCount")
+    if prompt:
+        LLM_TOKENS.inc(prompt, direction="in")
+    if candidates:
+        LLM_TOKENS.inc(candidates, direction="out")
+
+
+def _snake(name):
+    return "".join(f"_{c.lower()}" if c.isupper() else c for c in name)
+
+
+def render():
+    return REGISTRY.render()
@@ -0,0 +1,29 @@
+"""
+Keys identifying a query, shared by the caches and the request coalescing.
+
+Kept free of heavy imports (numpy, FAISS, LangChain) so the API module can
+use it without loading the retrieval stack.
+"""
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a query, used as the cache key"""
+    return " ".join(query.lower().split())
+
+
+def request_key(query, filters=None):
+    """
+    Key of a query with its retrieval filters, for coalescing requests: the
+    normalised query plus the filters in canonical form (empty ones dropped,
+    values normalised and list order ignored), so the same question with other
+    filters never shares an answer.
+    """
+    canonical = {}
+    for name, value in sorted((filters or {}).items()):
+        if not value:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            canonical[name] = tuple(sorted({normalize_query(str(v)) for v in value}))
+        else:
+            canonical[name] = normalize_query(str(value))
+    return normalize_query(query), tuple(canonical.items())
@@ -1,106 +1,202 @@
 import os
+import random
 import google.generativeai as genai
 from dotenv import load_dotenv
 import logging
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from backend import config
+from backend.metrics import CONTEXT_TOKENS, RETRIEVED_CHUNKS, record_llm_usage, span, trace_request
+from backend.retriever.embeddings import get_embeddings
+from backend.retriever.query_cache import QueryEmbeddingCache, normalize_query
+from backend.retriever.vector_store import EmbeddingModelMismatch
+from backend.retriever.versioned_store import VersionedStore
+from backend.retriever.retriever import expand_query, reciprocal_rank_fusion
+from backend.retriever.screener import Screener, answer_question
+from backend.generator.answer_cache import SemanticAnswerCache, chunk_set_key
+from backend.generator.context_packer import build_context
 
 # --- Configuration and Setup ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 load_dotenv()
 api_key = os.getenv("GOOGLE_API_KEY")
-print("GOOGLE_API_KEY loaded for Gemini:", api_key)  # Debug print
+if not api_key:
+    logging.warning("GOOGLE_API_KEY is not set; Gemini calls will fail")
 
 genai.configure(api_key=api_key)
 
+NO_CONTEXT_ANSWER = "Sorry, I couldn't find relevant information to answer your question."
+
 class RAGPipeline:
-    def __init__(self, vector_store_path="embeddings/vector_store"):
+    def __init__(self, vector_store_path=config.VECTOR_STORE_DIR, embeddings=None, llm=None, screener=None):
         self.vector_store_path = vector_store_path
-        self.llm = genai.GenerativeModel('gemini-1.5-flash-latest')
-        self.vectordb = None
-        self.embeddings = None
+        # Answers screening questions ("10 stocks below 1000") from the price store
+        self.screener = screener if screener is not None else Screener()
+        # Anything with generate_content(prompt) -> response.text; defaults to Gemini
+        self.llm = llm if llm is not None else genai.GenerativeModel('gemini-1.5-flash-latest')
+        self.store = None
+        self.embeddings = embeddings
+        self.query_cache = None
+        self.answer_cache = SemanticAnswerCache()
         self._load_vector_store()
 
     def _load_vector_store(self):
-        """Loads the LangChain FAISS vector store from disk."""
+        """Opens the FAISS vector store (memory-mapped, article records loaded lazily)."""
         try:
-            logging.info("Loading LangChain FAISS vector store from disk...")
+            logging.info("Loading FAISS vector store from disk...")
             
-            # Initialize embeddings (same as used in embedder)
-            self.embeddings = GoogleGenerativeAIEmbeddings(
-                model="models/embedding-001",
-                google_api_key=os.getenv("GOOGLE_API_KEY")
-            )
+            # Initialize embeddings (same backend as used in embedder)
+            if self.embeddings is None:
+                self.embeddings = get_embeddings()
+            self.query_cache = QueryEmbeddingCache(self.embeddings)
             
-            # Load the FAISS vector store
-            self.vectordb = FAISS.load_local(
-                self.vector_store_path, 
-                self.embeddings,
-                allow_dangerous_deserialization=True
-            )
+            # Open the FAISS vector store (newer versions are swapped in once warm_up() starts the watcher)
+            self.store = VersionedStore(self.vector_store_path, self.embeddings)
             
             logging.info("Vector store loaded successfully.")
-            logging.info(f"Total vectors in store: {self.vectordb.index.ntotal}")
+            logging.info(f"Total vectors in store: {self.vectordb.ntotal}")
             
+        except EmbeddingModelMismatch:
+            raise
         except Exception as e:
             logging.error(f"Error loading vector store: {e}")
             raise FileNotFoundError(
-                "LangChain FAISS vector store not found. "
+                "FAISS vector store not found. "
                 "Please run the embedder.py first to create embeddings."
             )
             
-    def retrieve_relevant_chunks(self, query, k=15):  # Increased k for more chunks
+    @property
+    def vectordb(self):
+        """The vector store version being served."""
+        return self.store.current
+
+    def warm_up(self):
         """
-        Retrieves the top-k most relevant chunks using LangChain FAISS.
+        Pays the one-off loading costs (article records, page faults) before
+        the first query, and starts watching for new vector store versions.
         """
+        self.vectordb.warm_up()
+        self.store.start()
+        logging.info("RAG pipeline warmed up.")
+
+    def close(self):
+        """Stops watching for new vector store versions."""
+        if self.store is not None:
+            self.store.stop()
+
+    def retrieve_relevant_chunks(self, query, k=config.RETRIEVAL_K, filters=None):
+        """
+        Retrieves the top-k most relevant chunks: dense FAISS results and BM25
+        keyword results fused with reciprocal rank fusion, so entity-heavy
+        queries ("RIL recent trends") are found without inflating k.
+        ``filters`` (tickers / sources / date_from / date_to, see
+        VectorStore.filter_mask) restrict both searches to matching chunks; a
+        date window also limits the dense search to the index shards it spans.
+        With FINRAG_RECENCY_HALF_LIFE_DAYS the fused scores decay with article age.
+        """
+        return self.retrieve_many([query], k, filters)[0]
+
+    def retrieve_many(self, queries, k=config.RETRIEVAL_K, filters=None):
+        """
+        retrieve_relevant_chunks for a list of queries, e.g. a dashboard page's
+        questions. Repeated queries (same normalised text) are retrieved once,
+        the distinct ones embedded in one batched call and searched with one
+        multi-row FAISS search. Returns one chunk list per query, in order.
+        """
+        if not queries:
+            return []
         try:
-            # Use LangChain's similarity search
-            docs = self.vectordb.similarity_search(query, k=k)
-
-            # Convert LangChain documents to our expected format
-            retrieved_chunks = []
-            for i, doc in enumerate(docs, 1):
-                chunk = {
-                    'content': doc.page_content,
-                    'source': doc.metadata.get('url', 'Unknown'),
-                    'title': doc.metadata.get('title', 'No title'),
-                    'metadata': doc.metadata
-                }
-                retrieved_chunks.append(chunk)
-                # Debug log for chunk content
-                logging.info(f"Chunk {i}: Title: {chunk['title']} | Source: {chunk['source']} | Content: {chunk['content'][:200]}")
-
-            logging.info(f"Retrieved {len(retrieved_chunks)} chunks for query")
-            # Check for 'reliance' in any chunk
-            found = any('reliance' in chunk['content'].lower() or 'reliance' in chunk['title'].lower() for chunk in retrieved_chunks)
-            if found:
-                logging.info("At least one chunk contains 'Reliance'.")
-            else:
-                logging.warning("No chunk contains 'Reliance'.")
-            return retrieved_chunks
+            keys = [normalize_query(query) for query in queries]
+            # First spelling of each distinct query; BM25 and alias expansion see it as typed
+            distinct = {}
+            for key, query in zip(keys, queries):
+                distinct.setdefault(key, query)
+
+            # Embed through the query cache, then search by vector so repeated
+            # questions never hit the embeddings API
+            with span("embed_query"):
+                query_vectors = self.query_cache.embed_queries(list(distinct.values()))
+            n_candidates = k * config.HYBRID_CANDIDATES_PER_K
+            results = {}
+            # One store version for the whole search: row ids differ between versions
+            with self.store.acquire() as vectordb:
+                with span("dense_search"):
+                    dense = vectordb.search_rows_many(np.stack(query_vectors), n_candidates, filters)
+                with span("keyword_search"):
+                    sparse = [vectordb.keyword_search_rows(expand_query(query), n_candidates, filters)[0]
+                              for query in distinct.values()]
+
+                with span("fuse_and_fetch"):
+                    for key, (dense_rows, _), sparse_rows in zip(distinct, dense, sparse):
+                        weights = None
+                        if config.RECENCY_HALF_LIFE_DAYS > 0:
+                            candidates = np.union1d(dense_rows, sparse_rows)
+                            decay = vectordb.recency_weights(candidates, config.RECENCY_HALF_LIFE_DAYS)
+                            weights = dict(zip(candidates.tolist(), decay.tolist()))
+                        rows = reciprocal_rank_fusion([dense_rows, sparse_rows], k, weights=weights)
+                        results[key] = [self._to_chunk(vectordb.get_document(row)) for row in rows]
+                        logging.debug(f"Retrieved {len(rows)} chunks for query {key!r} "
+                                      f"({len(dense_rows)} dense / {len(sparse_rows)} keyword candidates)")
+
+            for retrieved_chunks in results.values():
+                RETRIEVED_CHUNKS.observe(len(retrieved_chunks))
+                # Per-chunk logging is costly on the hot path; only a sample of queries get it
+                if config.DEBUG_CHUNK_SAMPLE_RATE and random.random() < config.DEBUG_CHUNK_SAMPLE_RATE:
+                    for i, chunk in enumerate(retrieved_chunks, 1):
+                        logging.info(f"Chunk {i}: Title: {chunk['title']} | Source: {chunk['source']} | Content: {chunk['content'][:200]}")
+            return [list(results[key]) for key in keys]
 
         except Exception as e:
             logging.error(f"Error during chunk retrieval: {e}")
-            return []
+            return [[] for _ in queries]
+
+    @staticmethod
+    def _to_chunk(doc):
+        """A retrieved LangChain document in our chunk format"""
+        return {
+            'content': doc.page_content,
+            'source': doc.metadata.get('url', 'Unknown'),
+            'title': doc.metadata.get('title', 'No title'),
+            'metadata': doc.metadata
+        }
+
+    def cache_stats(self):
+        """Hit/miss counters of the pipeline's caches"""
+        return {
+            "query_embeddings": self.query_cache.stats() if self.query_cache else None,
+            "answers": self.answer_cache.stats(),
+        }
 
-    def generate_answer(self, query):
+    def lookup_cached_answer(self, query, retrieved_chunks):
         """
-        The main RAG function. Retrieves context and generates an answer.
+        Checks the semantic answer cache. Returns (answer or None, cache_key);
+        pass cache_key to store_answer() once a fresh answer has been generated.
         """
-        logging.info(f"Received query: {query}")
-        retrieved_chunks = self.retrieve_relevant_chunks(query)
+        # A paraphrase of a recent question over the same context and index version
+        # gets the cached answer instead of another Gemini call
+        cache_key = (
+            self.query_cache.embed_query(query),
+            chunk_set_key(retrieved_chunks),
+            self.store.version,
+        )
+        return self.answer_cache.lookup(*cache_key), cache_key
 
-        if not retrieved_chunks:
-            return "Sorry, I couldn't find relevant information to answer your question."
+    def store_answer(self, cache_key, answer):
+        self.answer_cache.store(*cache_key, answer)
 
-        # Format the retrieved context for the prompt
-        context = "\n\n---\n\n".join([
-            f"Source: {chunk['source']}\nTitle: {chunk['title']}\nContent: {chunk['content']}" 
-            for chunk in retrieved_chunks
-        ])
+    def build_prompt(self, query, retrieved_chunks):
+        """Formats the retrieved chunks and the question into the Gemini prompt."""
+        # Overlapping chunks are merged, near-duplicates dropped and the rest packed
+        # into FINRAG_CONTEXT_TOKEN_BUDGET, with each source cited once
+        context, stats = build_context(retrieved_chunks)
+        CONTEXT_TOKENS.observe(stats["retrieved_tokens"], stage="retrieved")
+        CONTEXT_TOKENS.observe(stats["context_tokens"], stage="packed")
+        logging.debug(f"Packed context: {stats}")
 
         # Improved prompt for Gemini
-        prompt = f"""
+        return f"""
         You are FinRAG, a specialized financial AI assistant.
 
         Your task is to answer the user's question based **only** on the context provided below. The context contains snippets from recent news articles and stock market data.
@@ -108,7 +204,7 @@ class RAGPipeline:
         - Synthesize the information from all provided sources to form a coherent answer.
         - If the context does not contain enough information to answer the question, state that clearly.
         - Do not use any external knowledge or information you were trained on.
-        - Quote or reference the source of the information where possible.
+        - Cite the sources you use by their number, e.g. [1] or [2][3].
         - If you find information about 'Reliance', highlight it in your answer.
 
         CONTEXT:
@@ -121,14 +217,82 @@ class RAGPipeline:
         ANSWER:
         """
 
+    def generate_answer(self, query, filters=None):
+        """
+        The main RAG function. Retrieves context and generates an answer.
+        """
+        logging.info(f"Received query: {query}")
+        with trace_request("generate_answer") as trace:
+            with span("screener"):
+                screened = answer_question(self.screener, query, (filters or {}).get("tickers"))
+            trace["screener"] = screened is not None
+            if screened is not None:
+                return screened
+
+            with span("retrieve"):
+                retrieved_chunks = self.retrieve_relevant_chunks(query, filters=filters)
+
+            answer, cached = self.answer_from_chunks(query, retrieved_chunks)
+            trace["cached"] = cached
+            return answer
+
+    def answer_from_chunks(self, query, retrieved_chunks):
+        """
+        Generation half of generate_answer for already retrieved chunks.
+        Returns (answer, whether it came from the answer cache).
+        """
+        if not retrieved_chunks:
+            return NO_CONTEXT_ANSWER, False
+
+        with span("answer_cache_lookup"):
+            cached, cache_key = self.lookup_cached_answer(query, retrieved_chunks)
+        if cached is not None:
+            logging.info("Serving answer from semantic answer cache.")
+            return cached, True
+
+        with span("build_prompt"):
+            prompt = self.build_prompt(query, retrieved_chunks)
+
         try:
             logging.info("Generating answer with Gemini Pro...")
-            response = self.llm.generate_content(prompt)
+            with span("llm_generate"):
+                response = self.llm.generate_content(prompt)
+            record_llm_usage(getattr(response, "usage_metadata", None))
             logging.info(f"Generated answer: {response.text[:200]}...")  # Log the start of the generated answer
-            return response.text
+            self.store_answer(cache_key, response.text)
+            return response.text, False
         except Exception as e:
             logging.error(f"Error during answer generation: {e}")
-            return "Sorry, I encountered an error while generating the answer. Please check the logs."
+            return "Sorry, I encountered an error while generating the answer. Please check the logs.", False
+
+    def generate_many(self, queries, filters=None, max_concurrency=config.BATCH_GENERATE_CONCURRENCY):
+        """
+        generate_answer for a list of queries: screening questions go to the
+        screener, the rest are retrieved together (retrieve_many) and their
+        answers generated by up to ``max_concurrency`` concurrent LLM calls,
+        one per distinct query. Returns the answers in order.
+        """
+        with trace_request("generate_many", queries=len(queries)):
+            keys = [normalize_query(query) for query in queries]
+            distinct = {}
+            for key, query in zip(keys, queries):
+                distinct.setdefault(key, query)
+            answers = {}
+            with span("screener"):
+                for key, query in distinct.items():
+                    screened = answer_question(self.screener, query, (filters or {}).get("tickers"))
+                    if screened is not None:
+                        answers[key] = screened
+            rest = [key for key in distinct if key not in answers]
+            rest_queries = [distinct[key] for key in rest]
+
+            with span("retrieve"):
+                retrieved = self.retrieve_many(rest_queries, filters=filters)
+            if rest:
+                with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(rest)))) as pool:
+                    for key, (answer, _) in zip(rest, pool.map(self.answer_from_chunks, rest_queries, retrieved)):
+                        answers[key] = answer
+            return [answers[key] for key in keys]
 
     def debug_search(self, query, k=3):
         """Debug method to see what chunks are being retrieved"""
@@ -156,8 +320,7 @@ class RAGPipeline:
 
 # --- Main Execution for Testing ---
 if __name__ == '__main__':
-    configure_genai()
-    
+    # genai is configured with GOOGLE_API_KEY when this module is imported
     try:
         rag_pipeline = RAGPipeline()
         
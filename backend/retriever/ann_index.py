@@ -0,0 +1,221 @@
+import math
+import logging
+
+import faiss
+import numpy as np
+
+from backend import config
+
+# Named index types accepted by FINRAG_INDEX_TYPE / build_index; anything else
+# is passed to faiss.index_factory as is (e.g. "IVF1024,PQ64x4fs")
+INDEX_TYPES = ("flat", "sq8", "sqfp16", "hnsw", "hnsw_sq8", "ivf", "ivf_sq8", "ivf_pq")
+
+
+# faiss's k-means wants at least this many training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+# Smallest PQ codebooks (2**bits centroids) worth building; fewer training points fall back to IVF / flat
+MIN_PQ_BITS = 4
+
+
+def _nlist(n_train):
+    nlist = config.INDEX_NLIST or int(4 * math.sqrt(max(n_train, 1)))
+    return max(1, min(nlist, n_train // MIN_POINTS_PER_CENTROID))
+
+
+def _pq_nbits(n_train):
+    """Bits per PQ code: the largest codebook ``n_train`` points can train (2**nbits <= n / 39), at most 8."""
+    fit = n_train // MIN_POINTS_PER_CENTROID
+    return min(8, fit.bit_length() - 1) if fit else 0
+
+
+def _pq_m(dim, n_train):
+    # Fewer training points: fewer, coarser sub-quantizers (each trains its own codebook)
+    m = min(config.INDEX_PQ_M or min(dim // 8, max(8, n_train // 256)), dim) or 1
+    while dim % m:
+        m -= 1
+    return m
+
+
+def effective_index_type(index_type, n_train):
+    """``index_type``, or what is built instead when ``n_train`` vectors are too few to train it."""
+    if index_type.lower() == "ivf_pq" and _pq_nbits(n_train) < MIN_PQ_BITS:
+        return "ivf" if _nlist(n_train) > 1 else "flat"
+    return index_type
+
+
+def factory_string(index_type, dim, n_train):
+    """faiss.index_factory description of ``index_type`` for ``n_train`` training vectors."""
+    index_type = effective_index_type(index_type, n_train)
+    specs = {
+        "flat": "Flat",
+        "sq8": "SQ8",
+        "sqfp16": "SQfp16",
+        "hnsw": f"HNSW{config.INDEX_HNSW_M}",
+        "hnsw_sq8": f"HNSW{config.INDEX_HNSW_M},SQ8",
+        "ivf": f"IVF{_nlist(n_train)},Flat",
+        "ivf_sq8": f"IVF{_nlist(n_train)},SQ8",
+        "ivf_pq": f"IVF{_nlist(n_train)},PQ{_pq_m(dim, n_train)}x{_pq_nbits(n_train)}",
+    }
+    return specs.get(index_type.lower(), index_type)
+
+
+def training_sample(vectors):
+    """
+    At most config.INDEX_TRAIN_SIZE of ``vectors``, picked at random (fixed
+    seed), so training time does not grow with the corpus. The IVF list count
+    and PQ codebook sizes follow the sample size.
+    """
+    if len(vectors) <= config.INDEX_TRAIN_SIZE:
+        return vectors
+    picked = np.random.default_rng(0).choice(len(vectors), config.INDEX_TRAIN_SIZE, replace=False)
+    return vectors[np.sort(picked)]
+
+
+def build_index(dim, index_type, training_vectors):
+    """
+    Empty index of the given type whose ids are chunk rows, trained on
+    ``training_vectors`` (a sample of them, see training_sample) when the
+    type needs it (IVF centroids, PQ/SQ codebooks). Too few vectors for an
+    IVF-PQ index build an IVF (or flat) one instead, with a warning.
+
+    IVF indexes store ids natively; every other type is wrapped in an
+    IndexIDMap2. (IDMap over IVF would mislabel results after remove_ids,
+    since IVF does not renumber its internal ids.)
+    """
+    training_vectors = training_sample(np.asarray(training_vectors, dtype=np.float32))
+    n_train = len(training_vectors)
+    built_type = effective_index_type(index_type, n_train)
+    if built_type != index_type:
+        logging.warning(f"{n_train} vectors are too few to train a {index_type} index "
+                        f"(needs {MIN_POINTS_PER_CENTROID << MIN_PQ_BITS}); building {built_type} instead")
+    index = faiss.index_factory(dim, factory_string(index_type, dim, n_train))
+    if isinstance(index, faiss.IndexIVFPQ):
+        # Polysemous codes are never used for search, and training them dominates the build time
+        index.do_polysemous_training = False
+    if not isinstance(index, faiss.IndexIVF):
+        index = faiss.IndexIDMap2(index)
+    if not index.is_trained:
+        index.train(training_vectors)
+    return index
+
+
+def needs_training(index_type, dim):
+    """True for index types that learn from data (IVF centroids, PQ / SQ codebooks)."""
+    return not faiss.index_factory(dim, factory_string(index_type, dim, 10000)).is_trained
+
+
+def base_index(index):
+    """The index doing the actual search, below any IndexIDMap wrapper."""
+    return faiss.downcast_index(index.index) if hasattr(index, "id_map") else index
+
+
+def describe(index):
+    return type(base_index(index)).__name__
+
+
+def stores_exact_vectors(index):
+    """False for quantized (PQ / SQ) indexes, whose vectors can only be read back approximately."""
+    return isinstance(base_index(index), (faiss.IndexFlat, faiss.IndexHNSWFlat, faiss.IndexIVFFlat))
+
+
+def supports_removal(index):
+    # HNSW graphs cannot drop nodes; removed rows stay in the graph and are
+    # excluded at search time through an ID selector instead
+    return not isinstance(base_index(index), faiss.IndexHNSW)
+
+
+def search_parameters(index, selector=None, nprobe=None, ef_search=None):
+    """
+    SearchParameters of the right type for ``index`` carrying the search-time
+    knobs (IVF nprobe, HNSW efSearch) and an optional ID selector.
+    """
+    inner = base_index(index)
+    kwargs = {} if selector is None else {"sel": selector}
+    if isinstance(inner, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(nprobe=nprobe or config.INDEX_NPROBE, **kwargs)
+    if isinstance(inner, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(efSearch=ef_search or config.INDEX_EF_SEARCH, **kwargs)
+    return faiss.SearchParameters(**kwargs) if kwargs else None
+
+
+def reconstruct_rows(index, rows):
+    """
+    Stored vectors of the given chunk rows (approximate for quantized indexes).
+    Needs a writable, in-memory index: IVF indexes get a hash-table direct map.
+    """
+    if isinstance(index, faiss.IndexIVF):
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index.reconstruct_batch(np.asarray(rows, dtype=np.int64))
+
+
+def index_bytes(index):
+    """Serialized size of the index, i.e. its size on disk."""
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def stored_ids(index):
+    """Ids (chunk rows) of every vector held by ``index``."""
+    if isinstance(index, faiss.IndexIVF):
+        invlists = index.invlists
+        ids = [faiss.rev_swig_ptr(invlists.get_ids(i), invlists.list_size(i)).copy()
+               for i in range(index.nlist) if invlists.list_size(i)]
+        return np.concatenate(ids).astype(np.int64) if ids else np.zeros(0, dtype=np.int64)
+    return faiss.vector_to_array(index.id_map).astype(np.int64)
+
+
+def empty_like(index):
+    """An empty index with the type and training (IVF centroids, codebooks) of ``index``."""
+    empty = faiss.clone_index(index)
+    empty.reset()
+    return empty
+
+
+def renumber_ids(index, new_ids):
+    """
+    ``index`` with each stored id (chunk row) ``r`` replaced by ``new_ids[r]``
+    and the vectors mapped to -1 left out. Codes are relabelled in place,
+    except in HNSW graphs still holding dropped rows, whose kept vectors are
+    read back into a new graph. Returns the relabelled (or new) index.
+    """
+    new_ids = np.asarray(new_ids, dtype=np.int64)
+    ids = stored_ids(index)
+    dropped = ids[new_ids[ids] < 0]
+    if len(dropped):
+        if not supports_removal(index):
+            rebuilt = empty_like(index)
+            kept = ids[new_ids[ids] >= 0]
+            if len(kept):
+                rebuilt.add_with_ids(reconstruct_rows(index, kept), new_ids[kept])
+            return rebuilt
+        index.remove_ids(dropped)
+    if isinstance(index, faiss.IndexIVF):
+        # A direct map (see reconstruct_rows) would still point at the old ids
+        index.set_direct_map_type(faiss.DirectMap.NoMap)
+        invlists = index.invlists
+        for i in range(index.nlist):
+            size = invlists.list_size(i)
+            if size:
+                list_ids = new_ids[faiss.rev_swig_ptr(invlists.get_ids(i), size)]
+                codes = faiss.rev_swig_ptr(invlists.get_codes(i), size * invlists.code_size).copy()
+                invlists.update_entries(i, 0, size, faiss.swig_ptr(list_ids), faiss.swig_ptr(codes))
+    else:
+        faiss.copy_array_to_vector(new_ids[faiss.vector_to_array(index.id_map)], index.id_map)
+        if hasattr(index, "rev_map"):
+            index.construct_rev_map()
+    return index
+
+
+def merge_into(target, source):
+    """
+    Adds the vectors of ``source`` to ``target``, an index with the same type
+    and training. Codes are moved as they are, except for HNSW (graphs cannot
+    be merged), whose vectors are read back and re-inserted.
+    """
+    if isinstance(base_index(target), faiss.IndexHNSW):
+        ids = stored_ids(source)
+        if len(ids):
+            target.add_with_ids(reconstruct_rows(source, ids), ids)
+    elif isinstance(target, faiss.IndexIVF):
+        target.merge_from(source, 0)
+    else:
+        target.merge_from(source)
@@ -0,0 +1,255 @@
+import os
+import re
+import json
+import hashlib
+
+import numpy as np
+
+# Files of the sparse index, stored in the vector store directory next to index.faiss
+TERMS_FILE = "bm25_terms.bin"                # UTF-8 terms in term id order, back to back
+TERM_OFFSETS_FILE = "bm25_term_offsets.npy"  # term t is terms[term_offsets[t]:term_offsets[t + 1]]
+TERM_HASHES_FILE = "bm25_term_hashes.npy"    # 64-bit hash of every term, ascending
+TERM_IDS_FILE = "bm25_term_ids.npy"          # term id of each hash
+OFFSETS_FILE = "bm25_offsets.npy"    # postings of term t are rows[offsets[t]:offsets[t + 1]]
+ROWS_FILE = "bm25_rows.npy"          # chunk row of each posting, ascending within a term
+TF_FILE = "bm25_tf.npy"              # term frequency of each posting
+DOCLEN_FILE = "bm25_doclen.npy"      # token count per chunk row (0 for deleted rows)
+POSTINGS_FILES = (OFFSETS_FILE, ROWS_FILE, TF_FILE, DOCLEN_FILE)
+TERM_FILES = (TERMS_FILE, TERM_OFFSETS_FILE, TERM_HASHES_FILE, TERM_IDS_FILE)
+# Vocabulary of indexes written before TermTable: a JSON list of terms in id order
+LEGACY_VOCAB_FILE = "bm25_vocab.json"
+
+_TOKEN_RE = re.compile(r"\w+")
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have in is it its of on or that the this to was were what which
+who will with about how me give recent based any some there their they them than then
+""".split())
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def bm25_exists(path, legacy=True):
+    """True if ``path`` holds a sparse index; with ``legacy=False`` only one in the current format."""
+    if not all(os.path.exists(os.path.join(path, name)) for name in POSTINGS_FILES):
+        return False
+    return (all(os.path.exists(os.path.join(path, name)) for name in TERM_FILES)
+            or legacy and os.path.exists(os.path.join(path, LEGACY_VOCAB_FILE)))
+
+
+def _term_hash(term):
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _save_array(path, array):
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, np.asarray(array))
+    os.replace(path + ".tmp", path)
+
+
+class TermTable:
+    """
+    Read-only term -> term id mapping over memory-mapped files, used instead
+    of a dict when serving: nothing is deserialised on load and every process
+    serving the store shares the same pages. A lookup is a binary search over
+    the sorted term hashes, confirmed against the stored term.
+    """
+
+    def __init__(self, path):
+        terms_path = os.path.join(path, TERMS_FILE)
+        self.terms = (np.memmap(terms_path, dtype=np.uint8, mode="r") if os.path.getsize(terms_path)
+                      else np.zeros(0, dtype=np.uint8))
+        self.offsets = np.load(os.path.join(path, TERM_OFFSETS_FILE), mmap_mode="r")
+        self.hashes = np.load(os.path.join(path, TERM_HASHES_FILE), mmap_mode="r")
+        self.ids = np.load(os.path.join(path, TERM_IDS_FILE), mmap_mode="r")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def term(self, term_id):
+        return bytes(self.terms[self.offsets[term_id]:self.offsets[term_id + 1]]).decode("utf-8")
+
+    def get(self, term, default=None):
+        key = np.uint64(_term_hash(term))
+        position = int(np.searchsorted(self.hashes, key))
+        # Terms with colliding hashes are adjacent
+        while position < len(self.hashes) and self.hashes[position] == key:
+            term_id = int(self.ids[position])
+            if self.term(term_id) == term:
+                return term_id
+            position += 1
+        return default
+
+    def __contains__(self, term):
+        return self.get(term) is not None
+
+    def __getitem__(self, term):
+        term_id = self.get(term)
+        if term_id is None:
+            raise KeyError(term)
+        return term_id
+
+    def items(self):
+        for term_id in range(len(self)):
+            yield self.term(term_id), term_id
+
+    @staticmethod
+    def save(vocab, path):
+        """Writes the files of a TermTable for ``vocab`` ({term: term id}, ids 0..n-1)."""
+        terms = [None] * len(vocab)
+        for term, i in vocab.items():
+            terms[i] = term
+        encoded = [term.encode("utf-8") for term in terms]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(term) for term in encoded], out=offsets[1:])
+        hashes = np.array([_term_hash(term) for term in terms], dtype=np.uint64)
+        order = np.argsort(hashes, kind="stable")
+        with open(os.path.join(path, TERMS_FILE + ".tmp"), "wb") as f:
+            f.writelines(encoded)
+        os.replace(os.path.join(path, TERMS_FILE + ".tmp"), os.path.join(path, TERMS_FILE))
+        _save_array(os.path.join(path, TERM_OFFSETS_FILE), offsets)
+        _save_array(os.path.join(path, TERM_HASHES_FILE), hashes[order])
+        _save_array(os.path.join(path, TERM_IDS_FILE), order.astype(np.int64))
+
+
+class BM25Index:
+    """
+    Persisted inverted index over chunk rows, scored with Okapi BM25.
+
+    Postings are kept as flat numpy arrays sorted by term (CSR layout), so a
+    query term is one slice lookup and the whole index can be memory-mapped.
+    Updates (add rows / remove rows) are vectorised merges rather than a rebuild.
+    """
+
+    def __init__(self, vocab, offsets, rows, tf, doclen, k1=1.5, b=0.75):
+        self.vocab = vocab                      # term -> term id (a dict, or a TermTable when memory-mapped)
+        self.offsets = offsets
+        self.rows = rows
+        self.tf = tf
+        self.doclen = doclen
+        self.k1 = k1
+        self.b = b
+        live = doclen > 0
+        self.n_docs = int(live.sum())
+        self.avgdl = float(doclen[live].mean()) if self.n_docs else 0.0
+
+    @classmethod
+    def empty(cls):
+        return cls({}, np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                   np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int32))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Opens the index in ``path``; memory-mapped (vocabulary included) unless ``mmap=False``, e.g. to update it."""
+        mode = "r" if mmap else None
+        if all(os.path.exists(os.path.join(path, name)) for name in TERM_FILES):
+            vocab = TermTable(path)
+            if not mmap:
+                vocab = dict(vocab.items())
+        else:
+            with open(os.path.join(path, LEGACY_VOCAB_FILE), "r", encoding="utf-8") as f:
+                vocab = {term: i for i, term in enumerate(json.load(f))}
+        arrays = [np.load(os.path.join(path, name), mmap_mode=mode) for name in POSTINGS_FILES]
+        return cls(vocab, *arrays)
+
+    @classmethod
+    def build(cls, texts_by_row, n_rows):
+        """texts_by_row: iterable of (row, text) for every live chunk."""
+        return cls.empty().updated(add=texts_by_row, n_rows=n_rows)
+
+    def save(self, path):
+        for name, array in zip(POSTINGS_FILES, (self.offsets, self.rows, self.tf, self.doclen)):
+            _save_array(os.path.join(path, name), array)
+        TermTable.save(self.vocab, path)
+
+    def updated(self, add=(), remove=(), n_rows=None):
+        """
+        Returns a new index with postings of ``remove`` rows dropped and
+        ``add`` [(row, text), ...] indexed. ``n_rows`` is the new chunk table size.
+        """
+        vocab = dict(self.vocab.items())
+        n_rows = len(self.doclen) if n_rows is None else n_rows
+        doclen = np.zeros(n_rows, dtype=np.int32)
+        kept = min(n_rows, len(self.doclen))
+        doclen[:kept] = self.doclen[:kept]
+
+        # Existing postings in COO form, minus removed rows
+        term_ids = np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int64), np.diff(self.offsets))
+        rows = np.asarray(self.rows, dtype=np.int64)
+        tf = np.asarray(self.tf, dtype=np.float32)
+        if len(remove):
+            remove = np.asarray(list(remove), dtype=np.int64)
+            keep = ~np.isin(rows, remove)
+            term_ids, rows, tf = term_ids[keep], rows[keep], tf[keep]
+            doclen[remove] = 0
+
+        new_terms, new_rows, new_tf = [], [], []
+        for row, text in add:
+            tokens = tokenize(text)
+            doclen[row] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                new_terms.append(vocab.setdefault(token, len(vocab)))
+                new_rows.append(row)
+                new_tf.append(count)
+
+        term_ids = np.concatenate([term_ids, np.asarray(new_terms, dtype=np.int64)])
+        rows = np.concatenate([rows, np.asarray(new_rows, dtype=np.int64)])
+        tf = np.concatenate([tf, np.asarray(new_tf, dtype=np.float32)])
+        order = np.lexsort((rows, term_ids))
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=offsets[1:])
+        return BM25Index(vocab, offsets, rows[order], tf[order], doclen, self.k1, self.b)
+
+    def renumbered(self, new_rows):
+        """
+        Returns the index with each row ``r`` renamed ``new_rows[r]`` and rows
+        mapped to -1 dropped. ``new_rows`` keeps the order of the rows it
+        keeps, so the postings stay sorted without re-indexing any text.
+        """
+        new_rows = np.asarray(new_rows, dtype=np.int64)
+        rows = new_rows[np.asarray(self.rows, dtype=np.int64)]
+        keep = rows >= 0
+        term_ids = np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int64), np.diff(self.offsets))[keep]
+        offsets = np.zeros(len(self.offsets), dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(self.offsets) - 1), out=offsets[1:])
+        doclen = np.asarray(self.doclen)[new_rows[:len(self.doclen)] >= 0]
+        return BM25Index(dict(self.vocab.items()), offsets, rows[keep], np.asarray(self.tf)[keep], doclen,
+                         self.k1, self.b)
+
+    def term_rows(self, term):
+        """Chunk rows containing ``term`` (after tokenisation), straight from the postings."""
+        term_id = self.vocab.get(term.lower())
+        if term_id is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.asarray(self.rows[self.offsets[term_id]:self.offsets[term_id + 1]])
+
+    def search(self, query, k=10, allowed=None):
+        """Top-k (rows, scores) for ``query``, best first; ``allowed`` is an optional boolean mask over rows."""
+        term_ids = {self.vocab.get(t) for t in tokenize(query)} - {None}
+        if not term_ids or not self.n_docs:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        all_rows, all_scores = [], []
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            rows = np.asarray(self.rows[start:end])
+            tf = np.asarray(self.tf[start:end])
+            df = end - start
+            idf = np.log(1.0 + (self.n_docs - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * self.doclen[rows] / self.avgdl)
+            all_rows.append(rows)
+            all_scores.append(idf * tf * (self.k1 + 1.0) / (tf + norm))
+        rows, inverse = np.unique(np.concatenate(all_rows), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores)).astype(np.float32)
+        if allowed is not None:
+            keep = allowed[rows]
+            rows, scores = rows[keep], scores[keep]
+        if len(rows) > k:
+            top = np.argpartition(-scores, k)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
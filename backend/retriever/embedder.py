@@ -1,116 +1,502 @@
 import os
+import re
+import sys
 import json
-import google.generativeai as genai
-from langchain_community.vectorstores import FAISS
+import time
+import hashlib
+import argparse
+import datetime
+from urllib.parse import urlparse
+
+if __package__ in (None, ""):
+    # Allow `python embedder.py` from backend/retriever as well as `python -m backend.retriever.embedder`
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import numpy as np
 from langchain.docstore.document import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from dotenv import load_dotenv
 
-load_dotenv()
+from backend import config
+from backend.retriever.embeddings import get_embeddings as _get_embeddings
+from backend.retriever.vector_store import (
+    MANIFEST_FILE, VectorStore, VectorStoreWriter, current_store_dir, store_exists, store_is_mapped
+)
+from backend.retriever.ann_index import describe, needs_training, stores_exact_vectors
+from backend.retriever.shards import PERIODS
+from backend.retriever.near_duplicates import NearDuplicateIndex, near_duplicates_exist
+from backend.ingestion.jsonl import iter_news_files, read_articles
+from backend.retriever.retriever import detect_tickers
 
-# Configure Google AI
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-
-CLEANED_DIR = "../data/cleaned_news/"
-RAW_NEWS_DIR = "../data/raw_news/"
-STOCK_DATA = "../data/stock_data/"
-VECTOR_DIR = "../embeddings/vector_store/"
+CLEANED_DIR = config.CLEANED_NEWS_DIR
+RAW_NEWS_DIR = config.RAW_NEWS_DIR
+STOCK_DATA = config.STOCK_DATA_DIR
+VECTOR_DIR = config.VECTOR_STORE_DIR
 os.makedirs(VECTOR_DIR, exist_ok=True)
 
-def load_docs():
-    docs = []
-    
+# Article fields that hold the body; everything else is treated as metadata
+TEXT_FIELDS = ("text", "cleaned_text")
+# Daily news files are named news_YYYY-MM-DD[...].json
+FILE_DATE_RE = re.compile(r"(\d{4}-\d{2}-\d{2})")
+
+def _file_date(file):
+    match = FILE_DATE_RE.search(file)
+    return match.group(1) if match else None
+
+def _doc(article, path, text_fields):
+    for field in text_fields:
+        if article.get(field):
+            return {"content": article[field], "metadata": article, "date": _file_date(os.path.basename(path))}
+    return None
+
+def iter_docs():
+    """
+    Yields the corpus one article at a time (JSONL files line by line), so
+    nothing upstream of the embedder has to fit in memory.
+    """
     # First try to load from cleaned news
-    if os.path.exists(CLEANED_DIR) and os.listdir(CLEANED_DIR):
+    files = iter_news_files(CLEANED_DIR)
+    if files:
         print(f"Loading from cleaned news directory: {CLEANED_DIR}")
-        for file in os.listdir(CLEANED_DIR):
-            if file.endswith('.json'):
-                with open(os.path.join(CLEANED_DIR, file), "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    
-                    # Handle both list and single article formats
-                    if isinstance(data, list):
-                        for article in data:
-                            text = article.get("cleaned_text", "") or article.get("text", "")
-                            if text:
-                                docs.append({"content": text, "metadata": article})
-                    elif isinstance(data, dict):
-                        text = data.get("cleaned_text", "") or data.get("text", "")
-                        if text:
-                            docs.append({"content": text, "metadata": data})
+        text_fields = ("cleaned_text", "text")
     else:
         # Fallback to raw news if no cleaned news available
         print(f"No cleaned news found, loading from raw news: {RAW_NEWS_DIR}")
-        if os.path.exists(RAW_NEWS_DIR):
-            for file in os.listdir(RAW_NEWS_DIR):
-                if file.endswith(('.json', '.json.txt')):
-                    with open(os.path.join(RAW_NEWS_DIR, file), "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                        
-                        if isinstance(data, list):
-                            for article in data:
-                                text = article.get("text", "")
-                                if text:
-                                    docs.append({"content": text, "metadata": article})
-    
+        files = iter_news_files(RAW_NEWS_DIR)
+        text_fields = ("text",)
+    # Oldest file first, so an article listed on several days keeps its first date
+    for path in files:
+        for article in read_articles(path):
+            doc = _doc(article, path, text_fields)
+            if doc:
+                yield doc
+
+def load_docs():
+    docs = list(iter_docs())
     print(f"Loaded {len(docs)} documents")
     return docs
 
-def embed():
-    """Create embeddings using LangChain + FAISS + Google Gemini"""
-    print("🚀 Starting embedding process with LangChain + FAISS + Google Gemini...")
-    
-    # Load documents
-    raw_docs = load_docs()
-    
-    # Advanced text splitting with LangChain
-    splitter = RecursiveCharacterTextSplitter(
+def _sha1(*parts):
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def article_key(doc):
+    """Stable identity of an article across runs (its URL, falling back to title + body)"""
+    meta = doc["metadata"]
+    return meta.get("url") or _sha1(meta.get("title", ""), doc["content"])
+
+def _metadata_hash(doc):
+    meta = {k: v for k, v in doc["metadata"].items() if k not in TEXT_FIELDS}
+    return _sha1(json.dumps(meta, sort_keys=True, ensure_ascii=False))
+
+def article_record(doc):
+    """
+    What is stored once per article in the vector store: everything except the
+    body, plus the filterable attributes ``date`` (publish date, else the date
+    of the daily file), ``source`` (host of the article URL, unless the scraper
+    recorded one) and ``tickers`` (STOCKS companies mentioned in title or body).
+    """
+    meta = doc["metadata"]
+    record = {k: v for k, v in meta.items() if k not in TEXT_FIELDS}
+    published = meta.get("published") or meta.get("date") or doc.get("date")
+    record["date"] = str(published)[:10] if published else None
+    host = urlparse(meta.get("url") or "").netloc.lower()
+    record["source"] = meta.get("source") or host.removeprefix("www.")
+    record["tickers"] = detect_tickers(f"{meta.get('title', '')}\n{doc['content']}")
+    return record
+
+def article_hash(doc):
+    """Fingerprint of everything that ends up in the article's chunks"""
+    return _sha1(_metadata_hash(doc), doc["content"])
+
+def get_splitter():
+    return RecursiveCharacterTextSplitter(
         chunk_size=512, 
         chunk_overlap=64,
         separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""]
     )
-    
-    # Process documents
-    texts, metadatas = [], []
-    for d in raw_docs:
-        chunks = splitter.split_text(d["content"])
-        texts.extend(chunks)
-        metadatas.extend([d["metadata"]] * len(chunks))
-    
-    print(f"📝 Created {len(texts)} text chunks from {len(raw_docs)} documents")
-    
-    # Use Google Gemini embeddings (FREE!)
-    embeddings = GoogleGenerativeAIEmbeddings(
-        model="models/embedding-001",
-        google_api_key=os.getenv("GOOGLE_API_KEY")
-    )
-    
-    print("🔄 Creating FAISS vector store with Google Gemini embeddings...")
-    
-    # Create FAISS vector store
-    vectordb = FAISS.from_texts(
-        texts=texts, 
-        embedding=embeddings, 
-        metadatas=metadatas
-    )
+
+def _print_progress(done, total, stats):
+    print(f"  🧮 Embedded {done}/{total} chunks ({stats.texts_per_second:.1f} chunks/s, "
+          f"{stats.retries} retries)")
+
+def get_embeddings(backend=None):
+    """Configured embeddings backend (see config.EMBEDDING_BACKEND), with progress output"""
+    return _get_embeddings(backend, progress=_print_progress)
+
+def _chunk_id(key, meta_hash, text, seen):
+    # Identical passages within one article still need distinct ids
+    occurrence = seen.get(text, 0)
+    seen[text] = occurrence + 1
+    return _sha1(key, meta_hash, text, str(occurrence))
+
+def split_article(doc, splitter):
+    """
+    Split one article into (chunk_id, text, start, end) tuples, where start/end
+    are UTF-8 byte offsets into the article body. Chunk ids are content hashes,
+    so an unchanged passage keeps its id (and its vector) when the article body is edited.
+    """
+    key = article_key(doc)
+    meta_hash = _metadata_hash(doc)
+    content = doc["content"]
+    seen = {}
+    chunks = []
+    cursor = 0
+    for text in splitter.split_text(content):
+        # Chunks are in order and may overlap, so search from just past the previous start
+        start = content.find(text, cursor)
+        if start == -1:
+            raise ValueError(f"Splitter produced a chunk that is not a substring of {key}")
+        cursor = start + 1
+        byte_start = len(content[:start].encode("utf-8"))
+        byte_end = byte_start + len(text.encode("utf-8"))
+        chunks.append((_chunk_id(key, meta_hash, text, seen), text, byte_start, byte_end))
+    return chunks
+
+def manifest_path():
+    """The manifest of the published store version (saved with it, see VectorStoreWriter.save)."""
+    return os.path.join(current_store_dir(VECTOR_DIR), MANIFEST_FILE)
+
+def load_manifest():
+    """Load the chunk manifest written alongside the vector store, if any."""
+    path = manifest_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Ignoring unreadable manifest {path}: {e}")
+        return None
+
+def _write_articles(writer, pending, vectors, old_rows):
+    """
+    Adds re-split articles to the store. Chunks already in the store (same
+    content hash) keep their row; the article body is stored only if at least
+    one chunk is new. Returns the manifest entries of these articles.
+    """
+    entries = {}
+    vectors = iter(vectors)
+    for key, doc, doc_hash, chunks in pending:
+        new = [c for c in chunks if c[0] not in old_rows]
+        if new:
+            article_id, base = writer.add_article(article_record(doc), doc["content"])
+            spans = [(article_id, base + start, base + end) for _, _, start, end in new]
+            rows = writer.add_chunks(spans, [next(vectors) for _ in new], [text for _, text, _, _ in new])
+            new_rows = dict(zip((c[0] for c in new), rows))
+        else:
+            new_rows = {}
+        entries[key] = {
+            "hash": doc_hash,
+            "chunks": [[chunk_id, old_rows.get(chunk_id, new_rows.get(chunk_id))] for chunk_id, _, _, _ in chunks],
+        }
+    return entries
+
+def _stale_records(chunk_articles, stored_records, manifest_articles, records):
+    """
+    {article id: record} for stored article records that differ from the
+    current ``records`` (e.g. new attributes or a changed ticker universe).
+    Records are metadata only, so refreshing them never needs re-embedding.
+    """
+    stale = {}
+    for key, entry in manifest_articles.items():
+        for _, row in entry["chunks"]:
+            article_id = int(chunk_articles[row])
+            if stored_records[article_id] != records[key]:
+                stale[article_id] = records[key]
+    return stale
+
+def embed(incremental=False, backend=None, index_type=None, docs=None, prune=True, shard_period=None):
+    """
+    Create embeddings with the configured embeddings backend and write the
+    compact FAISS vector store (see retriever/vector_store.py), indexed as
+    ``index_type`` (default config.INDEX_TYPE, see retriever/ann_index.py) in
+    shards of ``shard_period`` (default config.SHARD_PERIOD, see retriever/shards.py).
+
+    With ``incremental=True`` the existing store is updated in place: only chunks
+    whose content hash is not in the manifest are embedded, and vectors belonging
+    to deleted or edited articles are removed. Falls back to a full rebuild when
+    there is no usable store/manifest or the embedding model changed. A changed
+    index type or shard period is rebuilt from the stored vectors, without
+    re-embedding.
+
+    ``docs`` (default: iter_docs()) is consumed as a stream: chunks are embedded
+    and added in batches of config.EMBED_STREAM_BATCH as articles arrive, so
+    embedding starts before the source is exhausted. With ``prune=False``,
+    stored articles that do not appear in ``docs`` are kept, i.e. ``docs`` is a
+    stream of new or updated articles rather than the whole corpus.
+
+    Articles published more than config.RETENTION_DAYS ago are skipped, so a
+    run over the whole corpus removes them (and shards left empty) from the
+    store, which is then compacted to drop their rows and text. Otherwise
+    removed chunks are compacted away once they pass
+    config.VECTOR_STORE_COMPACT_DEAD_FRACTION of the store.
+
+    Articles whose text is a near-duplicate (config.NEAR_DUPLICATE_THRESHOLD,
+    see retriever/near_duplicates.py) of an article already in the store, or
+    seen earlier in ``docs``, are not embedded; the manifest records each one
+    under ``duplicates`` with the key of the article it was collapsed into.
+
+    Returns a summary of the run (counts, embedding and index timings), or
+    None if nothing had to be written.
+    """
+    index_type = index_type or config.INDEX_TYPE
+    shard_period = shard_period or config.SHARD_PERIOD
+    embeddings = get_embeddings(backend)
+    print(f"🚀 Starting embedding process with FAISS + {embeddings.model}...")
+    docs = iter_docs() if docs is None else docs
+    splitter = get_splitter()
+
+    manifest = load_manifest() if incremental else None
+    if manifest is not None and (manifest.get("model") != embeddings.model or not store_exists(VECTOR_DIR)):
+        print("⚠️  Manifest does not match the vector store on disk, rebuilding from scratch")
+        manifest = None
+    if manifest is None and not prune:
+        print("⚠️  No usable vector store to append to; building one from this stream only")
+    previous = manifest["articles"] if manifest else {}
+    old_rows = {chunk_id: row for a in previous.values() for chunk_id, row in a["chunks"]}
+    # Stores written before sharding have a single index, i.e. the "none" period
+    reindex = manifest is not None and (manifest.get("index_type", "flat") != index_type
+                                        or manifest.get("shard_period", "none") != shard_period)
+    # MinHash signatures of the stored articles, and those of this run's (a pruning run starts over)
+    stored_signatures = near_duplicates = None
+    if config.NEAR_DUPLICATE_THRESHOLD > 0:
+        stored_signatures = (NearDuplicateIndex.load(current_store_dir(VECTOR_DIR)) if manifest
+                             else NearDuplicateIndex())
+        near_duplicates = NearDuplicateIndex() if prune else stored_signatures.copy()
+    known_duplicates = manifest.get("duplicates", {}) if manifest else {}
+    duplicates = {} if prune else dict(known_duplicates)
+    collapsed = 0
+    retention_cutoff = ((datetime.date.today() - datetime.timedelta(days=config.RETENTION_DAYS)).isoformat()
+                        if config.RETENTION_DAYS > 0 else None)
+    expired = 0
+
+    # Articles whose fingerprint is unchanged reuse their recorded chunks and are
+    # not re-split; the others are split and queued for embedding
+    articles = {} if prune else dict(previous)
+    seen = set()
+    records = {}
+    writer = None
+    batch, batch_texts = [], []
+    # Batches held back until there are enough vectors to train a new index
+    untrained, untrained_count = [], 0
+    totals = {"embedded": 0, "embed_s": 0.0}
+    start = time.perf_counter()
+
+    def open_writer(dim):
+        nonlocal writer
+        if manifest is None:
+            print("🔄 Creating FAISS vector store...")
+            writer = VectorStoreWriter(VECTOR_DIR, dim=dim, reset=True, index_type=index_type, period=shard_period)
+            return
+        print("🔄 Updating existing FAISS vector store...")
+        writer = VectorStoreWriter(VECTOR_DIR)
+        if reindex:
+            print(f"🏗️  Rebuilding the {manifest.get('index_type', 'flat')} index ({writer.period} shards) "
+                  f"as {index_type} ({shard_period} shards) from stored vectors")
+            if not stores_exact_vectors(writer.template):
+                print("⚠️  The current index is quantized, so the rebuilt one starts from approximate vectors; "
+                      "run without --incremental to re-embed exactly")
+            writer.rebuild_index(index_type, shard_period)
+
+    def write(parts, final=False):
+        nonlocal untrained_count
+        if writer.template is None:
+            # A new IVF / PQ / SQ index is trained on the first INDEX_TRAIN_SIZE
+            # vectors (or all of them, for a smaller corpus)
+            untrained.extend(parts)
+            untrained_count += sum(len(vectors) for _, vectors in parts)
+            trainable = not needs_training(index_type, writer.dim) or untrained_count >= config.INDEX_TRAIN_SIZE
+            if not (trainable or final):
+                return
+            writer.train(np.concatenate([np.asarray(vectors, dtype=np.float32)
+                                         for _, vectors in untrained if len(vectors)]))
+            parts = untrained[:]
+            untrained.clear()
+        for pending, vectors in parts:
+            articles.update(_write_articles(writer, pending, vectors, old_rows))
+
+    def flush(final=False):
+        if batch or final:
+            embed_start = time.perf_counter()
+            vectors = embeddings.embed_documents(batch_texts) if batch_texts else []
+            totals["embed_s"] += time.perf_counter() - embed_start
+            totals["embedded"] += len(batch_texts)
+            if writer is None and (batch or untrained):
+                open_writer(len(vectors[0]) if len(vectors) else None)
+            if writer is not None:
+                write([(batch[:], vectors)] if batch else [], final)
+            batch.clear()
+            batch_texts.clear()
+
+    for d in docs:
+        key = article_key(d)
+        if key in seen:
+            continue  # same article listed in several daily files
+        seen.add(key)
+        record = article_record(d)
+        if retention_cutoff and record["date"] and record["date"] < retention_cutoff:
+            expired += 1
+            continue
+        doc_hash = article_hash(d)
+        prev = previous.get(key)
+        unchanged = prev is not None and prev["hash"] == doc_hash
+        if near_duplicates is not None:
+            signature = stored_signatures.get(key) if unchanged else None
+            if signature is None:
+                signature = near_duplicates.signature(d["content"])
+            original, similarity = near_duplicates.find(signature, exclude=key)
+            if original is not None:
+                # Never embedded; if it was stored before, its chunks are removed below
+                duplicates[key] = {"of": original, "similarity": round(similarity, 3)}
+                articles.pop(key, None)
+                near_duplicates.remove(key)
+                collapsed += known_duplicates.get(key, {}).get("of") != original
+                continue
+            near_duplicates.add(key, signature)
+        duplicates.pop(key, None)
+        records[key] = record
+        if unchanged:
+            articles[key] = prev
+            continue
+        chunks = split_article(d, splitter)
+        batch.append((key, d, doc_hash, chunks))
+        batch_texts.extend(text for chunk_id, text, _, _ in chunks if chunk_id not in old_rows)
+        if len(batch_texts) >= config.EMBED_STREAM_BATCH:
+            flush()
+    if batch:
+        flush(final=True)
+    elif untrained:
+        write([], final=True)
+
+    kept = {chunk_id for a in articles.values() for chunk_id, _ in a["chunks"]}
+    to_delete = [row for chunk_id, row in old_rows.items() if chunk_id not in kept]
+    if expired:
+        print(f"🗑️  Left out {expired} articles published before {retention_cutoff} (FINRAG_RETENTION_DAYS)")
+    if collapsed:
+        print(f"🧬 Collapsed {collapsed} near-duplicate articles into the articles they repeat")
+    print(f"📝 {len(kept)} text chunks from {len(articles)} documents "
+          f"({totals['embedded']} embedded, {len(to_delete)} to remove)")
+
+    if writer is None:
+        if manifest is None:
+            print("⚠️  Nothing to embed")
+            return
+        store = VectorStore(VECTOR_DIR)
+        unchanged = {key: a for key, a in articles.items() if key in records}
+        stale = _stale_records(store.chunks["article"], store.articles, unchanged, records)
+        if stale:
+            print(f"🏷️  Refreshing metadata of {len(stale)} stored articles")
+        # Stores without the BM25 index or in an older layout are rewritten even without changes
+        store_dir = current_store_dir(VECTOR_DIR)
+        signatures_current = near_duplicates is None or (duplicates == known_duplicates
+                                                         and near_duplicates_exist(store_dir))
+        if not to_delete and not stale and not reindex and signatures_current and store_is_mapped(store_dir):
+            print("✅ Vector store is already up to date")
+            return
+        open_writer(None)
+
+    index_start = time.perf_counter()
+    writer.remove_chunks(to_delete)
+    # Reused chunks of edited articles still point at the article's older record
+    chunk_articles = [chunk[0] for chunk in writer.chunks]
+    current = {key: a for key, a in articles.items() if key in records}
+    for article_id, record in _stale_records(chunk_articles, writer.articles, current, records).items():
+        writer.articles[article_id] = record
     
     # Save to disk
-    vectordb.save_local(VECTOR_DIR)
-    print(f"✅ Vector store saved to: {VECTOR_DIR}")
-    print(f"📊 Total vectors: {vectordb.index.ntotal}")
+    # The manifest is published together with the store version it describes
+    version = writer.save(manifest={"model": embeddings.model, "index_type": index_type,
+                                    "shard_period": shard_period, "articles": articles, "duplicates": duplicates},
+                          near_duplicates=near_duplicates, compact=expired > 0)
+    done = time.perf_counter()
+    print(f"✅ Vector store saved to: {VECTOR_DIR} (version {version})")
+    print(f"📊 Total vectors: {writer.ntotal} ({describe(writer.template)}, {len(writer.shards)} shards)")
+    print(f"⏱️  Embedding stats: {embeddings.stats.as_dict()}")
+    return {
+        "articles": len(articles),
+        "chunks": len(kept),
+        "embedded": totals["embedded"],
+        "removed": len(to_delete),
+        "duplicates": collapsed,
+        "vectors": int(writer.ntotal),
+        "index": describe(writer.template),
+        "shards": len(writer.shards),
+        "version": version,
+        "embed_s": round(totals["embed_s"], 3),
+        # Everything else: splitting, index training / adds and writing the store
+        "index_s": round(done - start - totals["embed_s"], 3),
+        "embedding": embeddings.stats.as_dict(),
+    }
+
+def migrate_legacy_store(model=None, index_type=None):
+    """
+    Convert a store written by LangChain's FAISS.save_local (index.faiss +
+    pickled docstore in index.pkl) to the compact layout, reusing the stored
+    vectors instead of re-embedding. Also writes the incremental manifest.
+    """
+    import pickle
+    import faiss
 
-def search_test():
+    legacy_pkl = os.path.join(VECTOR_DIR, "index.pkl")
+    print(f"🔄 Migrating LangChain FAISS store in {VECTOR_DIR}...")
+    legacy_index = faiss.read_index(os.path.join(VECTOR_DIR, "index.faiss"))
+    with open(legacy_pkl, "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    vectors = legacy_index.reconstruct_n(0, legacy_index.ntotal)
+
+    # Group chunks by article, keeping index order
+    by_article = {}
+    for row in range(legacy_index.ntotal):
+        chunk = docstore.search(index_to_docstore_id[row])
+        meta = chunk.metadata
+        content = meta.get("cleaned_text", "") or meta.get("text", "") or chunk.page_content
+        doc = {"content": content, "metadata": meta}
+        by_article.setdefault(article_key(doc), (doc, []))[1].append((chunk.page_content, vectors[row]))
+
+    index_type = index_type or config.INDEX_TYPE
+    writer = VectorStoreWriter(VECTOR_DIR, dim=legacy_index.d, reset=True, index_type=index_type)
+    writer.train(vectors)
+    articles = {}
+    for key, (doc, chunks) in by_article.items():
+        content = doc["content"]
+        meta_hash = _metadata_hash(doc)
+        article_id, base = writer.add_article(article_record(doc), content)
+        seen, spans, chunk_ids, cursor = {}, [], [], 0
+        texts = [text for text, _ in chunks]
+        for text, _ in chunks:
+            start = content.find(text, cursor)
+            if start == -1:
+                # Not a substring of the article body: store the passage as its own text
+                base_extra = writer.add_text(text)
+                spans.append((article_id, base_extra, base_extra + len(text.encode("utf-8"))))
+            else:
+                cursor = start + 1
+                byte_start = base + len(content[:start].encode("utf-8"))
+                spans.append((article_id, byte_start, byte_start + len(text.encode("utf-8"))))
+            chunk_ids.append(_chunk_id(key, meta_hash, text, seen))
+        rows = writer.add_chunks(spans, [vector for _, vector in chunks], texts)
+        articles[key] = {"hash": article_hash(doc), "chunks": [list(pair) for pair in zip(chunk_ids, rows)]}
+
+    # Legacy stores were always built with the Gemini embedding model
+    writer.save(manifest={"model": model or config.EMBEDDING_MODEL, "index_type": index_type,
+                          "shard_period": writer.period, "articles": articles})
+    for name in ("index.pkl", "chunks.pkl"):
+        path = os.path.join(VECTOR_DIR, name)
+        if os.path.exists(path):
+            os.remove(path)
+    print(f"✅ Migrated {writer.ntotal} vectors from {len(articles)} articles")
+
+def search_test(backend=None):
     """Test the vector store search functionality"""
     print("\n🔍 Testing vector search...")
     
     # Load the saved vector store
-    embeddings = GoogleGenerativeAIEmbeddings(
-        model="models/embedding-001",
-        google_api_key=os.getenv("GOOGLE_API_KEY")
-    )
+    embeddings = get_embeddings(backend)
     
-    vectordb = FAISS.load_local(VECTOR_DIR, embeddings, allow_dangerous_deserialization=True)
+    vectordb = VectorStore(VECTOR_DIR, embeddings)
     
     # Test queries
     test_queries = [
@@ -130,12 +516,32 @@ def search_test():
                 print(f"     Title: {doc.metadata['title'][:60]}...")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the FAISS vector store from news articles")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only embed new/changed chunks and drop removed ones")
+    parser.add_argument("--backend", choices=["google", "hashing"], default=None,
+                        help="embeddings backend (default: FINRAG_EMBEDDING_BACKEND or 'google')")
+    parser.add_argument("--index-type", default=None,
+                        help="ANN index: flat, sq8, sqfp16, hnsw, hnsw_sq8, ivf, ivf_sq8, ivf_pq or a faiss "
+                             "factory string (default: FINRAG_INDEX_TYPE or 'flat')")
+    parser.add_argument("--shard-period", choices=PERIODS, default=None,
+                        help="split the index by publication day, week or month, or not at all "
+                             "(default: FINRAG_SHARD_PERIOD or 'week')")
+    parser.add_argument("--migrate", action="store_true",
+                        help="convert an existing LangChain FAISS store (index.pkl) without re-embedding")
+    args = parser.parse_args()
+
+    if args.migrate:
+        migrate_legacy_store(index_type=args.index_type)
+        sys.exit(0)
+
     # First install required package
     print("📦 Make sure you have installed: pip install langchain-google-genai")
     
     try:
-        embed()
-        search_test()
+        embed(incremental=args.incremental, backend=args.backend, index_type=args.index_type,
+              shard_period=args.shard_period)
+        search_test(backend=args.backend)
     except Exception as e:
         print(f"❌ Error: {e}")
         print("💡 Make sure your GOOGLE_API_KEY is set in .env file")
\ No newline at end of file
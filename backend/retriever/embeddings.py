@@ -0,0 +1,242 @@
+import re
+import time
+import zlib
+import inspect
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from backend import config
+
+# Exception names / message fragments that mean "slow down and try again"
+RATE_LIMIT_MARKERS = ("429", "resourceexhausted", "resource exhausted", "rate limit", "quota", "too many requests")
+TRANSIENT_MARKERS = ("500", "502", "503", "504", "serviceunavailable", "deadlineexceeded", "timeout", "timed out",
+                     "connection reset", "internalservererror")
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic offline embedder: signed feature hashing of word unigrams and
+    character n-grams into a fixed number of buckets, L2-normalised.
+    Needs no network or model download, so the embedder and the pipeline can be
+    run and benchmarked anywhere. Same text always gives the same vector.
+    """
+
+    def __init__(self, dim=None, ngram=3):
+        self.dim = dim or config.HASHING_EMBEDDING_DIM
+        self.ngram = ngram
+        self.model = f"hashing-{self.dim}-{ngram}gram"
+
+    def _features(self, text):
+        for token in _TOKEN_RE.findall(text.lower()):
+            yield token
+            padded = f" {token} "
+            for i in range(max(len(padded) - self.ngram + 1, 1)):
+                yield padded[i:i + self.ngram]
+
+    def _embed(self, text):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            vec[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norm = np.linalg.norm(vec)
+        if norm > 0:
+            vec /= norm
+        return vec.tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+    def embed_queries(self, texts):
+        return [self._embed(text) for text in texts]
+
+
+class EmbeddingStats:
+    """Progress / throughput counters for one BatchedEmbeddings instance"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.texts = 0
+        self.batches = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+        self.started = None
+
+    def record(self, **deltas):
+        with self._lock:
+            if self.started is None:
+                self.started = time.perf_counter()
+            for name, value in deltas.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started if self.started is not None else 0.0
+
+    @property
+    def texts_per_second(self):
+        return self.texts / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_dict(self):
+        return {
+            "texts": self.texts,
+            "batches": self.batches,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "failures": self.failures,
+            "elapsed_s": round(self.elapsed, 3),
+            "texts_per_s": round(self.texts_per_second, 1),
+        }
+
+
+def _classify_error(exc):
+    """Returns 'rate_limit', 'transient' or None (not worth retrying)."""
+    text = f"{type(exc).__name__} {exc}".lower()
+    if any(marker in text for marker in RATE_LIMIT_MARKERS):
+        return "rate_limit"
+    if isinstance(exc, (TimeoutError, ConnectionError)) or any(marker in text for marker in TRANSIENT_MARKERS):
+        return "transient"
+    return None
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Wraps any LangChain embeddings backend with explicit batching, a bounded
+    number of concurrent in-flight batches and retry with exponential backoff.
+    A rate-limit error pauses *all* workers until the backoff expires, instead of
+    each thread hammering the API on its own schedule.
+    """
+
+    def __init__(self, backend, batch_size=None, max_concurrency=None, max_retries=None,
+                 initial_backoff=1.0, max_backoff=60.0, progress=None):
+        self.backend = backend
+        self.batch_size = batch_size or config.EMBEDDING_BATCH_SIZE
+        self.max_concurrency = max_concurrency or config.EMBEDDING_CONCURRENCY
+        self.max_retries = config.EMBEDDING_MAX_RETRIES if max_retries is None else max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.progress = progress
+        self.stats = EmbeddingStats()
+        self._cooldown_lock = threading.Lock()
+        self._cooldown_until = 0.0
+
+    @property
+    def model(self):
+        return getattr(self.backend, "model", type(self.backend).__name__)
+
+    def _wait_for_cooldown(self):
+        with self._cooldown_lock:
+            delay = self._cooldown_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _call_with_retry(self, fn, *args):
+        attempt = 0
+        while True:
+            self._wait_for_cooldown()
+            try:
+                return fn(*args)
+            except Exception as e:
+                kind = _classify_error(e)
+                if kind is None or attempt >= self.max_retries:
+                    self.stats.record(failures=1)
+                    raise
+                delay = min(self.max_backoff, self.initial_backoff * (2 ** attempt))
+                delay *= 0.5 + random.random()  # jitter
+                attempt += 1
+                if kind == "rate_limit":
+                    self.stats.record(retries=1, rate_limited=1)
+                    with self._cooldown_lock:
+                        self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+                else:
+                    self.stats.record(retries=1)
+                logging.warning(f"Embedding call failed ({kind}), retry {attempt}/{self.max_retries} "
+                                f"in {delay:.1f}s: {e}")
+                if kind != "rate_limit":
+                    time.sleep(delay)
+
+    def _embed_batch(self, batch):
+        start = time.perf_counter()
+        vectors = self._call_with_retry(self.backend.embed_documents, batch)
+        self.stats.record(texts=len(batch), batches=1, busy_seconds=time.perf_counter() - start)
+        return vectors
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = []
+        done = 0
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+            # map() keeps batch order; at most max_concurrency batches are in flight
+            for vectors in pool.map(self._embed_batch, batches):
+                results.extend(vectors)
+                done += len(vectors)
+                if self.progress:
+                    self.progress(done, len(texts), self.stats)
+        return results
+
+    def embed_query(self, text):
+        return self._call_with_retry(self.backend.embed_query, text)
+
+    def _embed_query_batch(self, batch):
+        start = time.perf_counter()
+        if hasattr(self.backend, "embed_queries"):
+            vectors = self._call_with_retry(self.backend.embed_queries, batch)
+        elif _accepts_task_type(self.backend.embed_documents):
+            # e.g. GoogleGenerativeAIEmbeddings: one batch request, embedded as queries rather than documents
+            vectors = self._call_with_retry(
+                lambda texts: self.backend.embed_documents(texts, task_type="RETRIEVAL_QUERY"), batch)
+        else:
+            vectors = [self._call_with_retry(self.backend.embed_query, text) for text in batch]
+        self.stats.record(texts=len(batch), batches=1, busy_seconds=time.perf_counter() - start)
+        return vectors
+
+    def embed_queries(self, texts):
+        """Query embeddings of several texts, in as few backend calls as the backend allows."""
+        texts = list(texts)
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1:
+            return self._embed_query_batch(batches[0])
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+            return [vector for vectors in pool.map(self._embed_query_batch, batches) for vector in vectors]
+
+
+def _accepts_task_type(fn):
+    try:
+        return "task_type" in inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def get_embeddings(backend=None, **kwargs):
+    """
+    Build the configured embeddings backend (``config.EMBEDDING_BACKEND`` unless
+    ``backend`` is given) wrapped in BatchedEmbeddings. Extra kwargs go to the wrapper.
+    """
+    backend = backend or config.EMBEDDING_BACKEND
+    if backend == "hashing":
+        inner = HashingEmbeddings()
+    elif backend == "google":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        inner = GoogleGenerativeAIEmbeddings(
+            model=config.EMBEDDING_MODEL,
+            google_api_key=config.GOOGLE_API_KEY
+        )
+    else:
+        raise ValueError(f"Unknown embedding backend: {backend!r} (expected 'google' or 'hashing')")
+    return BatchedEmbeddings(inner, **kwargs)
@@ -0,0 +1,161 @@
+"""
+Near-duplicate detection of articles before they are embedded.
+
+The same wire story is carried by several feeds, and reruns can save it under
+another URL, so articles are also compared by content: every cleaned text
+gets a MinHash signature over its word shingles, and locality-sensitive
+hashing (the signature cut into bands, each band a bucket key) finds the
+stored articles sharing at least one band with it. Their estimated Jaccard
+similarity (the fraction of equal signature values) is then checked against
+FINRAG_NEAR_DUPLICATE_THRESHOLD.
+
+The signatures of the articles in the store are saved with every store
+version, so articles of a later run are checked against everything already
+indexed, not only against each other.
+"""
+import os
+import re
+import json
+import zlib
+
+import numpy as np
+
+from backend import config
+
+SIGNATURES_FILE = "minhash.npy"             # uint32 signature of each stored article, one row per key
+SIGNATURE_KEYS_FILE = "minhash_keys.json"   # article keys of the rows, and the shingling parameters
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def near_duplicates_exist(path):
+    return all(os.path.exists(os.path.join(path, name)) for name in (SIGNATURES_FILE, SIGNATURE_KEYS_FILE))
+
+
+def _mix(x):
+    # Finalizer of MurmurHash3: a bijection on uint32 that spreads every input bit
+    x = x ^ (x >> np.uint32(16))
+    x = x * np.uint32(0x85EBCA6B)
+    x = x ^ (x >> np.uint32(13))
+    x = x * np.uint32(0xC2B2AE35)
+    return x ^ (x >> np.uint32(16))
+
+
+def shingle_hashes(text, size):
+    """Hashes of the distinct ``size``-word shingles of ``text`` (lowercased words; one shingle if shorter)."""
+    words = _WORD_RE.findall(text.lower())
+    grams = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))} if words else set()
+    # crc32 is stable across processes, unlike hash()
+    return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint32, count=len(grams))
+
+
+class NearDuplicateIndex:
+    """
+    MinHash signatures of articles by key, with the LSH buckets to look up
+    near-duplicates of a new signature.
+    """
+
+    def __init__(self, threshold=None, permutations=None, bands=None, shingle_size=None):
+        self.threshold = config.NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+        self.permutations = permutations or config.NEAR_DUPLICATE_PERMUTATIONS
+        self.bands = bands or config.NEAR_DUPLICATE_BANDS
+        self.shingle_size = shingle_size or config.NEAR_DUPLICATE_SHINGLE_SIZE
+        if self.permutations % self.bands:
+            raise ValueError(f"{self.permutations} MinHash permutations cannot be cut into {self.bands} bands")
+        self.rows = self.permutations // self.bands
+        # One hash function per permutation: _mix(shingle ^ seed)
+        self._seeds = _mix(np.arange(1, self.permutations + 1, dtype=np.uint32) * np.uint32(0x9E3779B9))
+        self._signatures = {}
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def __contains__(self, key):
+        return key in self._signatures
+
+    def get(self, key):
+        return self._signatures.get(key)
+
+    def signature(self, text):
+        """MinHash signature of ``text``; None if it has no words."""
+        hashes = shingle_hashes(text, self.shingle_size)
+        if not len(hashes):
+            return None
+        return _mix(hashes[:, None] ^ self._seeds[None, :]).min(axis=0)
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def find(self, signature, exclude=None):
+        """
+        (key, estimated similarity) of the most similar article at or above the
+        threshold, or (None, 0.0). ``exclude``: a key never reported (the article itself).
+        """
+        if signature is None:
+            return None, 0.0
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates.update(self._buckets.get(band_key, ()))
+        candidates.discard(exclude)
+        best, best_similarity = None, 0.0
+        for key in candidates:
+            similarity = float(np.mean(self._signatures[key] == signature))
+            if similarity >= self.threshold and similarity > best_similarity:
+                best, best_similarity = key, similarity
+        return best, best_similarity
+
+    def add(self, key, signature):
+        """Indexes ``signature`` under ``key`` (replacing the key's previous one); None is ignored."""
+        self.remove(key)
+        if signature is None:
+            return
+        self._signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, set()).add(key)
+
+    def remove(self, key):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band_key in self._band_keys(signature):
+            bucket = self._buckets[band_key]
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[band_key]
+
+    def copy(self):
+        index = NearDuplicateIndex(self.threshold, self.permutations, self.bands, self.shingle_size)
+        for key, signature in self._signatures.items():
+            index.add(key, signature)
+        return index
+
+    def _params(self):
+        return {"permutations": self.permutations, "shingle_size": self.shingle_size}
+
+    def save(self, path):
+        keys = list(self._signatures)
+        signatures = (np.stack([self._signatures[key] for key in keys]) if keys
+                      else np.zeros((0, self.permutations), dtype=np.uint32))
+        with open(os.path.join(path, SIGNATURES_FILE), "wb") as f:
+            np.save(f, signatures)
+        with open(os.path.join(path, SIGNATURE_KEYS_FILE), "w", encoding="utf-8") as f:
+            json.dump({**self._params(), "keys": keys}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """
+        The index saved in ``path``; empty if there is none or it was built
+        with other shingling parameters (its signatures would not compare).
+        """
+        index = cls(**kwargs)
+        if not near_duplicates_exist(path):
+            return index
+        with open(os.path.join(path, SIGNATURE_KEYS_FILE), "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if {name: saved.get(name) for name in index._params()} != index._params():
+            return index
+        signatures = np.load(os.path.join(path, SIGNATURES_FILE))
+        for key, signature in zip(saved["keys"], signatures):
+            index.add(key, signature)
+        return index
@@ -0,0 +1,161 @@
+import os
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from backend import config
+from backend.metrics import CACHE_LOOKUPS
+from backend.query_keys import normalize_query
+
+
+class QueryEmbeddingCache:
+    """
+    Two-tier cache for query embeddings.
+
+    Tier 1 is an in-process LRU bounded to ``max_size`` entries. Tier 2 is an
+    optional SQLite file keyed by (embedding model, normalised query) that
+    survives restarts and is shared by every worker pointed at the same path.
+    Only misses in both tiers reach the embeddings backend.
+    """
+
+    def __init__(self, embeddings, max_size=None, disk_path=None):
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.max_size = config.QUERY_CACHE_SIZE if max_size is None else max_size
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        disk_path = config.QUERY_CACHE_PATH if disk_path is None else disk_path
+        self._db = None
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "model TEXT NOT NULL, query TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, query))"
+            )
+            self._db.commit()
+
+    def _remember(self, key, vector):
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+
+    def _disk_get(self, key):
+        if self._db is None:
+            return None
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT vector FROM query_embeddings WHERE model = ? AND query = ?", (self.model, key)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f"Query embedding disk cache read failed: {e}")
+            return None
+        return np.frombuffer(row[0], dtype=np.float32) if row else None
+
+    def _disk_put(self, key, vector):
+        if self._db is None:
+            return
+        try:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (model, query, vector) VALUES (?, ?, ?)",
+                    (self.model, key, vector.tobytes())
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Query embedding disk cache write failed: {e}")
+
+    def embed_query(self, query):
+        """Returns the query embedding as a read-only float32 vector."""
+        key = normalize_query(query)
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                self.memory_hits += 1
+                CACHE_LOOKUPS.inc(cache="query_embedding", result="memory_hit")
+                return vector
+
+        vector = self._disk_get(key)
+        if vector is not None:
+            with self._lock:
+                self.disk_hits += 1
+            CACHE_LOOKUPS.inc(cache="query_embedding", result="disk_hit")
+        else:
+            vector = np.asarray(self.embeddings.embed_query(key), dtype=np.float32)
+            with self._lock:
+                self.misses += 1
+            CACHE_LOOKUPS.inc(cache="query_embedding", result="miss")
+            self._disk_put(key, vector)
+
+        vector.setflags(write=False)
+        self._remember(key, vector)
+        return vector
+
+    def embed_queries(self, queries):
+        """
+        Embeddings of several queries (read-only float32 vectors, in order).
+        Cache misses are embedded together in one batched backend call.
+        """
+        keys = [normalize_query(query) for query in queries]
+        vectors = {}
+        with self._lock:
+            for key in keys:
+                vector = self._lru.get(key)
+                if vector is not None and key not in vectors:
+                    self._lru.move_to_end(key)
+                    self.memory_hits += 1
+                    CACHE_LOOKUPS.inc(cache="query_embedding", result="memory_hit")
+                    vectors[key] = vector
+
+        missing = []
+        for key in dict.fromkeys(keys):
+            if key in vectors:
+                continue
+            vector = self._disk_get(key)
+            if vector is None:
+                missing.append(key)
+                continue
+            with self._lock:
+                self.disk_hits += 1
+            CACHE_LOOKUPS.inc(cache="query_embedding", result="disk_hit")
+            vector.setflags(write=False)
+            self._remember(key, vector)
+            vectors[key] = vector
+
+        if missing:
+            embed = getattr(self.embeddings, "embed_queries", None)
+            embedded = embed(missing) if embed else [self.embeddings.embed_query(key) for key in missing]
+            with self._lock:
+                self.misses += len(missing)
+            CACHE_LOOKUPS.inc(len(missing), cache="query_embedding", result="miss")
+            for key, vector in zip(missing, embedded):
+                vector = np.asarray(vector, dtype=np.float32)
+                self._disk_put(key, vector)
+                vector.setflags(write=False)
+                self._remember(key, vector)
+                vectors[key] = vector
+        return [vectors[key] for key in keys]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._lru),
+                "max_size": self.max_size,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
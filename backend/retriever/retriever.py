@@ -0,0 +1,68 @@
+import re
+
+from backend import config
+from backend.ingestion.stock_fetcher import STOCKS
+
+# Common short forms used in Indian market news, expanded before sparse search
+# so e.g. "RIL recent trends" also matches chunks that only say "Reliance"
+ENTITY_ALIASES = {
+    "ril": "reliance",
+    "infy": "infosys",
+    "hdfcbank": "hdfc bank",
+    "sbin": "sbi state bank",
+    "hul": "hindustan unilever",
+    "hindunilvr": "hindustan unilever",
+    "icicibank": "icici bank",
+    "tata consultancy": "tcs",
+}
+
+
+def _ticker_patterns():
+    patterns = {}
+    for ticker, name in STOCKS.items():
+        names = {name.lower(), ticker.split(".")[0].lower()}
+        names.update(alias for alias, full in ENTITY_ALIASES.items() if full == name.lower())
+        patterns[ticker] = re.compile(r"\b(?:" + "|".join(re.escape(n) for n in sorted(names)) + r")\b", re.IGNORECASE)
+    return patterns
+
+
+TICKER_PATTERNS = _ticker_patterns()
+
+
+def detect_tickers(text):
+    """Tickers of the STOCKS universe mentioned in ``text`` (by name, symbol or alias)."""
+    return [ticker for ticker, pattern in TICKER_PATTERNS.items() if pattern.search(text)]
+
+
+def resolve_ticker(value):
+    """Maps "HDFCBANK.NS", "hdfcbank", "HDFC Bank" or an alias to its STOCKS ticker; None if unknown."""
+    value = value.strip().lower()
+    for ticker, pattern in TICKER_PATTERNS.items():
+        if value == ticker.lower() or pattern.fullmatch(value):
+            return ticker
+    return None
+
+
+def expand_query(query):
+    """Appends the long form of any known entity alias found in the query."""
+    lowered = query.lower()
+    extra = [full for alias, full in ENTITY_ALIASES.items() if f" {alias} " in f" {lowered} "]
+    return " ".join([query] + extra)
+
+
+def reciprocal_rank_fusion(rankings, k, rrf_k=None, weights=None):
+    """
+    Fuses several ranked lists of chunk rows: score(row) = sum 1 / (rrf_k + rank).
+    Returns the top-k rows. Rank-based, so dense distances and BM25 scores never
+    have to be put on a common scale. ``weights`` ({row: factor}, e.g. a
+    recency decay) scale the fused scores.
+    """
+    rrf_k = config.RRF_K if rrf_k is None else rrf_k
+    scores = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, 1):
+            row = int(row)
+            scores[row] = scores.get(row, 0.0) + 1.0 / (rrf_k + rank)
+    if weights:
+        scores = {row: score * weights.get(row, 1.0) for row, score in scores.items()}
+    return sorted(scores, key=scores.get, reverse=True)[:k]
@@ -0,0 +1,228 @@
+"""
+Structured stock screener over the price store.
+
+The latest row of every ticker (close, indicators, recent performance) is
+held in memory as one NumPy array per column, so filter / sort / top-N
+queries are a few vectorised comparisons rather than a vector search and an
+LLM call. ``parse_query`` turns screening questions ("10 stocks performing
+well below price of 1000") into such queries for the RAG path; anything it
+does not recognise is left to retrieval.
+"""
+import re
+import os
+import time
+import logging
+import threading
+
+import numpy as np
+
+from backend import config
+from backend.ingestion.indicators import INDICATOR_COLUMNS
+from backend.ingestion.stock_fetcher import STOCKS, PriceStore, import_csv_if_empty
+from backend.retriever.retriever import resolve_ticker
+
+SCREEN_COLUMNS = ["Open", "High", "Low", "Close", "Volume"] + INDICATOR_COLUMNS
+
+OPERATORS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+_CONDITION_RE = re.compile(r"^\s*(\w+)\s*(<=|>=|==|!=|<|>|=)\s*(-?[\d.]+)\s*$")
+
+
+def parse_condition(text):
+    """"Close<1000" -> ("Close", "<", 1000.0). Raises ValueError if it is not a condition."""
+    match = _CONDITION_RE.match(text)
+    if not match:
+        raise ValueError(f"Invalid condition {text!r}, expected e.g. 'Close<1000' or 'RSI_14>=50'")
+    column, op, value = match.groups()
+    return column, "==" if op == "=" else op, float(value)
+
+
+class Screener:
+    """
+    The latest stored row of each ticker as columnar arrays. ``refresh()``
+    reloads it when the price store has new parts (checked at most every
+    ``FINRAG_SCREENER_REFRESH_SECONDS``). An empty store is first filled from
+    the per-company CSVs in ``csv_dir`` (None: never).
+    """
+
+    def __init__(self, store=None, refresh_seconds=config.SCREENER_REFRESH_SECONDS, csv_dir=config.STOCK_DATA_DIR):
+        self.store = store or PriceStore()
+        if csv_dir:
+            try:
+                import_csv_if_empty(self.store, csv_dir)
+            except Exception as e:
+                logging.warning(f"Could not import the stock CSVs from {csv_dir}: {e}")
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._parts = None
+        self._checked = 0.0
+        self.tickers = np.array([], dtype=object)
+        self.dates = np.array([], dtype="datetime64[D]")
+        self.columns = {name: np.array([], dtype=np.float64) for name in SCREEN_COLUMNS}
+        self.refresh(force=True)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def refresh(self, force=False):
+        """Reloads the table if the store changed since it was loaded. Returns True if it did."""
+        now = time.monotonic()
+        if not force and now - self._checked < self.refresh_seconds:
+            return False
+        with self._lock:
+            self._checked = now
+            parts = [(part, os.path.getmtime(part)) for part in self.store.parts()]
+            if parts == self._parts:
+                return False
+            frame = self.store.load(["Date", "Ticker"] + SCREEN_COLUMNS)
+            latest = frame.groupby("Ticker", sort=True).tail(1) if len(frame) else frame
+            # Swapped in one assignment each, so a concurrent screen() sees old or new arrays
+            self.columns = {name: latest[name].to_numpy(dtype=np.float64) for name in SCREEN_COLUMNS}
+            self.dates = latest["Date"].to_numpy(dtype="datetime64[D]")
+            self.tickers = latest["Ticker"].to_numpy(dtype=object)
+            self._parts = parts
+            logging.info(f"Screener loaded {len(self.tickers)} tickers from {self.store.path}")
+            return True
+
+    def screen(self, conditions=(), sort=None, descending=True, limit=10, tickers=None):
+        """
+        Rows of the tickers matching every ``(column, op, value)`` condition,
+        ordered by ``sort`` (NaNs last) and cut to ``limit``. Returns a list of
+        dicts with the ticker, name, date and screen columns.
+        """
+        self.refresh()
+        tickers_, dates, columns = self.tickers, self.dates, self.columns
+        mask = np.ones(len(tickers_), dtype=bool)
+        for column, op, value in conditions:
+            if column not in columns:
+                raise ValueError(f"Unknown column {column!r}; one of {SCREEN_COLUMNS}")
+            if op not in OPERATORS:
+                raise ValueError(f"Unknown operator {op!r}; one of {list(OPERATORS)}")
+            # NaN compares False, so rows still warming up never pass a filter on that column
+            mask &= OPERATORS[op](columns[column], value)
+        if tickers:
+            mask &= np.isin(tickers_, list(tickers))
+        rows = np.flatnonzero(mask)
+
+        if sort is not None:
+            if sort not in columns:
+                raise ValueError(f"Unknown sort column {sort!r}; one of {SCREEN_COLUMNS}")
+            keys = columns[sort][rows]
+            keys = np.where(np.isnan(keys), np.inf, -keys if descending else keys)
+            if limit and limit < len(rows):
+                top = np.argpartition(keys, limit - 1)[:limit]
+                rows = rows[top[np.argsort(keys[top], kind="stable")]]
+            else:
+                rows = rows[np.argsort(keys, kind="stable")]
+        if limit:
+            rows = rows[:limit]
+
+        return [
+            {"ticker": tickers_[i], "name": STOCKS.get(tickers_[i], tickers_[i]), "date": str(dates[i]),
+             **{name: (None if np.isnan(values[i]) else round(float(values[i]), 4)) for name, values in columns.items()}}
+            for i in rows
+        ]
+
+
+# --- Screening questions (the RAG path) ---
+
+_COUNT_RE = re.compile(r"\b(?:top\s+)?(\d{1,3})\s+(?:\w+\s+){0,2}(?:stocks|shares|companies|tickers)\b", re.I)
+_SCREEN_RE = re.compile(r"\b(?:stocks|shares|companies|tickers)\b", re.I)
+_PRICE_BELOW_RE = re.compile(r"\b(?:below|under|less than|cheaper than|lower than)\s+(?:a\s+)?(?:the\s+)?(?:price\s+(?:of\s+)?)?(?:rs\.?|inr|₹)?\s*([\d,]+(?:\.\d+)?)", re.I)
+_PRICE_ABOVE_RE = re.compile(r"\b(?:above|over|more than|greater than|higher than)\s+(?:a\s+)?(?:the\s+)?(?:price\s+(?:of\s+)?)?(?:rs\.?|inr|₹)?\s*([\d,]+(?:\.\d+)?)", re.I)
+_BEST_RE = re.compile(r"\b(?:performing well|best|top(?:\s+\d+)?\s+performing|top gainers?|gaining|outperform\w*|strongest)\b", re.I)
+_WORST_RE = re.compile(r"\b(?:worst|performing (?:badly|poorly)|underperform\w*|losers?|weakest|falling)\b", re.I)
+# Ranking on its own is only a screen when it is about performance ("top 5 performing"), not "best 3 stocks"
+_PERFORMANCE_RE = re.compile(r"\b(?:\w*perform\w*|gainers?|losers?|gaining|falling|strongest|weakest)\b", re.I)
+# The screener only knows the latest row of the tracked stocks: questions about a period or an index are retrieval's
+_PERIOD_RE = re.compile(r"\b(?:(?:19|20)\d{2}|(?:this|last|past|previous|next)\s+(?:\d+\s+)?(?:days?|weeks?|months?|quarters?|years?|decades?)"
+                        r"|ytd|year[- ]to[- ]date|since|fy\s*\d{2,4}|q[1-4])\b", re.I)
+_UNIVERSE_RE = re.compile(r"\b(?:nifty|sensex|bse|s&p|nasdaq|dow jones|index|indices|sectors?|(?:small|mid|large)[- ]?caps?)\b", re.I)
+_OVERSOLD_RE = re.compile(r"\boversold\b", re.I)
+_OVERBOUGHT_RE = re.compile(r"\boverbought\b", re.I)
+
+
+def parse_query(query):
+    """
+    A screener query (dict of ``screen()`` arguments) for a screening
+    question, or None if the question is not one: it must ask about stocks,
+    name no period or index, and carry a price / indicator condition or a
+    count and a performance ranking cue.
+    """
+    if not _SCREEN_RE.search(query):
+        return None
+    conditions, sort, descending = [], None, True
+    rest = query
+    for pattern, op in ((_PRICE_BELOW_RE, "<"), (_PRICE_ABOVE_RE, ">")):
+        match = pattern.search(query)
+        if match:
+            conditions.append(("Close", op, float(match.group(1).replace(",", ""))))
+            # So a price such as 2000 is not read as a year below
+            rest = rest.replace(match.group(0), " ")
+    if _PERIOD_RE.search(rest) or _UNIVERSE_RE.search(rest):
+        return None
+    if _OVERSOLD_RE.search(query):
+        conditions.append(("RSI_14", "<", 30.0))
+    if _OVERBOUGHT_RE.search(query):
+        conditions.append(("RSI_14", ">", 70.0))
+    if _WORST_RE.search(query):
+        sort, descending = "Perf", False
+    elif _BEST_RE.search(query):
+        sort = "Perf"
+    count = _COUNT_RE.search(query)
+    # A ranking cue alone ("best companies to invest in", "best 3 stocks") needs a count and a performance cue
+    if not conditions and (sort is None or not count or not _PERFORMANCE_RE.search(query)):
+        return None
+    return {"conditions": conditions, "sort": sort or "Perf", "descending": descending,
+            "limit": int(count.group(1)) if count else 10}
+
+
+def _describe(screen_query):
+    parts = [f"{column} {op} {value:g}" for column, op, value in screen_query["conditions"]]
+    order = "best" if screen_query["descending"] else "worst"
+    return (f" with {' and '.join(parts)}" if parts else "") + f", {order} 5-day performance first"
+
+
+def _known(value):
+    return value is not None and not np.isnan(value)
+
+
+def format_answer(screen_query, rows):
+    """A plain-text answer listing the screened rows; missing values (None or NaN) are left out."""
+    if not rows:
+        return f"No tracked stocks{_describe(screen_query)}."
+    lines = [f"{len(rows)} tracked stock{'s' if len(rows) != 1 else ''}{_describe(screen_query)} (as of {rows[0]['date']}):"]
+    for i, row in enumerate(rows, 1):
+        metrics = [f"close {row['Close']:,.2f}" if _known(row["Close"]) else "close n/a"]
+        if _known(row["Perf"]):
+            metrics.append(f"5-day {row['Perf']:+.2f}%")
+        if _known(row["RSI_14"]):
+            metrics.append(f"RSI {row['RSI_14']:.1f}")
+        if _known(row["MACDh_12_26_9"]):
+            metrics.append(f"MACD hist {row['MACDh_12_26_9']:+.2f}")
+        lines.append(f"{i}. {row['name']} ({row['ticker']}): " + ", ".join(metrics))
+    return "\n".join(lines)
+
+
+def answer_question(screener, query, tickers=None):
+    """
+    The screener's answer to a screening question, or None if ``query`` is
+    not one (or the price store is empty), in which case retrieval answers it.
+    ``tickers`` (names or symbols) restricts the screen like the RAG filters do.
+    """
+    if not config.SCREENER_ROUTING or screener is None:
+        return None
+    screen_query = parse_query(query)
+    if screen_query is None or not len(screener):
+        return None
+    if tickers:
+        screen_query["tickers"] = [resolve_ticker(t) or t for t in tickers]
+    rows = screener.screen(**screen_query)
+    logging.info(f"Answered from the screener: {screen_query} -> {len(rows)} rows")
+    return format_answer(screen_query, rows)
@@ -0,0 +1,112 @@
+"""
+Time partitioning of a vector store's dense index.
+
+The vectors are split into shards by the publication date of their article
+(FINRAG_SHARD_PERIOD: day, week or month; "none" keeps a single index). Every
+shard is a FAISS index of the store's type whose ids are chunk rows, so the
+chunk table, text, BM25 index and filters are shared by all shards. The
+shard list (shards.json) records the first and last article date of each
+shard: a search with a date window only runs on the shards overlapping it,
+in parallel, and their hits are merged into one top-k.
+
+Day and week shards are merged into monthly shards once they are older than
+FINRAG_SHARD_COMPACT_AFTER_DAYS, so the number of shards stays bounded.
+"""
+import os
+import json
+import datetime
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import faiss
+import numpy as np
+
+from backend import config
+
+PERIODS = ("none", "day", "week", "month")
+# Key of the single shard of an unsharded store, and of articles without a date
+ALL = "all"
+UNDATED = "undated"
+
+SHARDS_FILE = "shards.json"
+# Trained, empty index new shards are copied from (IVF centroids, PQ / SQ codebooks)
+TEMPLATE_FILE = "shard_template.faiss"
+
+_EPOCH = datetime.date(1970, 1, 1)
+
+# first_day / last_day: days since epoch of the oldest / newest article in the
+# shard (-1 for the undated shard); None if unknown, i.e. always searched
+Shard = namedtuple("Shard", ["key", "first_day", "last_day", "index"])
+
+
+def shard_key(day, period):
+    """Key of the shard holding an article published on ``day`` (days since epoch, -1 if undated)."""
+    if period == "none":
+        return ALL
+    if day < 0:
+        return UNDATED
+    date = _EPOCH + datetime.timedelta(days=int(day))
+    if period == "day":
+        return date.isoformat()
+    if period == "week":
+        year, week, _ = date.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == "month":
+        return f"{date.year}-{date.month:02d}"
+    raise ValueError(f"Unknown shard period {period!r}; one of {PERIODS}")
+
+
+def shard_file(key):
+    return f"shard-{key}.faiss"
+
+
+def read_shard_list(store_dir):
+    """The parsed shards.json of a store version; None for a store written before sharding."""
+    try:
+        with open(os.path.join(store_dir, SHARDS_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def select_shards(shards, first_day=None, last_day=None):
+    """The shards that can hold articles dated within [first_day, last_day] (either end open if None)."""
+    if first_day is None and last_day is None:
+        return list(shards)
+    # Undated articles never match a date filter
+    first_day = max(first_day if first_day is not None else 0, 0)
+    return [shard for shard in shards
+            if shard.first_day is None
+            or shard.last_day >= first_day and (last_day is None or shard.first_day <= last_day)]
+
+
+_pool = None
+
+
+def _search_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(config.SHARD_SEARCH_THREADS or os.cpu_count(), thread_name_prefix="shard-search")
+    return _pool
+
+
+def search_shards(shards, vectors, k, params_for):
+    """
+    Top-k (scores, rows) arrays of shape (n_queries, k) over ``shards``, best
+    first and padded with row -1. ``params_for(index)`` gives the FAISS search
+    parameters of a shard. Shards are searched in parallel (FAISS releases
+    the GIL while searching).
+    """
+    def search(shard):
+        return shard.index.search(vectors, k, params=params_for(shard.index))
+
+    if len(shards) == 1:
+        return search(shards[0])
+    results = list(_search_pool().map(search, shards))
+    scores = np.concatenate([scores for scores, _ in results], axis=1)
+    rows = np.concatenate([rows for _, rows in results], axis=1)
+    # Distances (L2) rank ascending, similarities (inner product) descending
+    similarity = shards[0].index.metric_type == faiss.METRIC_INNER_PRODUCT
+    keys = np.where(rows == -1, np.inf, -scores if similarity else scores)
+    order = np.argsort(keys, axis=1, kind="stable")[:, :k]
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(rows, order, axis=1)
@@ -0,0 +1,831 @@
+import os
+import json
+import shutil
+import logging
+import datetime
+import threading
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+from backend import config
+from backend.retriever.ann_index import (
+    build_index, empty_like, merge_into, reconstruct_rows, renumber_ids, search_parameters, stored_ids, supports_removal
+)
+from backend.retriever.bm25 import BM25Index, bm25_exists
+from backend.retriever.retriever import resolve_ticker
+from backend.retriever.shards import (
+    ALL, SHARDS_FILE, TEMPLATE_FILE, Shard, read_shard_list, search_shards, select_shards, shard_file, shard_key
+)
+
+# On-disk layout of a vector store directory:
+#   shard-<key>.faiss  FAISS indexes of the configured type (see ann_index.py),
+#                  one per publication period (see shards.py, listed in
+#                  shards.json); vector ids are row numbers in chunks.npy.
+#                  Older stores have a single index.faiss
+#   chunks.npy     one (article id, start, end) record per chunk; start/end are
+#                  byte offsets into text.bin
+#   articles.jsonl article records (title, url, date, source, tickers, ...) stored
+#                  once, one JSON object per line; article_offsets.npy holds the
+#                  byte offset of each line (articles.json in older stores)
+#   attributes.npy filterable columns of the articles (date, source, tickers),
+#                  with the source / ticker names in attributes.json
+#   text.bin       UTF-8 article bodies, each stored once, back to back
+#   bm25_*         sparse inverted index over the same chunk rows (see bm25.py)
+#   manifest.json  the embedder's incremental manifest (see embedder.py)
+#   store.json     the manifest without its per-article entries (embedding
+#                  model, index type), read when the store is opened
+#
+# Everything a server reads is memory-mapped rather than deserialised, so
+# several worker processes serving one store share a single copy of it in the
+# OS page cache, and opening it costs no parsing.
+#
+# Each save writes a complete new version under versions/<name>/ and then
+# points CURRENT at it (one atomic rename), so readers never see a
+# half-written store and a running server can swap versions while serving.
+# A directory without CURRENT holds a single unversioned store, as written
+# before versioning; its first save starts the versions/ layout.
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.npy"
+ARTICLES_FILE = "articles.jsonl"
+ARTICLE_OFFSETS_FILE = "article_offsets.npy"
+ATTRIBUTES_FILE = "attributes.npy"
+ATTRIBUTE_VALUES_FILE = "attributes.json"
+TEXT_FILE = "text.bin"
+MANIFEST_FILE = "manifest.json"
+STORE_INFO_FILE = "store.json"
+STORE_FILES = (CHUNKS_FILE, TEXT_FILE)
+# Article records of stores written before articles.jsonl, loaded whole
+LEGACY_ARTICLES_FILE = "articles.json"
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+
+CHUNK_DTYPE = np.dtype([("article", "<i4"), ("start", "<i8"), ("end", "<i8")])
+# date: days since epoch (-1 if unknown); source: index into the source names;
+# tickers: bit i set for the i-th ticker name
+ATTRIBUTE_DTYPE = np.dtype([("date", "<i4"), ("source", "<i4"), ("tickers", "<u8")])
+# Chunk rows removed from the index keep their slot, marked with this article id
+DELETED = -1
+
+
+def current_version(vector_store_path):
+    """Name of the published version of a versioned store; None for an unversioned one."""
+    try:
+        with open(os.path.join(vector_store_path, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def current_store_dir(vector_store_path):
+    """Directory holding the files of the store's published version."""
+    version = current_version(vector_store_path)
+    return os.path.join(vector_store_path, VERSIONS_DIR, version) if version else vector_store_path
+
+
+def list_versions(vector_store_path):
+    """Published-or-older version names, oldest first."""
+    versions_dir = os.path.join(vector_store_path, VERSIONS_DIR)
+    if not os.path.isdir(versions_dir):
+        return []
+    return sorted(name for name in os.listdir(versions_dir) if name.startswith("v") and name[1:].isdigit())
+
+
+def publish_version(vector_store_path, version):
+    """Points CURRENT at ``version`` (atomic: readers see the old or the new version, never a mix)."""
+    _write_atomic(os.path.join(vector_store_path, CURRENT_FILE), lambda f: f.write(version.encode("ascii")))
+
+
+def prune_versions(vector_store_path, keep=None):
+    """
+    Deletes all but the newest ``keep`` versions (never the published one).
+    Servers still reading an older version keep its open files until they swap.
+    """
+    keep = config.VECTOR_STORE_KEEP_VERSIONS if keep is None else keep
+    current = current_version(vector_store_path)
+    for version in list_versions(vector_store_path)[:-max(keep, 1)]:
+        if version != current:
+            shutil.rmtree(os.path.join(vector_store_path, VERSIONS_DIR, version), ignore_errors=True)
+
+
+def index_version(vector_store_path):
+    """
+    Cheap identifier of the store on disk: the published version name, or for
+    an unversioned store a fingerprint (mtime + size of its files). Changes
+    whenever the embedder rebuilds or updates the store; None if missing.
+    """
+    version = current_version(vector_store_path)
+    if version:
+        return version
+    parts = []
+    for name in (INDEX_FILE, CHUNKS_FILE, LEGACY_ARTICLES_FILE):
+        try:
+            st = os.stat(os.path.join(vector_store_path, name))
+        except OSError:
+            return None
+        parts.append(f"{st.st_mtime_ns}-{st.st_size}")
+    return ":".join(parts)
+
+
+class EmbeddingModelMismatch(ValueError):
+    """The store was embedded with another model than the one embedding the queries."""
+
+
+def store_model(store_dir):
+    """Embedding model a store version was built with; None if it does not say."""
+    for name in (STORE_INFO_FILE, MANIFEST_FILE):
+        # Stores written before store.json only record it in the (full) manifest
+        try:
+            with open(os.path.join(store_dir, name), "r", encoding="utf-8") as f:
+                return json.load(f).get("model")
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def check_embedding_model(store_dir, embeddings):
+    """Raises EmbeddingModelMismatch if ``embeddings`` is not the model the store was embedded with."""
+    model = getattr(embeddings, "model", None)
+    stored = store_model(store_dir)
+    if model is not None and stored is not None and model != stored:
+        raise EmbeddingModelMismatch(f"Vector store {store_dir} was embedded with {stored!r}, but queries "
+                                     f"would be embedded with {model!r}; re-run the embedder or change "
+                                     f"FINRAG_EMBEDDING_BACKEND / FINRAG_EMBEDDING_MODEL")
+
+
+def store_exists(vector_store_path):
+    store_dir = current_store_dir(vector_store_path)
+    return (all(os.path.exists(os.path.join(store_dir, name)) for name in STORE_FILES)
+            and any(os.path.exists(os.path.join(store_dir, name)) for name in (SHARDS_FILE, INDEX_FILE))
+            and any(os.path.exists(os.path.join(store_dir, name)) for name in (ARTICLES_FILE, LEGACY_ARTICLES_FILE)))
+
+
+def read_shards(store_dir, mmap=True):
+    """
+    The dense index shards of a store version (memory-mapped unless
+    ``mmap=False``). A store written before sharding is one shard of unknown
+    dates, which every search includes.
+    """
+    read = read_index_mmap if mmap else faiss.read_index
+    shard_list = read_shard_list(store_dir)
+    if shard_list is None:
+        return [Shard(ALL, None, None, read(os.path.join(store_dir, INDEX_FILE)))]
+    return [Shard(entry["key"], entry["first_day"], entry["last_day"], read(os.path.join(store_dir, shard_file(entry["key"]))))
+            for entry in shard_list["shards"]]
+
+
+def store_is_mapped(store_dir):
+    """
+    True if every file of the store version in ``store_dir`` can be memory-mapped.
+    Older stores are still served, with their article records and BM25
+    vocabulary loaded into each process; the next embed rewrites them.
+    """
+    return (all(os.path.exists(os.path.join(store_dir, name))
+                for name in (ARTICLES_FILE, ARTICLE_OFFSETS_FILE, ATTRIBUTES_FILE, ATTRIBUTE_VALUES_FILE))
+            and bm25_exists(store_dir, legacy=False))
+
+
+def read_index_mmap(path):
+    """
+    Opens a FAISS index read-only and memory-mapped, so vectors are paged in
+    from the OS page cache on demand instead of being copied into the heap.
+    Falls back to a regular read on FAISS builds without mmap support.
+    """
+    mmap = faiss.IO_FLAG_READ_ONLY | faiss.IO_FLAG_MMAP
+    # The in-place (IFC) flag covers flat/HNSW/SQ codes; IVF inverted lists only take plain MMAP
+    for flags in (mmap | getattr(faiss, "IO_FLAG_MMAP_IFC", 0), mmap):
+        try:
+            return faiss.read_index(path, flags)
+        except RuntimeError as e:
+            error = e
+    logging.warning(f"Memory-mapped read of {path} failed ({error}); loading it into memory instead")
+    return faiss.read_index(path)
+
+
+_EPOCH = datetime.date(1970, 1, 1)
+
+
+def _day_number(date):
+    """Days since the epoch of an ISO date ("2025-08-03", or a timestamp starting with one)."""
+    return int(np.datetime64(str(date)[:10], "D").astype(np.int64))
+
+
+def _map_text(path):
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r")
+
+
+def load_article_records(store_dir):
+    """All article records of a store version, as a list (for the writer)."""
+    if not os.path.exists(os.path.join(store_dir, ARTICLES_FILE)):
+        with open(os.path.join(store_dir, LEGACY_ARTICLES_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    with open(os.path.join(store_dir, ARTICLES_FILE), "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def article_attributes(articles):
+    """Filter columns of ``articles`` (an ATTRIBUTE_DTYPE array) and the source and ticker names they index."""
+    sources = sorted({a.get("source") or "" for a in articles})
+    tickers = sorted({t for a in articles for t in a.get("tickers", ())})
+    source_codes = {source: i for i, source in enumerate(sources)}
+    ticker_bits = {ticker: 1 << i for i, ticker in enumerate(tickers)}
+    columns = np.zeros(len(articles), dtype=ATTRIBUTE_DTYPE)
+    columns["date"] = [_day_number(a["date"]) if a.get("date") else -1 for a in articles]
+    columns["source"] = [source_codes[a.get("source") or ""] for a in articles]
+    columns["tickers"] = [sum(ticker_bits[t] for t in a.get("tickers", ())) for a in articles]
+    return columns, {"sources": sources, "tickers": tickers}
+
+
+class ArticleRecords:
+    """
+    Read-only sequence of the article records in articles.jsonl. Records are
+    decoded one at a time from the memory-mapped file when indexed, so no
+    process holds all of them.
+    """
+
+    def __init__(self, store_dir):
+        self.offsets = np.load(os.path.join(store_dir, ARTICLE_OFFSETS_FILE), mmap_mode="r")
+        self.data = _map_text(os.path.join(store_dir, ARTICLES_FILE))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, article_id):
+        if not -len(self) <= article_id < len(self):
+            raise IndexError(f"article id {article_id} out of range")
+        article_id %= len(self)
+        return json.loads(bytes(self.data[self.offsets[article_id]:self.offsets[article_id + 1]]))
+
+    def __iter__(self):
+        for article_id in range(len(self)):
+            yield self[article_id]
+
+
+def _link_or_copy(source, target):
+    # Files of a version are never modified once published, so versions can share them
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def _write_atomic(path, write):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+class VectorStore:
+    """
+    Read-only vector store for serving.
+
+    The FAISS index shards, the chunk table, the text blob, the article records and
+    filter columns and the BM25 index are all memory-mapped, so opening a
+    store is cheap and its pages are shared by every process serving it;
+    resident memory scales with unique article text rather than text x chunks.
+    Search results are rebuilt on demand from (article, byte range).
+    Opens the version of the store published when it is created; see
+    versioned_store.py for following newer versions.
+    """
+
+    def __init__(self, vector_store_path, embeddings=None):
+        self.root = vector_store_path
+        # CURRENT is read once, so every file comes from the same version
+        version = current_version(vector_store_path)
+        self.path = os.path.join(vector_store_path, VERSIONS_DIR, version) if version else vector_store_path
+        self.version = version or index_version(vector_store_path)
+        # Vectors of different models are not comparable: fail here rather than return wrong results
+        check_embedding_model(self.path, embeddings)
+        self.embeddings = embeddings
+        self.shards = read_shards(self.path)
+        self.chunks = np.load(os.path.join(self.path, CHUNKS_FILE), mmap_mode="r")
+        self.text = _map_text(os.path.join(self.path, TEXT_FILE))
+        # Indexes that cannot remove vectors (HNSW) still hold tombstoned rows
+        self._has_dead_vectors = (not all(supports_removal(shard.index) for shard in self.shards)
+                                  and self.ntotal > len(self.chunks) - int((self.chunks["article"] == DELETED).sum()))
+        self._articles = None
+        self._attributes = None
+        self._bm25 = None
+        self._lazy_lock = threading.Lock()
+
+    @property
+    def bm25(self):
+        """Sparse index over the chunks; None for stores written before it existed."""
+        if self._bm25 is None and bm25_exists(self.path):
+            with self._lazy_lock:
+                if self._bm25 is None:
+                    self._bm25 = BM25Index.load(self.path)
+        return self._bm25
+
+    @property
+    def articles(self):
+        """Article records by article id (an ArticleRecords; a list for older stores)."""
+        if self._articles is None:
+            with self._lazy_lock:
+                if self._articles is None:
+                    if os.path.exists(os.path.join(self.path, ARTICLES_FILE)):
+                        self._articles = ArticleRecords(self.path)
+                    else:
+                        self._articles = load_article_records(self.path)
+        return self._articles
+
+    @property
+    def attributes(self):
+        """
+        Filterable article attributes as columns indexed by article id:
+        ``date`` (days since epoch, -1 if unknown), ``source`` (code into
+        ``sources``) and ``tickers`` (bit i set for ``tickers[i]``).
+        """
+        if self._attributes is None:
+            # Older stores have no attributes.npy: computed from the records instead
+            mapped = os.path.exists(os.path.join(self.path, ATTRIBUTES_FILE))
+            articles = None if mapped else self.articles
+            with self._lazy_lock:
+                if self._attributes is None:
+                    if mapped:
+                        columns = np.load(os.path.join(self.path, ATTRIBUTES_FILE), mmap_mode="r")
+                        with open(os.path.join(self.path, ATTRIBUTE_VALUES_FILE), "r", encoding="utf-8") as f:
+                            values = json.load(f)
+                    else:
+                        columns, values = article_attributes(articles)
+                    self._attributes = {
+                        "date": columns["date"],
+                        "source": columns["source"],
+                        "tickers": columns["tickers"],
+                        "sources": values["sources"],
+                        "ticker_list": values["tickers"],
+                        "newest_date": int(columns["date"].max(initial=-1)),
+                    }
+        return self._attributes
+
+    @property
+    def ntotal(self):
+        return sum(shard.index.ntotal for shard in self.shards)
+
+    def warm_up(self):
+        """Opens the article records, filter columns and sparse index, and pre-faults the chunk table."""
+        len(self.articles)
+        self.attributes
+        self.bm25
+        int(self.chunks["end"].max(initial=0))
+
+    def close(self):
+        """Drops the memory maps and loaded records; the store cannot be searched afterwards."""
+        with self._lazy_lock:
+            self.shards = []
+            self.chunks = self.text = None
+            self._articles = self._attributes = self._bm25 = None
+
+    def chunk_text(self, row):
+        chunk = self.chunks[row]
+        return bytes(self.text[chunk["start"]:chunk["end"]]).decode("utf-8")
+
+    def get_document(self, row):
+        chunk = self.chunks[row]
+        article_id = int(chunk["article"])
+        metadata = dict(self.articles[article_id])
+        metadata["chunk_id"] = int(row)
+        # Byte range in text.bin; lets overlapping chunks of one article be merged exactly
+        metadata["article_id"] = article_id
+        metadata["span"] = (int(chunk["start"]), int(chunk["end"]))
+        return Document(page_content=self.chunk_text(row), metadata=metadata)
+
+    def live_rows(self):
+        return np.flatnonzero(self.chunks["article"] != DELETED)
+
+    def filter_mask(self, filters):
+        """
+        Boolean mask over chunk rows matching ``filters``, or None when nothing is filtered.
+
+        filters: dict with any of ``tickers`` (symbols, names or aliases from
+        STOCKS; any-of), ``sources`` (substrings of the source host; any-of),
+        ``date_from`` / ``date_to`` (inclusive ISO dates). Articles without a
+        date never match a date filter.
+        """
+        filters = {key: value for key, value in (filters or {}).items() if value}
+        if not filters:
+            return None
+        attrs = self.attributes
+        articles = np.ones(len(attrs["date"]), dtype=bool)
+        if "tickers" in filters:
+            wanted = {resolve_ticker(t) for t in filters["tickers"]}
+            bits = sum(1 << i for i, ticker in enumerate(attrs["ticker_list"]) if ticker in wanted)
+            articles &= (attrs["tickers"] & np.uint64(bits)) != 0
+        if "sources" in filters:
+            wanted = [source.lower() for source in filters["sources"]]
+            codes = [i for i, source in enumerate(attrs["sources"]) if any(w in source.lower() for w in wanted)]
+            articles &= np.isin(attrs["source"], codes)
+        if "date_from" in filters:
+            articles &= attrs["date"] >= _day_number(filters["date_from"])
+        if "date_to" in filters:
+            articles &= attrs["date"] <= _day_number(filters["date_to"])
+        if "date_from" in filters or "date_to" in filters:
+            articles &= attrs["date"] >= 0
+
+        chunk_articles = np.asarray(self.chunks["article"])
+        mask = np.zeros(len(chunk_articles), dtype=bool)
+        live = chunk_articles != DELETED
+        mask[live] = articles[chunk_articles[live]]
+        return mask
+
+    def search_rows(self, embedding, k=4, filters=None, nprobe=None, ef_search=None):
+        """
+        Dense top-k as (rows, distances), nearest first. With ``filters`` the
+        matching rows are passed to FAISS as an ID selector, so only those
+        vectors are scanned and up to k matching hits come back.
+        ``nprobe`` / ``ef_search`` override the configured IVF / HNSW search knobs.
+        """
+        return self.search_rows_many([embedding], k, filters, nprobe, ef_search)[0]
+
+    def search_rows_many(self, embeddings, k=4, filters=None, nprobe=None, ef_search=None):
+        """
+        search_rows for several query vectors with one multi-row FAISS search
+        per shard (one pass over the index for the whole batch). Returns a list
+        of (rows, distances), one per query; ``filters`` apply to all of them.
+        With a date filter only the shards overlapping the window are searched.
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+        filters = filters or {}
+        shards = select_shards(self.shards,
+                               _day_number(filters["date_from"]) if filters.get("date_from") else None,
+                               _day_number(filters["date_to"]) if filters.get("date_to") else None)
+        mask = self.filter_mask(filters)
+        if mask is None and self._has_dead_vectors:
+            mask = np.asarray(self.chunks["article"]) != DELETED
+        empty = [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in range(len(vectors))]
+        if not shards:
+            return empty
+        selector = None
+        if mask is not None:
+            if not mask.any():
+                return empty
+            bitmap = np.packbits(mask, bitorder="little")
+            selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+        scores, rows = search_shards(shards, vectors, k,
+                                     lambda index: search_parameters(index, selector, nprobe, ef_search))
+        found = rows != -1
+        return [(rows[i][found[i]], scores[i][found[i]]) for i in range(len(vectors))]
+
+    def recency_weights(self, rows, half_life_days):
+        """
+        Decay factor 0.5 ** (age / half_life_days) of each chunk row, its age
+        counted in days before the newest article in the store. Articles
+        without a date are not decayed.
+        """
+        attrs = self.attributes
+        dates = attrs["date"][np.asarray(self.chunks["article"])[np.asarray(rows, dtype=np.int64)]]
+        age = np.maximum(attrs["newest_date"] - dates, 0)
+        return np.where(dates >= 0, 0.5 ** (age / half_life_days), 1.0)
+
+    def keyword_search_rows(self, query, k=4, filters=None):
+        """BM25 top-k as (rows, scores), best first; empty if the store has no sparse index."""
+        if self.bm25 is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return self.bm25.search(query, k, allowed=self.filter_mask(filters))
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filters=None):
+        rows, scores = self.search_rows(embedding, k, filters)
+        return [(self.get_document(row), float(score)) for row, score in zip(rows, scores)]
+
+    def similarity_search_by_vector(self, embedding, k=4, filters=None):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, filters)]
+
+    def similarity_search(self, query, k=4, filters=None):
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k, filters)
+
+
+class VectorStoreWriter:
+    """
+    Mutable, fully in-memory view of a vector store used by the embedder.
+    Article text is appended to text.bin; new chunks go to the index shard of
+    their article's publication period; removed chunks are dropped from the
+    shards and tombstoned in the chunk table until save() compacts them away.
+    Nothing on disk changes until save(), which writes a new version and
+    publishes it.
+    With ``reset=True`` any existing store is ignored and replaced on save(); the
+    new index (``index_type``, default config.INDEX_TYPE, sharded by ``period``,
+    default config.SHARD_PERIOD) is trained by train(), or on the first
+    add_chunks() from that batch alone.
+    """
+
+    def __init__(self, vector_store_path, dim=None, reset=False, index_type=None, period=None):
+        self.root = vector_store_path
+        # Files of the version being extended (replaced by the new version on save)
+        self.path = current_store_dir(vector_store_path)
+        self.reset = reset
+        self.index_type = index_type or config.INDEX_TYPE
+        self.period = period or config.SHARD_PERIOD
+        self._dim = dim
+        # Shards changed since the version was loaded; the others are linked into the new version
+        self._dirty = set()
+        os.makedirs(vector_store_path, exist_ok=True)
+        if not reset and store_exists(vector_store_path):
+            self.shards = {shard.key: shard.index for shard in read_shards(self.path, mmap=False)}
+            shard_list = read_shard_list(self.path)
+            if shard_list is None:
+                # Unsharded store: one index, and its training has to be copied from it
+                self.period = "none"
+                self.template = empty_like(self.shards[ALL])
+            else:
+                self.period = shard_list["period"]
+                self.template = faiss.read_index(os.path.join(self.path, TEMPLATE_FILE))
+            self.chunks = list(np.load(os.path.join(self.path, CHUNKS_FILE)).tolist())
+            self.articles = load_article_records(self.path)
+            self.text_size = os.path.getsize(os.path.join(self.path, TEXT_FILE))
+            if bm25_exists(self.path):
+                self.bm25 = BM25Index.load(self.path, mmap=False)
+            else:
+                self.bm25 = BM25Index.build(self._live_texts(), len(self.chunks))
+        else:
+            if dim is None:
+                raise ValueError(f"No vector store at {vector_store_path}; a dimension is needed to create one")
+            self.template = None
+            self.shards = {}
+            self.chunks = []
+            self.articles = []
+            self.text_size = 0
+            self.bm25 = BM25Index.empty()
+        self._pending_text = []
+        self._pending_size = 0
+        self._bm25_add = []
+        self._bm25_remove = []
+
+    def _live_texts(self):
+        text = _map_text(os.path.join(self.path, TEXT_FILE))
+        for row, (article, start, end) in enumerate(self.chunks):
+            if article != DELETED:
+                yield row, bytes(text[start:end]).decode("utf-8")
+
+    @property
+    def dim(self):
+        return self.template.d if self.template is not None else self._dim
+
+    @property
+    def ntotal(self):
+        return sum(index.ntotal for index in self.shards.values())
+
+    def train(self, vectors):
+        """Creates the (empty) template index of a reset store's shards, training it on ``vectors``."""
+        self.template = build_index(self.dim, self.index_type, vectors)
+
+    def _shard(self, key):
+        if key not in self.shards:
+            self.shards[key] = empty_like(self.template)
+        self._dirty.add(key)
+        return self.shards[key]
+
+    def _add_vectors(self, rows, vectors):
+        """Adds vectors to the shards of their rows' articles."""
+        article_keys, keys = {}, {}
+        for row in rows:
+            article_id = self.chunks[row][0]
+            if article_id not in article_keys:
+                date = self.articles[article_id].get("date")
+                article_keys[article_id] = shard_key(_day_number(date) if date else -1, self.period)
+            keys.setdefault(article_keys[article_id], []).append(row)
+        position = {row: i for i, row in enumerate(rows)}
+        for key, shard_rows in keys.items():
+            self._shard(key).add_with_ids(vectors[[position[row] for row in shard_rows]],
+                                          np.asarray(shard_rows, dtype=np.int64))
+
+    def rebuild_index(self, index_type, period=None):
+        """
+        Re-creates the index shards as ``index_type``, partitioned by ``period``
+        (default: unchanged), from the vectors they already hold, without
+        re-embedding. Vectors read back from a quantized index are
+        approximations; rebuild from embeddings to get exact ones.
+        """
+        rows, vectors = [], []
+        for index in self.shards.values():
+            ids = stored_ids(index)
+            # Tombstoned rows still in an HNSW graph are left behind
+            ids = ids[[self.chunks[row][0] != DELETED for row in ids]] if len(ids) else ids
+            if len(ids):
+                rows.append(ids)
+                vectors.append(reconstruct_rows(index, ids))
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        vectors = np.concatenate(vectors) if vectors else np.zeros((0, self.dim), dtype=np.float32)
+        self.index_type = index_type
+        self.period = period or self.period
+        self.train(vectors)
+        self.shards = {}
+        if len(rows):
+            self._add_vectors(rows.tolist(), vectors)
+
+    def add_text(self, text):
+        """Appends text to the blob; returns its byte offset."""
+        data = text.encode("utf-8")
+        offset = self.text_size + self._pending_size
+        self._pending_text.append(data)
+        self._pending_size += len(data)
+        return offset
+
+    def add_article(self, record, text):
+        """Stores an article record and its body once; returns (article id, byte offset of the body)."""
+        self.articles.append(record)
+        return len(self.articles) - 1, self.add_text(text)
+
+    def add_chunks(self, spans, vectors, texts):
+        """
+        spans: (article id, start, end) byte ranges, one per vector and chunk text.
+        Returns the row ids assigned to the new chunks.
+        """
+        first = len(self.chunks)
+        rows = np.arange(first, first + len(spans), dtype=np.int64)
+        self.chunks.extend(spans)
+        if len(spans):
+            if self.template is None:
+                self.train(vectors)
+            self._add_vectors(rows.tolist(), np.asarray(vectors, dtype=np.float32))
+            self._bm25_add.extend(zip(rows.tolist(), texts))
+        return rows.tolist()
+
+    def remove_chunks(self, rows):
+        if not rows:
+            return
+        ids = np.asarray(rows, dtype=np.int64)
+        for key, index in self.shards.items():
+            if supports_removal(index) and index.remove_ids(ids):
+                self._dirty.add(key)
+        self._bm25_remove.extend(rows)
+        for row in rows:
+            self.chunks[row] = (DELETED, 0, 0)
+
+    def _shard_dates(self):
+        """{key: (first day, last day)} of the live articles in each shard; shards without any are left out."""
+        chunk_articles = np.array([chunk[0] for chunk in self.chunks], dtype=np.int64)
+        days = article_attributes(self.articles)[0]["date"]
+        dates = {}
+        for key, index in self.shards.items():
+            articles = chunk_articles[stored_ids(index)]
+            articles = articles[articles != DELETED]
+            if len(articles):
+                dates[key] = (int(days[articles].min()), int(days[articles].max()))
+        return dates
+
+    def compact(self, before_day):
+        """
+        Merges the day / week shards whose newest article is older than
+        ``before_day`` (days since epoch) into monthly shards. Returns the
+        number of shards merged away.
+        """
+        merged = 0
+        for key, (first_day, last_day) in self._shard_dates().items():
+            target = shard_key(first_day, "month")
+            if last_day >= before_day or first_day < 0 or target == key or key == ALL:
+                continue
+            merge_into(self._shard(target), self.shards.pop(key))
+            self._dirty.discard(key)
+            merged += 1
+        if merged:
+            logging.info(f"Compacted {merged} index shards older than {_EPOCH + datetime.timedelta(days=before_day)}")
+        return merged
+
+    def dead_fraction(self):
+        """Fraction of the chunk rows that are tombstones."""
+        if not self.chunks:
+            return 0.0
+        return sum(chunk[0] == DELETED for chunk in self.chunks) / len(self.chunks)
+
+    def _compact_rows(self, text_path):
+        """
+        Drops the tombstoned chunk rows, the articles left without chunks and
+        their text (rewriting ``text_path``, the new version's text.bin). Live
+        rows keep their order under new numbers. Returns the array of new row
+        numbers by old row (-1 for dropped rows), or None if none are dead.
+        """
+        chunks = np.array([tuple(c) for c in self.chunks], dtype=CHUNK_DTYPE)
+        live = chunks["article"] != DELETED
+        if live.all():
+            return None
+        new_rows = np.full(len(chunks), -1, dtype=np.int64)
+        new_rows[live] = np.arange(int(live.sum()))
+        chunks = chunks[live]
+
+        # Each kept article's text is the byte range its chunks cover, copied back to back
+        used, article_of = np.unique(chunks["article"], return_inverse=True)
+        starts = np.full(len(used), np.iinfo(np.int64).max, dtype=np.int64)
+        ends = np.zeros(len(used), dtype=np.int64)
+        np.minimum.at(starts, article_of, chunks["start"])
+        np.maximum.at(ends, article_of, chunks["end"])
+        bases = np.zeros(len(used) + 1, dtype=np.int64)
+        np.cumsum(ends - starts, out=bases[1:])
+        text = _map_text(text_path)
+        _write_atomic(text_path, lambda f: f.writelines(bytes(text[start:end]) for start, end in zip(starts, ends)))
+        del text
+        shift = bases[:-1][article_of] - starts[article_of]
+        chunks["start"] += shift
+        chunks["end"] += shift
+        chunks["article"] = np.arange(len(used), dtype=np.int32)[article_of]
+
+        dropped_articles = len(self.articles) - len(used)
+        self.articles = [self.articles[article_id] for article_id in used.tolist()]
+        self.chunks = chunks.tolist()
+        self.text_size = int(bases[-1])
+        self.shards = {key: renumber_ids(index, new_rows) for key, index in self.shards.items()}
+        self._dirty.update(self.shards)
+        self.bm25 = self.bm25.renumbered(new_rows)
+        logging.info(f"Compacted the store: dropped {len(new_rows) - len(chunks)} removed chunks "
+                     f"and {dropped_articles} articles left without chunks")
+        return new_rows
+
+    def save(self, manifest=None, near_duplicates=None, compact=False):
+        """
+        Writes the store as a new version (with ``manifest`` as its
+        manifest.json and the signatures of ``near_duplicates``, a
+        NearDuplicateIndex), publishes it and prunes old versions. Returns
+        the new version's name.
+
+        Tombstoned rows are compacted away (see _compact_rows) once they are
+        more than config.VECTOR_STORE_COMPACT_DEAD_FRACTION of the chunk
+        table, or always with ``compact=True``; the chunk rows recorded in
+        ``manifest`` are renumbered to match.
+        """
+        versions = list_versions(self.root)
+        version = f"v{int(versions[-1][1:]) + 1 if versions else 1:06d}"
+        staging = os.path.join(self.root, VERSIONS_DIR, f".{version}.tmp")
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+        # The new version gets its own copy of text.bin to append to: a published version's
+        # files are never modified, so they must not be hard links that are appended to
+        text_path = os.path.join(staging, TEXT_FILE)
+        if not self.reset and os.path.exists(os.path.join(self.path, TEXT_FILE)):
+            shutil.copyfile(os.path.join(self.path, TEXT_FILE), text_path)
+        with open(text_path, "ab") as f:
+            f.writelines(self._pending_text)
+        self.reset = False
+        self.text_size += self._pending_size
+        self._pending_text = []
+        self._pending_size = 0
+        self.bm25 = self.bm25.updated(add=self._bm25_add, remove=self._bm25_remove, n_rows=len(self.chunks))
+        self._bm25_add, self._bm25_remove = [], []
+
+        threshold = config.VECTOR_STORE_COMPACT_DEAD_FRACTION
+        new_rows = None
+        if compact or (threshold > 0 and self.dead_fraction() > threshold):
+            new_rows = self._compact_rows(text_path)
+        if manifest is not None and new_rows is not None:
+            articles = {key: dict(entry, chunks=[[chunk_id, int(new_rows[row])] for chunk_id, row in entry["chunks"]])
+                        for key, entry in manifest.get("articles", {}).items()}
+            manifest = dict(manifest, articles=articles)
+
+        chunks = np.array([tuple(c) for c in self.chunks], dtype=CHUNK_DTYPE)
+        _write_atomic(os.path.join(staging, CHUNKS_FILE), lambda f: np.save(f, chunks))
+        records = [json.dumps(a, ensure_ascii=False).encode("utf-8") + b"\n" for a in self.articles]
+        offsets = np.zeros(len(records) + 1, dtype=np.int64)
+        np.cumsum([len(record) for record in records], out=offsets[1:])
+        _write_atomic(os.path.join(staging, ARTICLES_FILE), lambda f: f.writelines(records))
+        _write_atomic(os.path.join(staging, ARTICLE_OFFSETS_FILE), lambda f: np.save(f, offsets))
+        columns, values = article_attributes(self.articles)
+        _write_atomic(os.path.join(staging, ATTRIBUTES_FILE), lambda f: np.save(f, columns))
+        _write_atomic(os.path.join(staging, ATTRIBUTE_VALUES_FILE),
+                      lambda f: f.write(json.dumps(values, ensure_ascii=False).encode("utf-8")))
+        self.bm25.save(staging)
+        self._save_shards(staging)
+        if near_duplicates is not None:
+            near_duplicates.save(staging)
+        if manifest is not None:
+            _write_atomic(os.path.join(staging, MANIFEST_FILE),
+                          lambda f: f.write(json.dumps(manifest, ensure_ascii=False).encode("utf-8")))
+            info = {key: value for key, value in manifest.items() if not isinstance(value, dict)}
+            _write_atomic(os.path.join(staging, STORE_INFO_FILE),
+                          lambda f: f.write(json.dumps(info, ensure_ascii=False).encode("utf-8")))
+
+        self.path = os.path.join(self.root, VERSIONS_DIR, version)
+        os.rename(staging, self.path)
+        publish_version(self.root, version)
+        prune_versions(self.root)
+        logging.info(f"Published vector store version {version}")
+        return version
+
+    def _save_shards(self, staging):
+        """Writes the changed shards, links the unchanged ones from the previous version and lists them in shards.json."""
+        if config.SHARD_COMPACT_AFTER_DAYS > 0 and self.period in ("day", "week"):
+            today = (datetime.date.today() - _EPOCH).days
+            self.compact(today - config.SHARD_COMPACT_AFTER_DAYS)
+        dates = self._shard_dates()
+        entries = []
+        for key in sorted(self.shards):
+            if key not in dates:
+                # Every chunk of the shard was removed (e.g. past the retention window)
+                del self.shards[key]
+                continue
+            path = os.path.join(staging, shard_file(key))
+            previous = os.path.join(self.path, shard_file(key))
+            if key not in self._dirty and os.path.exists(previous):
+                _link_or_copy(previous, path)
+            else:
+                faiss.write_index(self.shards[key], path)
+            first_day, last_day = dates[key]
+            entries.append({"key": key, "first_day": first_day, "last_day": last_day,
+                            "vectors": int(self.shards[key].ntotal)})
+        if self.template is not None:
+            faiss.write_index(self.template, os.path.join(staging, TEMPLATE_FILE))
+        _write_atomic(os.path.join(staging, SHARDS_FILE),
+                      lambda f: f.write(json.dumps({"period": self.period, "shards": entries}).encode("utf-8")))
+        self._dirty.clear()
@@ -0,0 +1,119 @@
+"""
+Serving view of a versioned vector store that follows new versions.
+
+The embedder publishes each save as a new version (see vector_store.py). A
+VersionedStore serves the version it opened and checks CURRENT in a
+background thread; a new version is opened and warmed up off the request
+path, then swapped in. Searches lease the store they started on, so a swap
+never changes the store under a running search (row ids are per version);
+the old version is closed once its last lease is returned.
+"""
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from backend import config
+from backend.retriever.vector_store import EmbeddingModelMismatch, VectorStore, index_version
+
+
+class VersionedStore:
+    """The served VectorStore of a store directory, replaced as newer versions are published."""
+
+    def __init__(self, vector_store_path, embeddings=None, poll_seconds=None, drain_seconds=None):
+        self.path = vector_store_path
+        self.embeddings = embeddings
+        self.poll_seconds = config.VECTOR_STORE_POLL_SECONDS if poll_seconds is None else poll_seconds
+        self.drain_seconds = config.VECTOR_STORE_DRAIN_SECONDS if drain_seconds is None else drain_seconds
+        self._lock = threading.Condition()
+        self._leases = {}
+        self._store = VectorStore(vector_store_path, embeddings)
+        self._stop = threading.Event()
+        self._thread = None
+        self.swaps = 0
+        # Last published version refused for its embedding model (not retried until a newer one appears)
+        self.rejected = None
+
+    @property
+    def current(self):
+        """The store being served (for one-off reads; searches should use acquire())."""
+        return self._store
+
+    @property
+    def version(self):
+        return self._store.version
+
+    @contextmanager
+    def acquire(self):
+        """Leases the current store for the duration of one search."""
+        with self._lock:
+            store = self._store
+            self._leases[id(store)] = self._leases.get(id(store), 0) + 1
+        try:
+            yield store
+        finally:
+            with self._lock:
+                self._leases[id(store)] -= 1
+                if not self._leases[id(store)]:
+                    del self._leases[id(store)]
+                    self._lock.notify_all()
+
+    def refresh(self):
+        """
+        Swaps in the published version if it is newer than the one served.
+        Returns True if it did. A version embedded with another model than
+        ``embeddings`` raises EmbeddingModelMismatch and is never served.
+        """
+        version = index_version(self.path)
+        if version in (self._store.version, self.rejected):
+            return False
+        start = time.perf_counter()
+        # Opened and warmed up before the swap, so no request waits on loading it
+        try:
+            store = VectorStore(self.path, self.embeddings)
+        except EmbeddingModelMismatch:
+            self.rejected = version
+            raise
+        store.warm_up()
+        with self._lock:
+            old, self._store = self._store, store
+            self.swaps += 1
+        logging.info(f"Vector store swapped from {old.version} to {store.version} "
+                     f"({store.ntotal} vectors, loaded in {time.perf_counter() - start:.2f}s)")
+        self._release(old)
+        return True
+
+    def _release(self, store):
+        """Closes a swapped-out store once its in-flight searches have finished."""
+        deadline = time.monotonic() + self.drain_seconds
+        with self._lock:
+            while self._leases.get(id(store)):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # Left to the garbage collector once the stragglers drop it
+                    logging.warning(f"Vector store {store.version} still in use after {self.drain_seconds}s; "
+                                    f"not closing it")
+                    return
+                self._lock.wait(remaining)
+        store.close()
+        logging.info(f"Released vector store version {store.version}")
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                # E.g. a version pruned between reading CURRENT and opening it; retried next poll
+                logging.error(f"Failed to load the new vector store version: {e}")
+
+    def start(self):
+        """Starts checking for new versions every ``poll_seconds`` (no-op if 0 or already running)."""
+        if self.poll_seconds > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="vector-store-watch", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
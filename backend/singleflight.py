@@ -0,0 +1,124 @@
+"""
+In-flight de-duplication of identical requests (per process).
+
+When many users ask the same question at once, the first request runs the
+work and every identical request that arrives while it is still running
+attaches to it instead of starting its own retrieval and Gemini call:
+
+- SingleFlight: awaitables; every caller gets the one result (or exception).
+- StreamFlights: async event streams; every subscriber gets all events of
+  the one producer, earlier ones replayed to late joiners.
+
+Nothing is kept once the work finishes; later repeats are served by the
+answer cache instead.
+"""
+import asyncio
+import logging
+
+
+def _count_coalesced(name):
+    from backend.metrics import COALESCED_REQUESTS
+    COALESCED_REQUESTS.inc(path=name)
+
+
+class SingleFlight:
+    """Runs one ``fn()`` per key at a time; concurrent callers with the same key share its result."""
+
+    def __init__(self, name):
+        self.name = name
+        self._inflight = {}
+
+    def __len__(self):
+        return len(self._inflight)
+
+    async def do(self, key, fn):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            _count_coalesced(self.name)
+        # A caller that goes away (client disconnect) must not cancel the work for the others
+        return await asyncio.shield(task)
+
+
+class _Flight:
+    def __init__(self):
+        self.events = []
+        self.done = False
+        self.subscribers = 0
+        self.task = None
+        self._changed = asyncio.Event()
+
+    def publish(self, event):
+        self.events.append(event)
+        self._wake()
+
+    def finish(self):
+        self.done = True
+        self._wake()
+
+    def _wake(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+
+class StreamFlights:
+    """
+    One producer stream per key, fanned out to every subscriber. The
+    producer is cancelled once its last subscriber disconnects, as a single
+    request's stream would be.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._flights = {}
+
+    def __len__(self):
+        return len(self._flights)
+
+    async def _produce(self, key, flight, events):
+        try:
+            async for event in events:
+                flight.publish(event)
+        except asyncio.CancelledError:
+            logging.debug(f"{self.name}: all subscribers left, stopped stream {key!r}")
+        except Exception as e:
+            # The producer is expected to turn its own errors into events
+            logging.error(f"{self.name}: stream {key!r} failed: {e}")
+        finally:
+            flight.finish()
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    async def subscribe(self, key, make_events):
+        """
+        Yields the events of the stream for ``key``, starting ``make_events()``
+        (an async iterator) only if no identical stream is in flight.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.ensure_future(self._produce(key, flight, make_events()))
+        else:
+            _count_coalesced(self.name)
+        flight.subscribers += 1
+        try:
+            sent = 0
+            while True:
+                changed = flight._changed
+                while sent < len(flight.events):
+                    yield flight.events[sent]
+                    sent += 1
+                if flight.done:
+                    return
+                await changed.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Forgotten right away, so a request arriving now starts afresh instead of joining a cancelled stream
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
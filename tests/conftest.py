@@ -0,0 +1,103 @@
+"""
+Shared fixtures. Everything runs offline: the hashing embedder stands in for
+Gemini embeddings, and the settings read at import time point at a scratch
+directory so no test touches the stores under backend/.
+"""
+import os
+import json
+import random
+import tempfile
+
+_scratch = tempfile.mkdtemp(prefix="finrag-tests-")
+os.environ.update({
+    "FINRAG_EMBEDDING_BACKEND": "hashing",
+    "FINRAG_VECTOR_STORE_DIR": os.path.join(_scratch, "vector_store"),
+    "FINRAG_STOCK_STORE_DIR": os.path.join(_scratch, "prices"),
+    # No background watcher threads: tests swap store versions explicitly
+    "FINRAG_VECTOR_STORE_POLL_SECONDS": "0",
+    "FINRAG_QUERY_CACHE_PATH": "",
+})
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import pytest  # noqa: E402
+
+from backend.ingestion.indicators import calculate_indicators  # noqa: E402
+from backend.ingestion.stock_fetcher import PriceStore  # noqa: E402
+from backend.retriever import embedder as embedder_module  # noqa: E402
+from backend.retriever.embeddings import get_embeddings  # noqa: E402
+
+_WORDS = ("revenue margin growth quarter profit guidance demand order book capex debt rating dividend "
+          "buyback merger stake export monsoon inflation repo rate rupee crude refinery retail telecom "
+          "software deal pipeline attrition hiring loan deposit asset quality provision subsidiary "
+          "factory launch tariff subsidy policy outlook investor brokerage target upgrade downgrade").split()
+
+
+def make_article(url, title, words=120, seed=None, text=None):
+    """
+    A cleaned article as news_cleaner.py writes it. The body is ``text``, or
+    ``words`` random words seeded by the URL (or ``seed``), so articles
+    never look alike.
+    """
+    if text is None:
+        rng = random.Random(seed if seed is not None else url)
+        text = " ".join(rng.choice(_WORDS) for _ in range(words))
+    return {"url": url, "title": title, "cleaned_text": text}
+
+
+@pytest.fixture
+def embeddings():
+    return get_embeddings("hashing")
+
+
+@pytest.fixture
+def news_dir(tmp_path):
+    path = tmp_path / "cleaned_news"
+    path.mkdir()
+    return path
+
+
+def write_news(news_dir, name, articles):
+    with open(os.path.join(news_dir, name), "w", encoding="utf-8") as f:
+        json.dump(articles, f)
+
+
+@pytest.fixture
+def embedder(tmp_path, news_dir, embeddings, monkeypatch):
+    """
+    The embedder module, reading ``news_dir`` and writing a fresh store in
+    ``embedder.VECTOR_DIR`` with ``embeddings`` (whose stats count the texts embedded).
+    """
+    store_dir = str(tmp_path / "vector_store")
+    os.makedirs(store_dir)
+    monkeypatch.setattr(embedder_module, "CLEANED_DIR", str(news_dir))
+    monkeypatch.setattr(embedder_module, "VECTOR_DIR", store_dir)
+    monkeypatch.setattr(embedder_module, "get_embeddings", lambda backend=None: embeddings)
+    return embedder_module
+
+
+# Ticker -> (first close, daily drift): a spread of prices and 5-day performances
+PRICES = {
+    "RELIANCE.NS": (2900.0, 0.004),
+    "TCS.NS": (3900.0, -0.003),
+    "INFY.NS": (600.0, 0.006),
+    "ITC.NS": (450.0, -0.005),
+    "HDFCBANK.NS": (700.0, 0.001),
+}
+
+
+def price_frame(ticker, first, drift, days=60):
+    """``days`` daily rows of one ticker compounding at ``drift``, with their indicators."""
+    close = first * (1 + drift) ** np.arange(days)
+    frame = pd.DataFrame({"Date": pd.bdate_range("2026-06-01", periods=days), "Ticker": ticker,
+                          "Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+                          "Volume": np.full(days, 1e6)})
+    return calculate_indicators(frame)
+
+
+@pytest.fixture
+def price_store(tmp_path):
+    """A price store holding the PRICES tickers."""
+    store = PriceStore(str(tmp_path / "prices"))
+    store.append(pd.concat([price_frame(ticker, *p) for ticker, p in PRICES.items()], ignore_index=True))
+    return store
@@ -0,0 +1,76 @@
+import faiss
+import numpy as np
+import pytest
+
+from backend import config
+from backend.retriever import ann_index
+from backend.retriever.ann_index import INDEX_TYPES, build_index, effective_index_type, factory_string, training_sample
+from backend.retriever.vector_store import VectorStore, read_index_mmap
+
+from tests.conftest import make_article, write_news
+
+
+def _vectors(n, dim=64, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_every_index_type_builds_loads_and_finds_its_own_vectors(index_type, tmp_path):
+    vectors = _vectors(2000)
+    rows = np.arange(100, 100 + len(vectors), dtype=np.int64)  # ids are chunk rows, not positions
+    index = build_index(vectors.shape[1], index_type, vectors)
+    index.add_with_ids(vectors, rows)
+    path = str(tmp_path / "index.faiss")
+    faiss.write_index(index, path)
+
+    loaded = read_index_mmap(path)
+    assert loaded.ntotal == len(vectors)
+    _, found = loaded.search(vectors[:50], 1, params=ann_index.search_parameters(loaded, nprobe=64, ef_search=128))
+    # Quantized codes may swap a few near neighbours, but the rows must be the store's
+    assert (found[:, 0] == rows[:50]).mean() >= 0.9
+
+
+def test_small_training_sets_fall_back_from_ivf_pq():
+    assert effective_index_type("ivf_pq", 100) == "ivf"
+    assert effective_index_type("ivf_pq", 30) == "flat"
+    assert effective_index_type("ivf_pq", 20000) == "ivf_pq"
+    # Codebooks never need more points than the set has: 356 vectors -> IVF9 rather than PQ96x8
+    assert factory_string("ivf_pq", 768, 356) == "IVF9,Flat"
+    assert factory_string("ivf_pq", 768, 5000).endswith("x7")
+
+
+def test_training_uses_a_bounded_sample(monkeypatch):
+    monkeypatch.setattr(config, "INDEX_TRAIN_SIZE", 100)
+    vectors = _vectors(1000)
+    sample = training_sample(vectors)
+    assert len(sample) == 100
+    np.testing.assert_array_equal(sample, training_sample(vectors))  # fixed seed
+    assert len(training_sample(vectors[:50])) == 50
+
+
+@pytest.mark.parametrize("index_type", ["ivf", "hnsw", "sq8"])
+def test_removed_rows_never_come_back(index_type, embedder, embeddings, news_dir):
+    articles = [make_article(f"https://example.com/{i}", f"Article {i}") for i in range(60)]
+    write_news(news_dir, "news_2026-10-01.json", articles)
+    embedder.embed(index_type=index_type)
+    write_news(news_dir, "news_2026-10-01.json", articles[10:])
+    embedder.embed(incremental=True, index_type=index_type)
+
+    store = VectorStore(embedder.VECTOR_DIR, embeddings)
+    for article in articles[:15]:
+        rows, _ = store.search_rows(embeddings.embed_query(article["cleaned_text"]), k=3, nprobe=64)
+        urls = {store.get_document(row).metadata["url"] for row in rows}
+        assert all(url not in {a["url"] for a in articles[:10]} for url in urls)
+        if article in articles[10:]:
+            assert article["url"] in urls
+
+
+def test_changed_index_type_is_rebuilt_without_reembedding(embedder, embeddings, news_dir):
+    write_news(news_dir, "news_2026-10-01.json", [make_article(f"https://example.com/{i}", f"Article {i}") for i in range(60)])
+    embedder.embed(incremental=True)
+    before = embeddings.stats.texts
+    embedder.embed(incremental=True, index_type="hnsw")
+    assert embeddings.stats.texts == before
+    assert all(isinstance(ann_index.base_index(shard.index), faiss.IndexHNSW)
+               for shard in VectorStore(embedder.VECTOR_DIR, embeddings).shards)
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from backend.generator import answer_cache as answer_cache_module
+from backend.generator.answer_cache import SemanticAnswerCache, chunk_set_key
+
+CHUNKS = [{"source": "https://example.com/a", "content": "Reliance raised tariffs"},
+          {"source": "https://example.com/b", "content": "Jio added subscribers"}]
+
+
+def _vector(*values):
+    return np.array(values, dtype=np.float32)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_chunk_set_key_ignores_order():
+    assert chunk_set_key(CHUNKS) == chunk_set_key(CHUNKS[::-1])
+    assert chunk_set_key(CHUNKS) != chunk_set_key(CHUNKS[:1])
+
+
+def test_paraphrase_above_threshold_hits():
+    cache = SemanticAnswerCache(threshold=0.95, ttl=60, max_size=10)
+    key = chunk_set_key(CHUNKS)
+    cache.store(_vector(1, 0, 0), key, "v1", "answer")
+    assert cache.lookup(_vector(10, 1, 0), key, "v1") == "answer"  # cosine ~0.995
+    assert cache.lookup(_vector(1, 1, 0), key, "v1") is None  # cosine ~0.71
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_other_context_misses():
+    cache = SemanticAnswerCache(threshold=0.95, ttl=60, max_size=10)
+    cache.store(_vector(1, 0, 0), chunk_set_key(CHUNKS), "v1", "answer")
+    assert cache.lookup(_vector(1, 0, 0), chunk_set_key(CHUNKS[:1]), "v1") is None
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = SemanticAnswerCache(threshold=0.95, ttl=60, max_size=10)
+    key = chunk_set_key(CHUNKS)
+    cache.store(_vector(1, 0), key, "v1", "answer")
+    clock[0] += 59
+    assert cache.lookup(_vector(1, 0), key, "v1") == "answer"
+    clock[0] += 2
+    assert cache.lookup(_vector(1, 0), key, "v1") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_new_store_version_drops_everything():
+    cache = SemanticAnswerCache(threshold=0.95, ttl=60, max_size=10)
+    key = chunk_set_key(CHUNKS)
+    cache.store(_vector(1, 0), key, "v1", "answer")
+    assert cache.lookup(_vector(1, 0), key, "v2") is None
+    assert cache.stats()["invalidations"] == 1
+    assert cache.lookup(_vector(1, 0), key, "v1") is None
+
+
+def test_size_is_bounded():
+    cache = SemanticAnswerCache(threshold=0.99, ttl=60, max_size=2)
+    key = chunk_set_key(CHUNKS)
+    for i, vector in enumerate(([1, 0, 0], [0, 1, 0], [0, 0, 1])):
+        cache.store(_vector(*vector), key, "v1", f"answer {i}")
+    assert cache.stats()["size"] == 2
+    assert cache.lookup(_vector(1, 0, 0), key, "v1") is None
+    assert cache.lookup(_vector(0, 0, 1), key, "v1") == "answer 2"
+
+
+def test_disabled_cache_stores_nothing():
+    cache = SemanticAnswerCache(threshold=0.95, ttl=0, max_size=10)
+    cache.store(_vector(1, 0), "key", "v1", "answer")
+    assert cache.lookup(_vector(1, 0), "key", "v1") is None
+
+
+def test_index_version_changes_when_the_store_is_rewritten(embedder, news_dir):
+    from backend.retriever.vector_store import index_version
+    from tests.conftest import make_article, write_news
+
+    assert index_version(embedder.VECTOR_DIR) is None
+    write_news(news_dir, "news_2026-10-01.json", [make_article("https://example.com/a", "Reliance results")])
+    embedder.embed(incremental=True)
+    first = index_version(embedder.VECTOR_DIR)
+    write_news(news_dir, "news_2026-10-02.json", [make_article("https://example.com/b", "TCS results")])
+    embedder.embed(incremental=True)
+    assert first is not None and index_version(embedder.VECTOR_DIR) != first
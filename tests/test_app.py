@@ -0,0 +1,251 @@
+import asyncio
+import importlib
+import json
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import config
+from backend.generator.gemini_client import GeminiAPIError
+
+from tests.conftest import make_article, write_news
+
+
+class FakeGemini:
+    """Answers (or streams) ``fragments``, or raises ``error`` once called."""
+
+    def __init__(self, fragments=("Reliance ", "looks strong."), error=None):
+        self.fragments = fragments
+        self.error = error
+        self.calls = 0
+        self.prompts = []
+
+    async def generate_content(self, payload, model=None):
+        self.calls += 1
+        self.prompts.append(payload["contents"][0]["parts"][0]["text"])
+        if self.error is not None:
+            raise self.error
+        return {"candidates": [{"content": {"parts": [{"text": "".join(self.fragments)}]}}]}
+
+    async def stream_generate_content(self, payload, model=None):
+        self.calls += 1
+        self.prompts.append(payload["contents"][0]["parts"][0]["text"])
+        if self.error is not None:
+            raise self.error
+        for fragment in self.fragments:
+            yield fragment
+
+    async def aclose(self):
+        pass
+
+
+def parse_sse(body):
+    """[(event, data)] of a text/event-stream body."""
+    events = []
+    for frame in body.split("\n\n"):
+        if not frame:
+            continue
+        lines = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def app_module(embedder, news_dir, monkeypatch):
+    """backend.app serving a small store in the configured vector store directory."""
+    monkeypatch.setattr(embedder, "VECTOR_DIR", config.VECTOR_STORE_DIR)
+    write_news(news_dir, "news_2026-10-01.json", [
+        make_article("https://example.com/reliance", "Reliance Jio raises tariffs"),
+        make_article("https://example.com/tcs", "TCS wins a large deal"),
+    ])
+    embedder.embed()
+    app_module = importlib.import_module("backend.app")
+    # Each TestClient runs its own event loop: start every test with a fresh warm-up
+    monkeypatch.setattr(app_module, "_pipeline_task", None)
+    return app_module
+
+
+def wait_until_ready(client, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = client.get("/readyz")
+        if response.status_code == 200:
+            return response
+        time.sleep(0.05)
+    raise AssertionError(f"not ready after {timeout}s: {response.json()}")
+
+
+def test_importing_the_app_does_not_load_the_retrieval_stack():
+    heavy = ("numpy", "httpx", "faiss", "langchain_community", "google.generativeai", "backend.rag_pipeline",
+             "backend.metrics")
+    code = f"import sys, backend.app; print([m for m in {heavy!r} if m in sys.modules])"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "[]"
+
+
+def test_readyz_reports_warming_up_until_the_pipeline_is_loaded(app_module, monkeypatch):
+    release = threading.Event()
+    load_pipeline = app_module._load_pipeline
+
+    def slow_load():
+        release.wait(10)
+        return load_pipeline()
+
+    monkeypatch.setattr(app_module, "_load_pipeline", slow_load)
+    with TestClient(app_module.app) as client:
+        assert client.get("/healthz").json() == {"status": "ok"}
+        response = client.get("/readyz")
+        assert response.status_code == 503
+        assert response.json() == {"status": "warming_up"}
+
+        release.set()
+        assert wait_until_ready(client).json() == {"status": "ready", "index_version": "v000001"}
+        assert client.get("/healthz").status_code == 200
+
+
+def test_readyz_reports_a_failed_load(app_module, monkeypatch):
+    def broken_load():
+        raise FileNotFoundError("no vector store")
+
+    monkeypatch.setattr(app_module, "_load_pipeline", broken_load)
+    with TestClient(app_module.app) as client:
+        assert client.get("/healthz").status_code == 200
+        deadline = time.monotonic() + 10
+        while (response := client.get("/readyz")).json()["status"] == "warming_up" and time.monotonic() < deadline:
+            time.sleep(0.05)
+    assert response.status_code == 503
+    assert response.json() == {"status": "error", "detail": "no vector store"}
+
+
+def test_stream_frames_sources_tokens_and_done(app_module, monkeypatch):
+    gemini = FakeGemini()
+    monkeypatch.setattr(app_module, "_gemini", gemini)
+    with TestClient(app_module.app) as client:
+        response = client.get("/api/query/stream", params={"query": "Reliance tariff outlook"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+
+    events = parse_sse(response.text)
+    assert [name for name, _ in events] == ["sources", "token", "token", "done"]
+    assert {source["source"] for source in events[0][1]} == {"https://example.com/reliance", "https://example.com/tcs"}
+    assert "".join(data["text"] for name, data in events if name == "token") == "Reliance looks strong."
+    assert events[-1][1] == {"cached": False}
+
+
+def test_repeated_stream_is_served_from_the_answer_cache(app_module, monkeypatch):
+    gemini = FakeGemini()
+    monkeypatch.setattr(app_module, "_gemini", gemini)
+    with TestClient(app_module.app) as client:
+        client.post("/api/query/stream", json={"query": "TCS deal pipeline"})
+        events = parse_sse(client.post("/api/query/stream", json={"query": "TCS deal pipeline"}).text)
+    assert gemini.calls == 1
+    assert events[1:] == [("token", {"text": "Reliance looks strong."}), ("done", {"cached": True})]
+
+
+def test_stream_error_becomes_an_error_event(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "_gemini", FakeGemini(error=GeminiAPIError(503, "overloaded")))
+    with TestClient(app_module.app) as client:
+        events = parse_sse(client.get("/api/query/stream", params={"query": "ITC demerger"}).text)
+    assert events[0][0] == "sources"
+    assert events[-1] == ("error", {"detail": "Gemini API error: overloaded"})
+
+
+def test_query_answers_over_the_filtered_chunks(app_module, monkeypatch):
+    gemini = FakeGemini()
+    monkeypatch.setattr(app_module, "_gemini", gemini)
+    with TestClient(app_module.app) as client:
+        response = client.post("/api/query", json={"query": "Any big deals?", "tickers": ["TCS"]})
+        again = client.post("/api/query", json={"query": "Any big deals?", "tickers": ["TCS"]})
+    assert response.json() == again.json() == {"answer": "Reliance looks strong."}
+    assert gemini.calls == 1  # the repeat is answered from the answer cache
+    assert "https://example.com/tcs" in gemini.prompts[0]
+    assert "https://example.com/reliance" not in gemini.prompts[0]
+
+
+def test_metrics_endpoint_exposes_requests_and_stages(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "_gemini", FakeGemini())
+    with TestClient(app_module.app) as client:
+        client.post("/api/query", json={"query": "Reliance tariff outlook"})
+        response = client.get("/metrics")
+    assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    lines = response.text.splitlines()
+    assert "# TYPE finrag_stage_duration_seconds histogram" in lines
+    assert any(line.startswith('finrag_http_requests_total{method="POST",route="/api/query",status="200"} ')
+               for line in lines)
+    for stage in ("retrieve", "llm_generate"):
+        assert any(line.startswith(f'finrag_stage_duration_seconds_count{{stage="{stage}"}} ') for line in lines)
+
+
+def test_screener_endpoint_takes_conditions_or_a_question(app_module, price_store, monkeypatch):
+    from backend.retriever.screener import Screener
+    monkeypatch.setattr(app_module, "_screener", Screener(price_store))
+    with TestClient(app_module.app) as client:
+        by_conditions = client.get("/api/screener", params={"where": ["Close<1000"], "sort": "Perf", "limit": 2}).json()
+        by_question = client.get("/api/screener", params={"q": "2 stocks performing well below 1000"}).json()
+        bad = client.get("/api/screener", params={"where": "Close is low"})
+        not_a_screen = client.get("/api/screener", params={"q": "What did TCS say about hiring?"})
+    assert by_conditions["tickers_screened"] == 5
+    assert [row["ticker"] for row in by_conditions["rows"]] == ["INFY.NS", "HDFCBANK.NS"]
+    assert by_question["rows"] == by_conditions["rows"]
+    assert bad.status_code == not_a_screen.status_code == 400
+
+
+def test_screening_questions_skip_retrieval_and_gemini(app_module, price_store, monkeypatch):
+    from backend.retriever.screener import Screener
+    gemini = FakeGemini()
+    monkeypatch.setattr(app_module, "_gemini", gemini)
+    monkeypatch.setattr(app_module, "_screener", Screener(price_store))
+    with TestClient(app_module.app) as client:
+        events = parse_sse(client.get("/api/query/stream", params={"query": "3 worst performing stocks"}).text)
+        answer = client.post("/api/query", json={"query": "3 worst performing stocks"}).json()["answer"]
+    assert [name for name, _ in events] == ["sources", "token", "done"]
+    assert events[1][1]["text"].startswith("3 tracked stocks, worst 5-day performance first")
+    assert events[-1][1] == {"cached": False, "screener": True}
+    assert answer == events[1][1]["text"]
+    assert gemini.calls == 0
+
+
+def test_batch_query_answers_repeats_once_and_reports_failures_per_query(app_module, monkeypatch):
+    gemini = FakeGemini()
+    monkeypatch.setattr(app_module, "_gemini", gemini)
+    queries = ["TCS deal pipeline", "tcs deal  pipeline", "Reliance tariff outlook"]
+    with TestClient(app_module.app) as client:
+        retrieved = client.post("/api/query/batch", json={"queries": queries}).json()["results"]
+        answered = client.post("/api/query/batch", json={"queries": queries, "generate": True}).json()["results"]
+        too_many = client.post("/api/query/batch", json={"queries": ["q"] * (config.BATCH_MAX_QUERIES + 1)})
+    assert [result["query"] for result in retrieved] == ["TCS deal pipeline", "TCS deal pipeline", "Reliance tariff outlook"]
+    assert all(result["chunks"] and result["sources"] for result in retrieved)
+    assert [result["answer"] for result in answered] == ["Reliance looks strong."] * 3
+    assert gemini.calls == 2
+    assert too_many.status_code == 400
+
+    monkeypatch.setattr(app_module, "_gemini", FakeGemini(error=GeminiAPIError(503, "overloaded")))
+    with TestClient(app_module.app) as client:
+        failed = client.post("/api/query/batch", json={"queries": ["ITC demerger"], "generate": True}).json()["results"]
+    assert "overloaded" in failed[0]["error"]
+
+
+
+def test_identical_concurrent_queries_share_one_gemini_call(app_module, monkeypatch):
+    class SlowGemini(FakeGemini):
+        async def generate_content(self, payload, model=None):
+            await asyncio.sleep(0.3)
+            return await super().generate_content(payload, model)
+
+    gemini = SlowGemini()
+    monkeypatch.setattr(app_module, "_gemini", gemini)
+    requests = [{"query": "TCS deal pipeline"}, {"query": " tcs DEAL pipeline"}, {"query": "TCS deal pipeline"},
+                {"query": "TCS deal pipeline", "tickers": ["TCS"]}]
+    with TestClient(app_module.app) as client:
+        wait_until_ready(client)
+        with ThreadPoolExecutor(len(requests)) as pool:
+            responses = list(pool.map(lambda body: client.post("/api/query", json=body), requests))
+    assert all(response.json() == {"answer": "Reliance looks strong."} for response in responses)
+    # One flight for the three spellings of the question, another for the filtered request
+    assert gemini.calls == 2
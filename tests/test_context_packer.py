@@ -0,0 +1,80 @@
+from backend.generator.context_packer import (
+    CHARS_PER_TOKEN, build_context, drop_near_duplicates, estimate_tokens, format_context, merge_adjacent, pack,
+)
+
+ARTICLE = ("Reliance Jio raised its mobile tariffs by up to a fifth. Analysts expect the hike to lift average "
+           "revenue per user next quarter. Bharti Airtel and Vodafone Idea followed within a day. ")
+
+
+def _chunk(source, text, span=None, article=None, title="Title"):
+    metadata = {} if span is None else {"span": span, "article_id": article or source}
+    return {"source": source, "title": title, "content": text, "metadata": metadata}
+
+
+def _piece(start, end):
+    return ARTICLE.encode("utf-8")[start:end].decode("utf-8")
+
+
+def test_overlapping_chunks_of_an_article_merge_once():
+    chunks = [
+        _chunk("a", _piece(60, 150), (60, 150)),
+        _chunk("b", "Something else entirely about TCS."),
+        _chunk("a", _piece(0, 100), (0, 100)),  # overlaps the first by 40 bytes
+    ]
+    passages = merge_adjacent(chunks)
+    assert [p["source"] for p in passages] == ["a", "b"]
+    assert passages[0]["content"] == _piece(0, 150)
+    assert passages[0]["span"] == (0, 150)
+    assert passages[0]["rank"] == 0  # best rank of its chunks
+
+
+def test_touching_chunks_merge_and_distant_ones_do_not():
+    merged = merge_adjacent([_chunk("a", _piece(0, 50), (0, 50)), _chunk("a", _piece(51, 100), (51, 100))])
+    assert len(merged) == 1 and merged[0]["span"] == (0, 100)
+    apart = merge_adjacent([_chunk("a", _piece(0, 50), (0, 50)), _chunk("a", _piece(120, 150), (120, 150))])
+    assert len(apart) == 2
+
+
+def test_near_duplicate_passages_keep_the_better_ranked_one():
+    story = "Reliance Jio raised its mobile tariffs by up to a fifth and analysts expect higher revenue per user"
+    passages = merge_adjacent([
+        _chunk("https://et.example/jio", story),
+        _chunk("https://mc.example/jio", story + " next quarter."),  # syndicated copy
+        _chunk("https://mc.example/tcs", "TCS signed a multi year deal with a European bank on Monday."),
+    ])
+    assert [p["source"] for p in drop_near_duplicates(passages, threshold=0.8)] == [
+        "https://et.example/jio", "https://mc.example/tcs"]
+
+
+def test_pack_respects_the_token_budget():
+    passages = [{"source": f"s{i}", "title": "T", "content": "word " * 200, "span": None, "rank": i} for i in range(5)]
+    budget = 350
+    packed = pack(passages, budget)
+    assert 1 <= len(packed) < len(passages)
+    assert estimate_tokens(format_context(packed)) <= budget
+    # The passage that did not fit whole is truncated rather than dropped
+    assert len(packed[-1]["content"]) < len(passages[0]["content"])
+
+
+def test_pack_skips_a_passage_that_would_be_cut_too_short():
+    passages = [{"source": "a", "title": "T", "content": "x" * (90 * CHARS_PER_TOKEN), "span": None, "rank": 0},
+                {"source": "b", "title": "T", "content": "y" * 400, "span": None, "rank": 1}]
+    assert [p["source"] for p in pack(passages, budget=110)] == ["a"]
+
+
+def test_format_context_cites_each_source_once_in_document_order():
+    passages = [
+        {"source": "a", "title": "Jio", "content": "later part", "span": (100, 120), "rank": 0},
+        {"source": "b", "title": "TCS", "content": "deal", "span": None, "rank": 1},
+        {"source": "a", "title": "Jio", "content": "early part", "span": (0, 20), "rank": 2},
+    ]
+    assert format_context(passages) == "[1] Jio\nSource: a\nearly part\n…\nlater part\n\n[2] TCS\nSource: b\ndeal"
+
+
+def test_build_context_reports_what_it_did():
+    chunks = [_chunk("a", _piece(0, 100), (0, 100)), _chunk("a", _piece(60, 150), (60, 150)),
+              _chunk("b", "TCS signed a multi year deal with a European bank on Monday.")]
+    context, stats = build_context(chunks, budget=1000)
+    assert context.count("Source: ") == 2
+    assert stats["chunks"] == 3 and stats["merged_passages"] == 2 and stats["sources"] == 2
+    assert stats["context_tokens"] < stats["retrieved_tokens"] + 40
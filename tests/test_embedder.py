@@ -0,0 +1,67 @@
+from backend.retriever.vector_store import VectorStore
+
+from tests.conftest import make_article, write_news
+
+
+def _chunk_count(embedder, *articles):
+    splitter = embedder.get_splitter()
+    return sum(len(embedder.split_article({"content": a["cleaned_text"], "metadata": a}, splitter))
+               for a in articles)
+
+
+def _stored(embedder, embeddings):
+    """({url: stored chunk texts}, number of vectors) of the vector store on disk."""
+    store = VectorStore(embedder.VECTOR_DIR, embeddings)
+    texts = {}
+    for row in store.live_rows():
+        doc = store.get_document(row)
+        texts.setdefault(doc.metadata["url"], []).append(doc.page_content)
+    return texts, store.ntotal
+
+
+def test_incremental_add_edit_delete(embedder, embeddings, news_dir):
+    a = make_article("https://example.com/a", "Reliance results")
+    b = make_article("https://example.com/b", "TCS deal wins")
+    c = make_article("https://example.com/c", "ITC demerger")
+    write_news(news_dir, "news_2026-10-01.json", [a, b, c])
+    embedder.embed(incremental=True)
+    assert embeddings.stats.texts == _chunk_count(embedder, a, b, c)
+
+    edited_b = make_article("https://example.com/b", "TCS deal wins", seed="edited")
+    d = make_article("https://example.com/d", "Infosys guidance")
+    write_news(news_dir, "news_2026-10-01.json", [a, edited_b, d])
+    before = embeddings.stats.texts
+    embedder.embed(incremental=True)
+    # Only the edited and the new article are embedded; the old chunks of b and all of c go
+    assert embeddings.stats.texts - before == _chunk_count(embedder, edited_b, d)
+
+    stored, ntotal = _stored(embedder, embeddings)
+    assert set(stored) == {a["url"], edited_b["url"], d["url"]}
+    assert ntotal == _chunk_count(embedder, a, edited_b, d)
+    assert " ".join(stored[edited_b["url"]]).split()[:5] == edited_b["cleaned_text"].split()[:5]
+
+
+def test_unchanged_corpus_embeds_nothing(embedder, embeddings, news_dir):
+    write_news(news_dir, "news_2026-10-01.json", [make_article(f"https://example.com/{i}", f"Article {i}") for i in range(3)])
+    embedder.embed(incremental=True)
+    before = embeddings.stats.texts
+    embedder.embed(incremental=True)
+    assert embeddings.stats.texts == before
+
+
+def test_article_listed_on_several_days_is_embedded_once(embedder, embeddings, news_dir):
+    article = make_article("https://example.com/a", "Reliance results")
+    write_news(news_dir, "news_2026-10-01.json", [article])
+    write_news(news_dir, "news_2026-10-02.json", [article])
+    embedder.embed()
+    assert embeddings.stats.texts == _chunk_count(embedder, article)
+    assert _stored(embedder, embeddings)[1] == embeddings.stats.texts
+
+
+def test_changed_model_rebuilds(embedder, embeddings, news_dir, monkeypatch):
+    write_news(news_dir, "news_2026-10-01.json", [make_article("https://example.com/a", "Reliance results")])
+    embedder.embed(incremental=True)
+    first = embeddings.stats.texts
+    monkeypatch.setattr(embeddings.backend, "model", "another-model")
+    embedder.embed(incremental=True)
+    assert embeddings.stats.texts == 2 * first
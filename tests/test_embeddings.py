@@ -0,0 +1,92 @@
+import threading
+
+import numpy as np
+import pytest
+
+from backend.retriever.embeddings import BatchedEmbeddings, HashingEmbeddings, get_embeddings
+from backend.retriever.vector_store import EmbeddingModelMismatch, check_embedding_model, current_store_dir
+
+from tests.conftest import make_article, write_news
+
+
+class FlakyBackend:
+    """Embeds like HashingEmbeddings, failing the first ``failures`` calls with ``error``."""
+
+    model = "flaky"
+
+    def __init__(self, failures=0, error="429 Resource exhausted"):
+        self.inner = HashingEmbeddings(dim=16)
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self.lock:
+            self.calls += 1
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError(self.error)
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_hashing_embeddings_are_deterministic_and_normalised():
+    embeddings = HashingEmbeddings(dim=64)
+    first, second = embeddings.embed_documents(["Reliance Q2 results", "TCS deal"])
+    assert first == embeddings.embed_query("Reliance Q2 results")
+    assert first != second
+    assert np.linalg.norm(first) == pytest.approx(1.0)
+    assert embeddings.model == "hashing-64-3gram"
+
+
+def test_batches_keep_order():
+    texts = [f"article {i}" for i in range(25)]
+    embeddings = BatchedEmbeddings(HashingEmbeddings(dim=16), batch_size=4, max_concurrency=3)
+    assert embeddings.embed_documents(texts) == HashingEmbeddings(dim=16).embed_documents(texts)
+    assert embeddings.stats.batches == 7
+    assert embeddings.stats.texts == 25
+
+
+def test_rate_limit_is_retried():
+    backend = FlakyBackend(failures=2)
+    embeddings = BatchedEmbeddings(backend, batch_size=10, initial_backoff=0.001)
+    assert embeddings.embed_documents(["a", "b"]) == backend.inner.embed_documents(["a", "b"])
+    assert embeddings.stats.retries == 2
+    assert embeddings.stats.rate_limited == 2
+
+
+def test_permanent_error_is_not_retried():
+    backend = FlakyBackend(failures=1, error="400 invalid argument")
+    embeddings = BatchedEmbeddings(backend, initial_backoff=0.001)
+    with pytest.raises(RuntimeError):
+        embeddings.embed_documents(["a"])
+    assert backend.calls == 1
+    assert embeddings.stats.failures == 1
+
+
+def test_retries_are_bounded():
+    backend = FlakyBackend(failures=10, error="503 Service Unavailable")
+    embeddings = BatchedEmbeddings(backend, max_retries=2, initial_backoff=0.001)
+    with pytest.raises(RuntimeError):
+        embeddings.embed_query("a")
+    assert backend.calls == 3
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        get_embeddings("word2vec")
+
+
+def test_store_of_another_model_is_refused(embedder, embeddings, news_dir):
+    from backend.rag_pipeline import RAGPipeline
+
+    write_news(news_dir, "news_2026-10-01.json", [make_article("https://example.com/a", "Reliance results")])
+    embedder.embed()
+    check_embedding_model(current_store_dir(embedder.VECTOR_DIR), embeddings)
+    with pytest.raises(EmbeddingModelMismatch):
+        check_embedding_model(current_store_dir(embedder.VECTOR_DIR), HashingEmbeddings(dim=384))
+    with pytest.raises(EmbeddingModelMismatch):
+        RAGPipeline(embedder.VECTOR_DIR, embeddings=BatchedEmbeddings(HashingEmbeddings(dim=384)))
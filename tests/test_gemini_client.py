@@ -0,0 +1,133 @@
+import asyncio
+import datetime
+import json
+import types
+
+import httpx
+import pytest
+
+from backend.generator.gemini_client import GeminiAPIError, GeminiClient, extract_text
+
+
+def _utc_now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _client(handler=None, refresh_margin=300):
+    client = GeminiClient(service_account_file="unused.json", base_url="https://gemini.test/v1",
+                          refresh_margin=refresh_margin)
+    refreshes = []
+
+    def refresh():
+        refreshes.append(1)
+        # google-auth keeps expiry as a naive UTC datetime
+        client._credentials = types.SimpleNamespace(
+            token=f"token-{len(refreshes)}", expiry=_utc_now().replace(tzinfo=None) + datetime.timedelta(hours=1))
+
+    client._refresh_credentials = refresh
+    if handler is not None:
+        client._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client, refreshes
+
+
+def test_concurrent_callers_share_one_token_refresh():
+    async def scenario():
+        client, refreshes = _client()
+        tokens = await asyncio.gather(*(client.get_access_token() for _ in range(10)))
+        assert set(tokens) == {"token-1"}
+        assert len(refreshes) == 1
+        # Reused while fresh
+        assert await client.get_access_token() == "token-1"
+        assert len(refreshes) == 1
+
+    asyncio.run(scenario())
+
+
+def test_token_is_refreshed_within_the_margin():
+    async def scenario():
+        client, refreshes = _client(refresh_margin=300)
+        await client.get_access_token()
+        client._credentials.expiry = _utc_now().replace(tzinfo=None) + datetime.timedelta(seconds=200)
+        assert await client.get_access_token() == "token-2"
+        # An aware expiry (newer google-auth) compares the same way
+        client._credentials.expiry = _utc_now() + datetime.timedelta(hours=1)
+        assert await client.get_access_token() == "token-2"
+        client._credentials.expiry = _utc_now() + datetime.timedelta(seconds=200)
+        assert await client.get_access_token() == "token-3"
+        client._credentials.expiry = None  # no expiry: never refreshed
+        assert await client.get_access_token() == "token-3"
+        assert len(refreshes) == 3
+
+    asyncio.run(scenario())
+
+
+def test_generate_content_sends_the_token_and_returns_json():
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": "Hello"}]}}]})
+
+    async def scenario():
+        client, _ = _client(handler)
+        data = await client.generate_content({"contents": []}, model="gemini-test")
+        await client.aclose()
+        return data
+
+    assert extract_text(asyncio.run(scenario())) == "Hello"
+    assert str(seen[0].url) == "https://gemini.test/v1/models/gemini-test:generateContent"
+    assert seen[0].headers["Authorization"] == "Bearer token-1"
+    assert json.loads(seen[0].content) == {"contents": []}
+
+
+@pytest.mark.parametrize("call", ["generate_content", "list_models"])
+def test_error_status_raises_gemini_api_error(call):
+    async def scenario():
+        client, _ = _client(lambda request: httpx.Response(429, text="quota exceeded"))
+        method = getattr(client, call)
+        return await (method({"contents": []}) if call == "generate_content" else method())
+
+    with pytest.raises(GeminiAPIError) as error:
+        asyncio.run(scenario())
+    assert error.value.status_code == 429
+    assert "quota exceeded" in str(error.value)
+
+
+def test_transport_errors_propagate():
+    def handler(request):
+        raise httpx.ConnectTimeout("timed out", request=request)
+
+    async def scenario():
+        client, _ = _client(handler)
+        await client.generate_content({"contents": []})
+
+    with pytest.raises(httpx.ConnectTimeout):
+        asyncio.run(scenario())
+
+
+def test_extract_text_without_candidates():
+    assert extract_text({}) == "No answer returned."
+
+
+def test_stream_generate_content_yields_text_fragments():
+    def handler(request):
+        assert request.url.params["alt"] == "sse"
+        body = "".join(f"data: {json.dumps({'candidates': [{'content': {'parts': [{'text': t}]}}]})}\r\n\r\n"
+                       for t in ("Hel", "lo"))
+        return httpx.Response(200, text=": keep-alive\r\n\r\n" + body)
+
+    async def scenario():
+        client, _ = _client(handler)
+        return [text async for text in client.stream_generate_content({"contents": []})]
+
+    assert asyncio.run(scenario()) == ["Hel", "lo"]
+
+
+def test_stream_error_status_raises_before_any_fragment():
+    async def scenario():
+        client, _ = _client(lambda request: httpx.Response(500, text="internal"))
+        return [text async for text in client.stream_generate_content({"contents": []})]
+
+    with pytest.raises(GeminiAPIError) as error:
+        asyncio.run(scenario())
+    assert error.value.status_code == 500
@@ -0,0 +1,67 @@
+import asyncio
+import json
+import logging
+
+import pytest
+
+from backend import config, metrics
+from backend.metrics import Counter, Histogram, Registry, span, trace_request
+
+
+def test_exposition_format():
+    registry = Registry()
+    requests = Counter("demo_requests", "Requests handled", ["route", "status"], registry=registry)
+    latency = Histogram("demo_seconds", "Latency", [], buckets=(0.1, 1.0), registry=registry)
+    requests.inc(route="/a", status=200)
+    requests.inc(2, route='/b"\n', status=500)
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    assert registry.render() == "\n".join([
+        "# HELP demo_requests Requests handled",
+        "# TYPE demo_requests counter",
+        'demo_requests_total{route="/a",status="200"} 1',
+        'demo_requests_total{route="/b\\"\\n",status="500"} 2',
+        "# HELP demo_seconds Latency",
+        "# TYPE demo_seconds histogram",
+        'demo_seconds_bucket{le="0.1"} 1',
+        'demo_seconds_bucket{le="1.0"} 2',
+        'demo_seconds_bucket{le="+Inf"} 3',
+        "demo_seconds_sum 5.55",
+        "demo_seconds_count 3",
+    ]) + "\n"
+
+
+def test_labels_must_match():
+    counter = Counter("demo_labelled", "x", ["stage"], registry=Registry())
+    with pytest.raises(ValueError):
+        counter.inc(route="/a")
+
+
+def test_span_counts_failures_but_not_cancellations():
+    before = metrics.STAGE_ERRORS.value(stage="test_stage")
+    with pytest.raises(RuntimeError):
+        with span("test_stage"):
+            raise RuntimeError("boom")
+    with pytest.raises(asyncio.CancelledError):
+        with span("test_stage"):
+            raise asyncio.CancelledError()
+    assert metrics.STAGE_ERRORS.value(stage="test_stage") == before + 1
+
+
+def test_trace_request_logs_one_line_with_nested_spans(caplog, monkeypatch):
+    monkeypatch.setattr(config, "TRACE_LOG", True)
+    with caplog.at_level(logging.INFO):
+        with trace_request("demo", user="u1") as trace:
+            with span("retrieve"):
+                pass
+            with trace_request("inner"):
+                with span("retrieve"), span("rerank"):
+                    pass
+            trace["cached"] = False
+    records = [json.loads(r.message) for r in caplog.records if r.message.startswith('{"trace"')]
+    assert len(records) == 1
+    assert records[0]["trace"] == "demo"
+    assert set(records[0]["spans"]) == {"retrieve", "rerank"}
+    assert records[0]["user"] == "u1" and records[0]["cached"] is False
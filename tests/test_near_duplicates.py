@@ -0,0 +1,86 @@
+import json
+import os
+
+from backend.retriever.near_duplicates import NearDuplicateIndex
+from backend.retriever.vector_store import MANIFEST_FILE, VectorStore, current_store_dir
+
+from tests.conftest import make_article, write_news
+
+
+def reworded(article, url):
+    """``article`` republished under ``url`` with its last word changed."""
+    words = article["cleaned_text"].split()
+    return make_article(url, article["title"], text=" ".join(words[:-1] + ["updated"]))
+
+
+def stored_urls(embedder):
+    store = VectorStore(embedder.VECTOR_DIR)
+    return {store.get_document(row).metadata["url"] for row in store.live_rows()}
+
+
+def manifest(embedder):
+    with open(os.path.join(current_store_dir(embedder.VECTOR_DIR), MANIFEST_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_similar_texts_are_found_and_different_ones_are_not(tmp_path):
+    index = NearDuplicateIndex(threshold=0.8)
+    original = make_article("https://example.com/a", "A", words=300)
+    index.add("a", index.signature(original["cleaned_text"]))
+    index.add("b", index.signature(make_article("https://example.com/b", "B", words=300)["cleaned_text"]))
+
+    key, similarity = index.find(index.signature(reworded(original, "https://example.com/c")["cleaned_text"]))
+    assert key == "a" and similarity >= 0.8
+    assert index.find(index.signature(make_article("https://example.com/d", "D", words=300)["cleaned_text"])) == (None, 0.0)
+    assert index.find(index.signature(original["cleaned_text"]), exclude="a") == (None, 0.0)
+    assert index.signature("") is None
+
+    index.save(str(tmp_path))
+    loaded = NearDuplicateIndex.load(str(tmp_path), threshold=0.8)
+    assert len(loaded) == 2 and (loaded.get("a") == index.get("a")).all()
+    # Signatures of other shingling parameters do not compare: not loaded
+    assert len(NearDuplicateIndex.load(str(tmp_path), shingle_size=3)) == 0
+
+    index.remove("a")
+    assert "a" not in index
+    assert index.find(index.signature(original["cleaned_text"])) == (None, 0.0)
+
+
+def test_republished_story_is_not_embedded(embedder, embeddings, news_dir):
+    original = make_article("https://example.com/story", "Reliance results", words=300)
+    write_news(news_dir, "news_2026-10-01.json", [original, make_article("https://example.com/other", "TCS", words=300)])
+    embedder.embed(incremental=True)
+    texts = embeddings.stats.texts
+
+    write_news(news_dir, "news_2026-10-02.json", [reworded(original, "https://example.com/story-copy")])
+    summary = embedder.embed(incremental=True)
+    assert summary["duplicates"] == 1
+    assert embeddings.stats.texts == texts
+    assert stored_urls(embedder) == {"https://example.com/story", "https://example.com/other"}
+    (entry,) = manifest(embedder)["duplicates"].values()
+    assert entry["of"] in manifest(embedder)["articles"] and entry["similarity"] >= 0.8
+
+
+def test_streamed_articles_are_checked_against_the_store(embedder, embeddings, news_dir):
+    original = make_article("https://example.com/story", "Reliance results", words=300)
+    write_news(news_dir, "news_2026-10-01.json", [original])
+    embedder.embed(incremental=True)
+
+    copy = reworded(original, "https://example.com/story-copy")
+    docs = [{"content": copy["cleaned_text"], "metadata": copy, "date": "2026-10-02"}]
+    embedder.embed(incremental=True, docs=docs, prune=False)
+    assert stored_urls(embedder) == {"https://example.com/story"}
+    assert len(manifest(embedder)["duplicates"]) == 1
+
+
+def test_stored_article_that_becomes_a_duplicate_is_removed(embedder, news_dir):
+    first = make_article("https://example.com/first", "Reliance results", words=300)
+    second = make_article("https://example.com/second", "Reliance Q2", words=300)
+    write_news(news_dir, "news_2026-10-01.json", [first, second])
+    embedder.embed(incremental=True)
+    assert len(stored_urls(embedder)) == 2
+
+    # The second article is edited into a copy of the first
+    write_news(news_dir, "news_2026-10-01.json", [first, reworded(first, second["url"])])
+    embedder.embed(incremental=True)
+    assert stored_urls(embedder) == {first["url"]}
@@ -0,0 +1,66 @@
+import json
+import os
+
+from backend.ingestion.jsonl import JsonlWriter, read_articles
+from backend.ingestion.news_cleaner import clean_articles, clean_text, plan_file, snapshot
+
+
+def _write_raw(path, articles):
+    with JsonlWriter(path) as out:
+        for article in articles:
+            out.write(article)
+
+
+def _article(i):
+    return {"url": f"https://example.com/{i}", "title": f"Story {i}", "text": f"<p>Story {i} &amp; more</p>  text"}
+
+
+def test_clean_text():
+    assert clean_text("<p>Profit <b>rose</b> 5% &amp; margins   held</p>") == "Profit rose 5% & margins held"
+    assert clean_text("  already\n plain  ") == "already plain"
+
+
+def test_plan_file_decisions(tmp_path):
+    raw = str(tmp_path / "news_2026-10-01.jsonl")
+    out = str(tmp_path / "news_2026-10-01_cleaned.jsonl")
+    _write_raw(raw, [_article(0), _article(1)])
+    assert plan_file(raw, out, None) == ("full", 0)
+
+    recorded = snapshot(raw)
+    assert plan_file(raw, out, recorded) == ("full", 0)  # no output yet
+    open(out, "w").close()
+    assert plan_file(raw, out, recorded) == ("skip", 0)
+
+    os.utime(raw, ns=(recorded["mtime_ns"] + 10**9, recorded["mtime_ns"] + 10**9))
+    assert plan_file(raw, out, recorded) == ("touched", 0)
+
+    _write_raw(raw, [_article(2)])
+    assert plan_file(raw, out, recorded) == ("append", recorded["size"])
+
+    with open(raw, "r+b") as f:
+        f.write(b" ")  # the already-cleaned prefix changed
+    assert plan_file(raw, out, recorded) == ("full", 0)
+
+
+def test_clean_articles_only_cleans_what_changed(tmp_path):
+    raw_dir, cleaned_dir = str(tmp_path / "raw"), str(tmp_path / "cleaned")
+    os.makedirs(raw_dir)
+    _write_raw(f"{raw_dir}/news_2026-10-01.jsonl", [_article(0), _article(1)])
+    _write_raw(f"{raw_dir}/news_2026-10-02.jsonl", [_article(2)])
+    with open(f"{raw_dir}/news_2026-09-30.json", "w", encoding="utf-8") as f:
+        json.dump([_article(9)], f)
+
+    first = clean_articles(raw_dir, cleaned_dir, workers=2)
+    assert (first["files"], first["articles"], first["skipped"]) == (3, 4, 0)
+    cleaned = list(read_articles(f"{cleaned_dir}/news_2026-10-01_cleaned.jsonl"))
+    assert [a["cleaned_text"] for a in cleaned] == ["Story 0 & more text", "Story 1 & more text"]
+
+    assert clean_articles(raw_dir, cleaned_dir, workers=2)["files"] == 0
+
+    _write_raw(f"{raw_dir}/news_2026-10-01.jsonl", [_article(3)])
+    appended = clean_articles(raw_dir, cleaned_dir, workers=2)
+    assert (appended["files"], appended["articles"], appended["skipped"]) == (1, 1, 2)
+    assert [a["url"] for a in read_articles(f"{cleaned_dir}/news_2026-10-01_cleaned.jsonl")] == [
+        f"https://example.com/{i}" for i in (0, 1, 3)]
+
+    assert clean_articles(raw_dir, cleaned_dir, workers=2, force=True)["files"] == 3
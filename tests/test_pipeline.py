@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from backend.ingestion.jsonl import JsonlWriter, read_articles
+from backend.ingestion.pipeline import ingest, stage
+from backend.retriever.vector_store import VectorStore
+
+from tests.conftest import make_article
+
+
+def test_stage_yields_results_in_order_and_drops_none():
+    assert list(stage(range(10), lambda x: x * 2 if x % 3 else None)) == [2, 4, 8, 10, 14, 16]
+
+
+def test_full_queue_blocks_the_producer():
+    produced = []
+
+    def source():
+        for i in range(100):
+            produced.append(i)
+            yield i
+
+    stream = stage(source(), lambda x: x, maxsize=4)
+    first = next(stream)
+    time.sleep(0.3)
+    # One handed out, ``maxsize`` queued and one blocked in put(): nothing else was read
+    assert first == 0 and len(produced) <= 6
+    assert list(stream) == list(range(1, 100))
+
+
+def test_errors_propagate_to_the_consumer_through_every_stage():
+    def explode(x):
+        if x == 5:
+            raise ValueError("bad article")
+        return x
+
+    stream = stage(stage(range(10), explode), lambda x: x + 1)
+    received = []
+    with pytest.raises(ValueError, match="bad article"):
+        for item in stream:
+            received.append(item)
+    assert received == [1, 2, 3, 4, 5]
+
+
+def test_closing_early_stops_the_upstream_stages():
+    closed = threading.Event()
+
+    def source():
+        try:
+            for i in range(10_000):
+                yield i
+        finally:
+            closed.set()
+
+    stream = stage(stage(source(), lambda x: x, maxsize=2), lambda x: x, maxsize=2)
+    assert next(stream) == 0
+    stream.close()
+    assert closed.wait(5)
+
+
+def test_truncated_last_line_is_skipped(tmp_path):
+    path = str(tmp_path / "news_2026-10-01.jsonl")
+    with JsonlWriter(path) as out:
+        out.write({"url": "a"})
+        out.write({"url": "b"})
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"url": "c", "te')
+    assert [a["url"] for a in read_articles(path)] == ["a", "b"]
+
+
+def test_ingest_streams_articles_to_jsonl_and_the_store(embedder, embeddings, news_dir, tmp_path):
+    raw_dir = str(tmp_path / "raw_news")
+    articles = [{"url": a["url"], "title": a["title"], "text": a["cleaned_text"]}
+                for a in (make_article(f"https://example.com/{i}", f"Article {i}") for i in range(5))]
+    summary = ingest(iter(articles), date_str="2026-10-01", raw_dir=raw_dir, cleaned_dir=str(news_dir))
+
+    assert [a["url"] for a in read_articles(f"{raw_dir}/news_2026-10-01.jsonl")] == [a["url"] for a in articles]
+    cleaned = list(read_articles(f"{news_dir}/news_2026-10-01_cleaned.jsonl"))
+    assert [a["url"] for a in cleaned] == [a["url"] for a in articles]
+    assert all(a["cleaned_text"] for a in cleaned)
+    store = VectorStore(embedder.VECTOR_DIR, embeddings)
+    assert summary["vectors"] == store.ntotal > 0
+    assert {store.get_document(row).metadata["url"] for row in store.live_rows()} == {a["url"] for a in articles}
+
+
+def test_ingest_stops_the_source_when_embedding_fails(embedder, news_dir, tmp_path, monkeypatch):
+    closed = threading.Event()
+
+    def source():
+        try:
+            for i in range(1000):
+                yield {"url": f"https://example.com/{i}", "title": "t", "text": "some words here"}
+        finally:
+            closed.set()
+
+    def failing_embed(**kwargs):
+        next(iter(kwargs["docs"]))
+        raise RuntimeError("embeddings API down")
+
+    monkeypatch.setattr(embedder, "embed", failing_embed)
+    with pytest.raises(RuntimeError, match="embeddings API down"):
+        ingest(source(), date_str="2026-10-01", raw_dir=str(tmp_path / "raw"), cleaned_dir=str(news_dir))
+    assert closed.wait(5)
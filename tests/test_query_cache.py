@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from backend.retriever.embeddings import HashingEmbeddings
+from backend.retriever.query_cache import QueryEmbeddingCache, normalize_query
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.queries = 0
+
+    def embed_query(self, text):
+        self.queries += 1
+        return super().embed_query(text)
+
+
+def test_normalize_query():
+    assert normalize_query("  Reliance\tQ2   RESULTS ") == "reliance q2 results"
+
+
+def test_memory_hits_ignore_case_and_spacing():
+    embeddings = CountingEmbeddings(dim=32)
+    cache = QueryEmbeddingCache(embeddings, max_size=8, disk_path="")
+    first = cache.embed_query("Reliance results")
+    again = cache.embed_query("  reliance   RESULTS")
+    assert again is first
+    assert embeddings.queries == 1
+    assert cache.stats()["memory_hits"] == 1 and cache.stats()["misses"] == 1
+    # Shared between callers, so it must not be modified in place
+    with pytest.raises(ValueError):
+        first[0] = 1.0
+
+
+def test_lru_evicts_the_least_recently_used():
+    embeddings = CountingEmbeddings(dim=32)
+    cache = QueryEmbeddingCache(embeddings, max_size=2, disk_path="")
+    cache.embed_query("a")
+    cache.embed_query("b")
+    cache.embed_query("a")
+    cache.embed_query("c")  # evicts "b"
+    assert cache.stats()["size"] == 2
+    cache.embed_query("a")
+    assert embeddings.queries == 3
+    cache.embed_query("b")
+    assert embeddings.queries == 4
+
+
+def test_disk_tier_survives_restarts(tmp_path):
+    path = str(tmp_path / "cache" / "queries.sqlite")
+    embeddings = CountingEmbeddings(dim=32)
+    vector = QueryEmbeddingCache(embeddings, disk_path=path).embed_query("TCS outlook")
+
+    restarted = QueryEmbeddingCache(embeddings, disk_path=path)
+    assert np.array_equal(restarted.embed_query("tcs outlook"), vector)
+    assert embeddings.queries == 1
+    assert restarted.stats()["disk_hits"] == 1
+
+    # Entries are per embedding model
+    other = QueryEmbeddingCache(CountingEmbeddings(dim=16), disk_path=path)
+    assert len(other.embed_query("tcs outlook")) == 16
+    assert other.stats()["misses"] == 1
@@ -0,0 +1,119 @@
+import numpy as np
+
+from backend.rag_pipeline import RAGPipeline
+from backend.retriever.bm25 import BM25Index, TermTable
+from backend.retriever.retriever import detect_tickers, expand_query, reciprocal_rank_fusion, resolve_ticker
+from backend.retriever.vector_store import VectorStore
+
+from tests.conftest import make_article, write_news
+
+
+def test_rrf_orders_by_summed_reciprocal_rank():
+    # 1: 1/61 + 1/62, 3: 1/63 + 1/61, 2: 1/62, 4: 1/63
+    assert reciprocal_rank_fusion([[1, 2, 3], [3, 1, 4]], k=10, rrf_k=60) == [1, 3, 2, 4]
+    assert reciprocal_rank_fusion([[1, 2, 3], [3, 1, 4]], k=2, rrf_k=60) == [1, 3]
+    assert reciprocal_rank_fusion([], k=5) == []
+
+
+def test_ticker_resolution():
+    assert resolve_ticker("RIL") == "RELIANCE.NS"
+    assert resolve_ticker("hdfc bank") == "HDFCBANK.NS"
+    assert resolve_ticker("unknown") is None
+    assert detect_tickers("Infosys and TCS lead IT stocks") == ["TCS.NS", "INFY.NS"]
+    assert detect_tickers("Tariffs rise again") == []
+
+
+def test_expand_query_matches_whole_aliases_only():
+    assert expand_query("RIL recent trends") == "RIL recent trends reliance"
+    assert expand_query("april results") == "april results"
+
+
+def test_bm25_updates_match_a_rebuild():
+    texts = {0: "reliance jio tariff hike", 1: "tcs deal win", 2: "reliance retail expansion", 3: "itc hotels"}
+    index = BM25Index.build([(0, texts[0]), (1, texts[1])], n_rows=2)
+    index = index.updated(add=[(2, texts[2]), (3, texts[3])], remove=[1], n_rows=4)
+    rebuilt = BM25Index.build([(row, texts[row]) for row in (0, 2, 3)], n_rows=4)
+
+    for query in ("reliance", "tcs deal", "hotels tariff"):
+        rows, scores = index.search(query, k=5)
+        expected_rows, expected_scores = rebuilt.search(query, k=5)
+        assert rows.tolist() == expected_rows.tolist()
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+    assert index.search("tcs", k=5)[0].tolist() == []
+    assert sorted(index.term_rows("reliance").tolist()) == [0, 2]
+
+
+
+def test_term_table_maps_terms_like_a_dict(tmp_path):
+    vocab = {term: i for i, term in enumerate(["reliance", "jio", "tariff", "रिलायंस", "₹"])}
+    TermTable.save(vocab, str(tmp_path))
+    table = TermTable(str(tmp_path))
+    assert len(table) == len(vocab)
+    assert dict(table.items()) == vocab
+    assert all(table[term] == i for term, i in vocab.items())
+    assert "tcs" not in table and table.get("tcs", -1) == -1
+
+    index = BM25Index.build([(0, "reliance jio tariff"), (1, "tcs deal")], n_rows=2)
+    index.save(str(tmp_path))
+    mapped, loaded = BM25Index.load(str(tmp_path)), BM25Index.load(str(tmp_path), mmap=False)
+    assert isinstance(mapped.vocab, TermTable) and isinstance(loaded.vocab, dict)
+    assert mapped.search("jio deal", k=5)[0].tolist() == loaded.search("jio deal", k=5)[0].tolist()
+
+
+def test_persisted_keyword_index_follows_incremental_embeds(embedder, embeddings, news_dir):
+    reliance = make_article("https://example.com/reliance", "Reliance", text="reliance jio raises mobile tariffs again")
+    tcs = make_article("https://example.com/tcs", "TCS", text="tcs signs a multi year deal with a european bank")
+    write_news(news_dir, "news_2026-10-01.json", [reliance, tcs])
+    embedder.embed(incremental=True)
+    write_news(news_dir, "news_2026-10-01.json", [tcs])
+    embedder.embed(incremental=True)
+
+    store = VectorStore(embedder.VECTOR_DIR, embeddings)
+    assert store.keyword_search_rows("reliance jio", k=5)[0].tolist() == []
+    rows, _ = store.keyword_search_rows("european bank deal", k=5)
+    assert {store.get_document(row).metadata["url"] for row in rows} == {tcs["url"]}
+
+
+def test_hybrid_retrieval_finds_keyword_only_matches(embedder, embeddings, news_dir):
+    # "RIL" shares no word with the article: only the alias-expanded keyword side can find it
+    articles = [make_article(f"https://example.com/{i}", f"Article {i}") for i in range(30)]
+    articles.append(make_article("https://example.com/reliance", "Reliance", text="reliance industries quarterly numbers"))
+    write_news(news_dir, "news_2026-10-01.json", articles)
+    embedder.embed()
+
+    rag = RAGPipeline(embedder.VECTOR_DIR, embeddings=embeddings)
+    assert "https://example.com/reliance" in {chunk["source"] for chunk in rag.retrieve_relevant_chunks("RIL", k=3)}
+
+
+def test_pipeline_retrieval_applies_filters(embedder, embeddings, news_dir):
+    write_news(news_dir, "news_2026-10-01.json", [make_article("https://example.com/reliance", "Reliance Jio tariff hike")])
+    write_news(news_dir, "news_2026-10-04.json", [make_article("https://example.com/tcs", "TCS wins a large deal")])
+    write_news(news_dir, "news_2026-10-07.json", [make_article("https://example.com/itc", "ITC hotels demerger")])
+    embedder.embed()
+
+    rag = RAGPipeline(embedder.VECTOR_DIR, embeddings=embeddings)
+    urls = lambda chunks: {chunk["source"] for chunk in chunks}  # noqa: E731
+    assert urls(rag.retrieve_relevant_chunks("tariff hike", k=20)) == {
+        "https://example.com/reliance", "https://example.com/tcs", "https://example.com/itc"}
+    assert urls(rag.retrieve_relevant_chunks("tariff hike", k=20, filters={"tickers": ["TCS"]})) == {
+        "https://example.com/tcs"}
+    assert urls(rag.retrieve_relevant_chunks("deal", k=20, filters={"date_to": "2026-10-04"})) == {
+        "https://example.com/reliance", "https://example.com/tcs"}
+
+
+def test_retrieve_many_matches_single_queries(embedder, embeddings, news_dir):
+    articles = [make_article(f"https://example.com/{i}", f"Article {i}") for i in range(20)]
+    write_news(news_dir, "news_2026-10-01.json", articles)
+    embedder.embed()
+    queries = ["deal pipeline", "Reliance tariff outlook", "  DEAL   pipeline ", "ITC demerger"]
+
+    rag = RAGPipeline(embedder.VECTOR_DIR, embeddings=embeddings)
+    texts, batches = embeddings.stats.texts, embeddings.stats.batches
+    batch = rag.retrieve_many(queries, k=5)
+    # The three distinct questions are embedded together, once
+    assert (embeddings.stats.texts - texts, embeddings.stats.batches - batches) == (3, 1)
+    assert batch[0] == batch[2]
+
+    single = RAGPipeline(embedder.VECTOR_DIR, embeddings=embeddings)
+    assert batch == [single.retrieve_relevant_chunks(query, k=5) for query in queries]
+    assert rag.retrieve_many([]) == []
@@ -0,0 +1,148 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.ingestion.jsonl import read_articles
+from backend.ingestion.rss_scraper import ScraperState, fetch_and_parse_articles, save_articles
+
+ETAG = '"feed-v1"'
+ARTICLE_HTML = """<html><head><title>{title}</title></head><body><article><h1>{title}</h1>
+<p>{body}</p><p>{body}</p><p>{body}</p></article></body></html>"""
+BODY = ("Reliance Industries reported a rise in quarterly profit as its retail and telecom businesses grew, "
+        "while refining margins stayed under pressure from weaker demand in export markets.")
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """RSS feed plus article pages; the feed honours If-None-Match and article pages are slow."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+        if self.path == "/feed.xml":
+            if self.headers.get("If-None-Match") == ETAG:
+                self.send_response(304)
+                self.end_headers()
+                return
+            items = "".join(f"<item><title>Story {i}</title><link>{server.base}/story/{i}</link>"
+                            f"<pubDate>Wed, 01 Oct 2026 0{i % 10}:00:00 GMT</pubDate></item>"
+                            for i in range(server.n_articles))
+            body = f'<?xml version="1.0"?><rss version="2.0"><channel><title>Stand-in</title>{items}</channel></rss>'
+            self._send(body, "application/rss+xml", {"ETag": ETAG})
+            return
+        if self.path in server.broken:
+            self.send_response(500)
+            self.end_headers()
+            return
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(0.05)
+            title = f"Story {self.path.rsplit('/', 1)[1]}"
+            self._send(ARTICLE_HTML.format(title=title, body=BODY), "text/html")
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send(self, body, content_type, headers=()):
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in dict(headers).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def stand_in():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    server.base = f"http://127.0.0.1:{server.server_port}"
+    server.lock = threading.Lock()
+    server.requests = []
+    server.broken = set()
+    server.n_articles = 6
+    server.in_flight = server.max_in_flight = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _article_requests(server):
+    return [path for path in server.requests if path.startswith("/story/")]
+
+
+def test_scrapes_each_article_once_and_revalidates_the_feed(stand_in, tmp_path):
+    feed = f"{stand_in.base}/feed.xml"
+    state = ScraperState(str(tmp_path / "state.json"))
+    articles = fetch_and_parse_articles([feed], state, max_workers=8, per_host=8)
+    assert sorted(a["url"] for a in articles) == sorted(f"{stand_in.base}/story/{i}" for i in range(6))
+    assert all(BODY in a["text"] and a["source"] == "127.0.0.1:" + str(stand_in.server_port) for a in articles)
+    assert articles[0]["published"].startswith("2026-10-01")
+
+    # Second run: the stored ETag gets a 304, nothing is downloaded again
+    again = fetch_and_parse_articles([feed], ScraperState(str(tmp_path / "state.json")))
+    assert again == []
+    assert stand_in.requests.count("/feed.xml") == 2
+    assert len(_article_requests(stand_in)) == 6
+
+
+def test_seen_urls_are_skipped_even_when_the_feed_changed(stand_in, tmp_path):
+    feed = f"{stand_in.base}/feed.xml"
+    path = str(tmp_path / "state.json")
+    fetch_and_parse_articles([feed], ScraperState(path))
+    # Drop the validators, as if the feed had a new ETag: only the new story is fetched
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data["feeds"] = {}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    stand_in.n_articles = 7
+    new = fetch_and_parse_articles([feed], ScraperState(path))
+    assert [a["url"] for a in new] == [f"{stand_in.base}/story/6"]
+    assert len(_article_requests(stand_in)) == 7
+
+
+def test_failed_downloads_are_retried_next_run(stand_in, tmp_path):
+    feed = f"{stand_in.base}/feed.xml"
+    path = str(tmp_path / "state.json")
+    stand_in.broken = {"/story/2"}
+    first = fetch_and_parse_articles([feed], ScraperState(path))
+    assert f"{stand_in.base}/story/2" not in {a["url"] for a in first}
+    assert f"{stand_in.base}/story/2" not in ScraperState(path).seen
+
+    stand_in.broken = set()
+    state = ScraperState(path)
+    state.feeds = {}
+    assert [a["url"] for a in fetch_and_parse_articles([feed], state)] == [f"{stand_in.base}/story/2"]
+
+
+def test_per_host_limit_caps_concurrent_downloads(stand_in):
+    feed = f"{stand_in.base}/feed.xml"
+    stand_in.n_articles = 8
+    fetch_and_parse_articles([feed], ScraperState(None), max_workers=8, per_host=2)
+    assert stand_in.max_in_flight == 2
+
+
+def test_seen_urls_expire():
+    state = ScraperState(None)
+    state.seen = {"https://old.example/a": "2020-01-01", "https://new.example/b": "2999-01-01"}
+    state.prune(ttl_days=30)
+    assert list(state.seen) == ["https://new.example/b"]
+
+
+def test_daily_file_is_appended_to(tmp_path):
+    save_articles([{"url": "a", "text": "1"}], str(tmp_path), "2026-10-01")
+    filename = save_articles([{"url": "b", "text": "2"}], str(tmp_path), "2026-10-01")
+    assert filename.endswith("news_2026-10-01.jsonl")
+    assert list(read_articles(filename)) == [{"url": "a", "text": "1"}, {"url": "b", "text": "2"}]
@@ -0,0 +1,109 @@
+import math
+
+import pytest
+
+from backend import config
+from backend.ingestion.stock_fetcher import CsvDirectorySource, PriceStore, import_csv_if_empty
+from backend.retriever.screener import Screener, answer_question, format_answer, parse_condition, parse_query
+
+from tests.conftest import PRICES, price_frame
+
+@pytest.mark.parametrize("query, expected", [
+    ("10 stocks performing well below price of 1000",
+     {"conditions": [("Close", "<", 1000.0)], "sort": "Perf", "descending": True, "limit": 10}),
+    ("worst 3 stocks above ₹2,500",
+     {"conditions": [("Close", ">", 2500.0)], "sort": "Perf", "descending": False, "limit": 3}),
+    ("which stocks are oversold?",
+     {"conditions": [("RSI_14", "<", 30.0)], "sort": "Perf", "descending": True, "limit": 10}),
+    ("top 5 performing companies",
+     {"conditions": [], "sort": "Perf", "descending": True, "limit": 5}),
+    ("3 stocks under 2,000 that are overbought",
+     {"conditions": [("Close", "<", 2000.0), ("RSI_14", ">", 70.0)], "sort": "Perf", "descending": True, "limit": 3}),
+])
+def test_parse_query(query, expected):
+    assert parse_query(query) == expected
+
+
+@pytest.mark.parametrize("query", [
+    "What is the market sentiment around Reliance Industries?",
+    "best companies to invest in",  # a ranking cue without a count
+    "Is the price below 1000?",  # not about stocks
+    "Which are the 3 best stocks of the Nifty 50 in 2024?",
+    "top 5 performing stocks this year",
+    "best 3 stocks last month",  # no performance cue, and a period
+    "best 3 stocks",
+    "10 stocks performing well in the Sensex",
+    "5 stocks below 1000 in the IT sector",
+    "top 3 gaining midcap stocks since March",
+])
+def test_parse_query_leaves_other_questions_to_retrieval(query):
+    assert parse_query(query) is None
+
+
+def test_parse_condition():
+    assert parse_condition("Close<1000") == ("Close", "<", 1000.0)
+    assert parse_condition("RSI_14 = 50") == ("RSI_14", "==", 50.0)
+    with pytest.raises(ValueError):
+        parse_condition("Close is low")
+
+
+def test_screen_filters_sorts_and_limits(price_store):
+    screener = Screener(price_store)
+    assert len(screener) == len(PRICES)
+
+    rows = screener.screen([("Close", "<", 1000.0)], sort="Perf")
+    assert {row["ticker"] for row in rows} == {"INFY.NS", "ITC.NS", "HDFCBANK.NS"}
+    perf = [row["Perf"] for row in rows]
+    assert perf == sorted(perf, reverse=True)
+    assert rows[0]["name"] == "Infosys"
+
+    worst = screener.screen(sort="Perf", descending=False, limit=2)
+    assert [row["ticker"] for row in worst] == ["ITC.NS", "TCS.NS"]
+    assert [row["ticker"] for row in screener.screen(sort="Close", limit=1, tickers=["TCS.NS", "INFY.NS"])] == ["TCS.NS"]
+    with pytest.raises(ValueError):
+        screener.screen([("PE", "<", 20.0)])
+
+
+def test_screener_reloads_when_the_store_changes(price_store):
+    screener = Screener(price_store, refresh_seconds=0)
+    price_store.append(price_frame("SBIN.NS", 800.0, 0.002))
+    assert screener.refresh()
+    assert "SBIN.NS" in screener.tickers
+    assert not screener.refresh()
+
+
+def test_answer_question(price_store):
+    screener = Screener(price_store)
+    answer = answer_question(screener, "5 stocks performing well below price of 1000")
+    assert answer.startswith("3 tracked stocks with Close < 1000, best 5-day performance first")
+    assert "1. Infosys (INFY.NS): close " in answer
+    assert answer_question(screener, "What did Infosys say about attrition?") is None
+    # An empty store leaves every question to retrieval
+    assert answer_question(Screener(PriceStore(str(price_store.path) + "-empty"), csv_dir=None),
+                           "5 stocks below 1000") is None
+
+
+def test_empty_store_is_filled_from_csvs(tmp_path):
+    store = PriceStore(str(tmp_path / "prices"))
+    screener = Screener(store, csv_dir=config.STOCK_DATA_DIR)
+    # Every CSV is imported, not just the STOCKS tickers
+    assert sorted(screener.tickers) == CsvDirectorySource(config.STOCK_DATA_DIR).tickers()
+    assert {"SBIN.NS", "ICICIBANK.NS", "HINDUNILVR.NS"} <= set(screener.tickers)
+    assert len(store.parts()) == 1
+    # Only an empty store is imported into
+    assert import_csv_if_empty(store, config.STOCK_DATA_DIR) == 0
+
+    rows = screener.screen([("Close", "<", 1000.0)], sort="Perf")
+    assert rows and all(row["Close"] < 1000 for row in rows)
+    perf = [row["Perf"] for row in rows]
+    assert perf == sorted(perf, reverse=True)
+    answer = answer_question(screener, "5 stocks performing well below price of 1000")
+    assert answer.startswith(f"{min(len(rows), 5)} tracked stock")
+
+
+def test_format_answer_skips_missing_values():
+    query = {"conditions": [], "sort": "Perf", "descending": True, "limit": 10}
+    row = {"ticker": "TCS.NS", "name": "TCS", "date": "2026-10-16", "Close": math.nan,
+           "Perf": None, "RSI_14": 55.0, "MACDh_12_26_9": math.nan}
+    assert format_answer(query, [row]).splitlines()[1] == "1. TCS (TCS.NS): close n/a, RSI 55.0"
+    assert format_answer(query, []) == "No tracked stocks, best 5-day performance first."
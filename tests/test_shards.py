@@ -0,0 +1,143 @@
+import datetime
+import os
+
+import pytest
+
+from backend import config
+from backend.retriever import vector_store
+from backend.retriever.shards import ALL, UNDATED, Shard, select_shards, shard_file, shard_key
+from backend.retriever.vector_store import VectorStore, current_store_dir
+
+from tests.conftest import make_article, write_news
+
+TODAY = datetime.date.today()
+
+
+def day_number(date):
+    return (date - datetime.date(1970, 1, 1)).days
+
+
+def add_news(news_dir, date, n=2):
+    articles = [make_article(f"https://example.com/{date}/{i}", f"Update {date} {i}") for i in range(n)]
+    write_news(news_dir, f"news_{date.isoformat()}.json", articles)
+    return articles
+
+
+def search_urls(store, filters=None):
+    vector = store.embeddings.embed_query("quarterly results outlook")
+    rows, _ = store.search_rows(vector, 100, filters)
+    return {store.get_document(row).metadata["url"] for row in rows}
+
+
+def test_shard_keys_and_window_selection():
+    day = day_number(datetime.date(2026, 10, 14))
+    assert shard_key(day, "day") == "2026-10-14"
+    assert shard_key(day, "week") == "2026-W42"
+    assert shard_key(day, "month") == "2026-10"
+    assert shard_key(day, "none") == ALL
+    assert shard_key(-1, "week") == UNDATED
+    with pytest.raises(ValueError):
+        shard_key(day, "year")
+
+    shards = [Shard("a", 0, 9, None), Shard("b", 10, 19, None), Shard("c", 20, 29, None), Shard(UNDATED, -1, -1, None)]
+    assert [s.key for s in select_shards(shards, 12, 15)] == ["b"]
+    assert [s.key for s in select_shards(shards, 15, None)] == ["b", "c"]
+    assert [s.key for s in select_shards(shards, None, 9)] == ["a"]
+    assert len(select_shards(shards)) == 4
+
+
+def test_date_windows_search_only_overlapping_shards(embedder, embeddings, news_dir, monkeypatch):
+    dates = [TODAY - datetime.timedelta(days=days) for days in (1, 9, 16)]
+    for date in dates:
+        add_news(news_dir, date)
+    embedder.embed(incremental=True, shard_period="day")
+    store = VectorStore(embedder.VECTOR_DIR, embeddings)
+    assert sorted(shard.key for shard in store.shards) == sorted(date.isoformat() for date in dates)
+
+    searched = []
+    search_shards = vector_store.search_shards
+    monkeypatch.setattr(vector_store, "search_shards",
+                        lambda shards, *args: searched.append([s.key for s in shards]) or search_shards(shards, *args))
+    window = {"date_from": dates[1].isoformat(), "date_to": dates[0].isoformat()}
+    assert search_urls(store, window) == {f"https://example.com/{date}/{i}" for date in dates[:2] for i in range(2)}
+    assert sorted(searched[-1]) == sorted(date.isoformat() for date in dates[:2])
+    assert len(search_urls(store)) == 6
+    assert len(searched[-1]) == 3
+
+
+def test_sharded_search_matches_a_single_index(embedder, embeddings, news_dir, tmp_path, monkeypatch):
+    for days in range(0, 40, 3):
+        add_news(news_dir, TODAY - datetime.timedelta(days=days), n=3)
+    embedder.embed(shard_period="week")
+    sharded = VectorStore(embedder.VECTOR_DIR, embeddings)
+    assert len(sharded.shards) > 1
+
+    monkeypatch.setattr(embedder, "VECTOR_DIR", str(tmp_path / "single"))
+    embedder.embed(shard_period="none")
+    single = VectorStore(embedder.VECTOR_DIR, embeddings)
+    assert [shard.key for shard in single.shards] == [ALL]
+
+    vectors = embeddings.embed_documents(["deal pipeline", "monsoon demand", "repo rate outlook"])
+    for (rows, scores), (expected_rows, expected_scores) in zip(sharded.search_rows_many(vectors, 10),
+                                                                 single.search_rows_many(vectors, 10)):
+        assert ([sharded.get_document(r).metadata["url"] for r in rows]
+                == [single.get_document(r).metadata["url"] for r in expected_rows])
+
+
+def test_unchanged_shards_are_linked_into_the_next_version(embedder, news_dir):
+    old, new = TODAY - datetime.timedelta(days=20), TODAY
+    add_news(news_dir, old)
+    embedder.embed(incremental=True, shard_period="day")
+    first = os.path.join(current_store_dir(embedder.VECTOR_DIR), shard_file(old.isoformat()))
+
+    add_news(news_dir, new)
+    embedder.embed(incremental=True, shard_period="day")
+    second = os.path.join(current_store_dir(embedder.VECTOR_DIR), shard_file(old.isoformat()))
+    assert first != second
+    assert os.stat(first).st_ino == os.stat(second).st_ino
+    assert os.path.exists(os.path.join(current_store_dir(embedder.VECTOR_DIR), shard_file(new.isoformat())))
+
+
+def test_old_day_shards_are_compacted_into_months(embedder, embeddings, news_dir, monkeypatch):
+    monkeypatch.setattr(config, "SHARD_COMPACT_AFTER_DAYS", 30)
+    old = [datetime.date(TODAY.year - 1, 3, day) for day in (2, 9, 20)]
+    for date in old + [TODAY]:
+        add_news(news_dir, date)
+    embedder.embed(incremental=True, shard_period="day")
+    store = VectorStore(embedder.VECTOR_DIR, embeddings)
+    assert sorted(shard.key for shard in store.shards) == [f"{TODAY.year - 1}-03", TODAY.isoformat()]
+    assert len(search_urls(store)) == 8
+
+
+def test_retention_drops_expired_articles_and_their_shards(embedder, embeddings, news_dir, monkeypatch):
+    recent, expired = TODAY - datetime.timedelta(days=2), TODAY - datetime.timedelta(days=60)
+    add_news(news_dir, recent)
+    add_news(news_dir, expired)
+    embedder.embed(incremental=True, shard_period="day")
+    assert len(search_urls(VectorStore(embedder.VECTOR_DIR, embeddings))) == 4
+
+    monkeypatch.setattr(config, "RETENTION_DAYS", 30)
+    monkeypatch.setattr(config, "VECTOR_STORE_COMPACT_DEAD_FRACTION", 0)
+    embedder.embed(incremental=True, shard_period="day")
+    store = VectorStore(embedder.VECTOR_DIR, embeddings)
+    assert [shard.key for shard in store.shards] == [recent.isoformat()]
+    assert search_urls(store) == {f"https://example.com/{recent}/{i}" for i in range(2)}
+    assert all(store.get_document(row).metadata["date"] == recent.isoformat() for row in store.live_rows())
+    # Compacted: the expired articles leave no tombstoned rows, records or text behind
+    assert len(store.live_rows()) == len(store.chunks) and len(store.articles) == 2
+
+
+def test_recency_decay_ranks_newer_articles_first(embedder, embeddings, news_dir, monkeypatch):
+    from backend.rag_pipeline import RAGPipeline
+
+    text = "reliance retail expansion quarterly outlook"
+    for days in (30, 0, 10):
+        date = TODAY - datetime.timedelta(days=days)
+        write_news(news_dir, f"news_{date}.json", [
+            make_article(f"https://example.com/{days}", f"Reliance {days}", text=f"{text} {days} days")])
+    embedder.embed(incremental=True, shard_period="week")
+    rag = RAGPipeline(embedder.VECTOR_DIR, embeddings=embeddings)
+
+    monkeypatch.setattr(config, "RECENCY_HALF_LIFE_DAYS", 7.0)
+    ranked = [chunk["source"] for chunk in rag.retrieve_relevant_chunks(text, k=3)]
+    assert ranked == ["https://example.com/0", "https://example.com/10", "https://example.com/30"]
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from backend.query_keys import normalize_query, request_key
+from backend.singleflight import SingleFlight, StreamFlights
+
+
+def test_concurrent_callers_share_one_answer():
+    async def scenario():
+        flights = SingleFlight("test")
+        calls = 0
+        release = asyncio.Event()
+
+        async def generate():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "answer"
+
+        first = asyncio.ensure_future(flights.do("key", generate))
+        second = asyncio.ensure_future(flights.do("key", generate))
+        await asyncio.sleep(0)
+        assert len(flights) == 1
+        release.set()
+        assert await asyncio.gather(first, second) == ["answer", "answer"]
+        assert calls == 1
+        # Nothing is kept once the flight lands: the next caller runs again
+        assert await flights.do("key", generate) == "answer"
+        assert calls == 2
+        assert len(flights) == 0
+
+    asyncio.run(scenario())
+
+
+def test_error_reaches_every_caller():
+    async def scenario():
+        flights = SingleFlight("test")
+        calls = 0
+
+        async def fail():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise RuntimeError("Gemini is down")
+
+        results = await asyncio.gather(flights.do("key", fail), flights.do("key", fail), return_exceptions=True)
+        assert calls == 1
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert len(flights) == 0
+
+    asyncio.run(scenario())
+
+
+def test_stream_subscribers_get_every_event():
+    async def scenario():
+        flights = StreamFlights("test")
+        starts = 0
+
+        async def events():
+            nonlocal starts
+            starts += 1
+            for event in ("a", "b", "c"):
+                await asyncio.sleep(0.01)
+                yield event
+
+        async def collect():
+            return [event async for event in flights.subscribe("key", events)]
+
+        first = asyncio.ensure_future(collect())
+        await asyncio.sleep(0.015)
+        # Joins after "a" was sent; it is replayed
+        second = asyncio.ensure_future(collect())
+        assert await asyncio.gather(first, second) == [["a", "b", "c"], ["a", "b", "c"]]
+        assert starts == 1
+
+    asyncio.run(scenario())
+
+
+def test_stream_stops_when_its_last_subscriber_leaves():
+    async def scenario():
+        flights = StreamFlights("test")
+        stopped = asyncio.Event()
+
+        async def events():
+            try:
+                while True:
+                    yield "token"
+                    await asyncio.sleep(0.01)
+            finally:
+                stopped.set()
+
+        stream = flights.subscribe("key", events)
+        assert await stream.__anext__() == "token"
+        await stream.aclose()
+        await asyncio.wait_for(stopped.wait(), 1)
+        assert len(flights) == 0
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("a, b", [
+    (("TCS results", None), ("  tcs   RESULTS ", {})),
+    (("TCS results", {"tickers": ["TCS", "ITC"]}), ("tcs results", {"tickers": ["itc", "tcs"], "date_from": None})),
+])
+def test_equivalent_requests_share_a_key(a, b):
+    assert request_key(*a) == request_key(*b)
+
+
+def test_filters_separate_keys():
+    assert request_key("TCS results", {"tickers": ["TCS"]}) != request_key("TCS results", {"tickers": ["ITC"]})
+    assert request_key("TCS results", {"date_from": "2026-10-01"}) != request_key("TCS results")
+    assert normalize_query(" Reliance\tQ2 ") == "reliance q2"
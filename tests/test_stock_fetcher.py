@@ -0,0 +1,98 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.ingestion import indicators
+from backend.ingestion.stock_fetcher import INDICATOR_COLUMNS, PRICE_COLUMNS, STATE_COLUMNS, PriceStore, update
+
+START = datetime.date(2024, 1, 1)
+
+
+def make_bars(ticker, days, seed):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(START, periods=days)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, days)))
+    return pd.DataFrame({
+        "Date": dates, "Ticker": ticker, "Open": close, "High": close * 1.01,
+        "Low": close * 0.99, "Close": close, "Volume": rng.integers(1_000, 10_000, days).astype(float),
+    })
+
+
+class FakeSource:
+    """Serves fixed bars and records every request, in place of Yahoo Finance."""
+
+    def __init__(self, bars):
+        self.bars = bars
+        self.calls = []
+
+    def fetch(self, tickers, start, end):
+        self.calls.append((sorted(tickers), start, end))
+        dates = self.bars["Date"].dt.date
+        return self.bars[self.bars["Ticker"].isin(tickers) & (dates >= start) & (dates <= end)].copy()
+
+
+@pytest.fixture
+def bars():
+    return pd.concat([make_bars("AAA.NS", 120, 1), make_bars("BBB.NS", 120, 2)], ignore_index=True)
+
+
+def day(bars, i):
+    return bars["Date"].drop_duplicates().iloc[i].date()
+
+
+def test_incremental_update_fetches_only_new_days(tmp_path, bars):
+    source, store = FakeSource(bars), PriceStore(str(tmp_path))
+
+    added = update(["AAA.NS", "BBB.NS"], source, store, lookback_days=(day(bars, 59) - START).days, today=day(bars, 59))
+    assert added == 120
+    assert update(["AAA.NS", "BBB.NS"], source, store, today=day(bars, 59)) == 0
+    assert len(source.calls) == 1
+
+    added = update(["AAA.NS", "BBB.NS"], source, store, today=day(bars, 79))
+    assert added == 40
+    # One batched call for both tickers, starting the day after the last stored row
+    assert source.calls[-1] == (["AAA.NS", "BBB.NS"], day(bars, 59) + datetime.timedelta(days=1), day(bars, 79))
+    stored = store.load()
+    assert len(stored) == 160
+    assert not stored.duplicated(["Ticker", "Date"]).any()
+    assert len(store.parts()) == 2
+
+
+def test_incremental_indicators_match_full_recompute(tmp_path, bars):
+    source, store = FakeSource(bars), PriceStore(str(tmp_path), max_parts=3)
+    # Starts inside the seeding window of the 26-day EMA, then extends in uneven steps
+    for i in (9, 10, 30, 31, 57, 90, 119):
+        update(["AAA.NS", "BBB.NS"], source, store,
+               lookback_days=(day(bars, 9) - START).days, today=day(bars, i))
+    assert len(store.parts()) <= 3
+
+    stored = store.load()
+    for ticker, rows in stored.groupby("Ticker"):
+        expected = indicators.calculate_indicators(bars[bars["Ticker"] == ticker].reset_index(drop=True))
+        assert rows["Date"].tolist() == expected["Date"].tolist()
+        for column in INDICATOR_COLUMNS + STATE_COLUMNS:
+            np.testing.assert_allclose(rows[column].to_numpy(), expected[column].to_numpy(),
+                                       rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=column)
+
+
+def test_new_ticker_gets_its_lookback(tmp_path, bars):
+    source, store = FakeSource(bars), PriceStore(str(tmp_path))
+    update(["AAA.NS"], source, store, lookback_days=(day(bars, 39) - START).days, today=day(bars, 39))
+
+    update(["AAA.NS", "BBB.NS"], source, store, lookback_days=30, today=day(bars, 49))
+    stored = store.load()
+    counts = stored.groupby("Ticker").size()
+    assert counts["AAA.NS"] == 50
+    assert stored[stored["Ticker"] == "BBB.NS"]["Date"].min().date() >= day(bars, 49) - datetime.timedelta(days=30)
+    assert set(PRICE_COLUMNS) <= set(stored.columns)
+
+
+def test_ema_matches_loop():
+    x = np.random.default_rng(0).normal(size=500)
+    expected, prev = [], 3.0
+    for value in x:
+        prev = 0.1 * value + 0.9 * prev
+        expected.append(prev)
+    np.testing.assert_allclose(indicators.ema(x, 0.1, 3.0), expected, rtol=1e-10)
@@ -0,0 +1,187 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from backend import config
+from backend.retriever.bm25 import LEGACY_VOCAB_FILE, TERM_FILES, TermTable
+from backend.retriever.vector_store import (
+    ARTICLE_OFFSETS_FILE, ARTICLES_FILE, ATTRIBUTE_VALUES_FILE, ATTRIBUTES_FILE, CHUNKS_FILE, DELETED,
+    LEGACY_ARTICLES_FILE, TEXT_FILE,
+    ArticleRecords, VectorStore, article_attributes, current_store_dir, load_article_records
+)
+
+from tests.conftest import make_article, write_news
+
+
+def test_chunks_are_rebuilt_from_article_bodies_stored_once(embedder, news_dir, embeddings):
+    articles = [make_article(f"https://example.com/{i}", f"Article {i}", words=400) for i in range(3)]
+    write_news(news_dir, "news_2026-10-01.json", articles)
+    embedder.embed()
+
+    store = VectorStore(embedder.VECTOR_DIR, embeddings)
+    assert store._articles is None  # article records load on first use
+    splitter = embedder.get_splitter()
+    expected = {a["url"]: [text for _, text, _, _ in embedder.split_article({"content": a["cleaned_text"], "metadata": a}, splitter)]
+                for a in articles}
+    stored = {}
+    for row in store.live_rows():
+        doc = store.get_document(row)
+        assert "cleaned_text" not in doc.metadata
+        stored.setdefault(doc.metadata["url"], []).append(doc.page_content)
+    assert stored == expected
+    # Each body once, however many chunks point into it
+    assert os.path.getsize(os.path.join(store.path, TEXT_FILE)) == sum(
+        len(a["cleaned_text"].encode("utf-8")) for a in articles)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "hnsw"])
+def test_removed_chunks_are_compacted_past_the_dead_fraction(index_type, embedder, news_dir, embeddings, monkeypatch):
+    articles = [make_article(f"https://example.com/{i}", f"Article {i}", words=300) for i in range(60)]
+    write_news(news_dir, "news_2026-10-01.json", articles)
+    embedder.embed(index_type=index_type)
+    before = VectorStore(embedder.VECTOR_DIR, embeddings)
+    rows_before, text_before = len(before.chunks), os.path.getsize(os.path.join(before.path, TEXT_FILE))
+
+    # A few removals stay tombstoned
+    monkeypatch.setattr(config, "VECTOR_STORE_COMPACT_DEAD_FRACTION", 0.2)
+    write_news(news_dir, "news_2026-10-01.json", articles[5:])
+    embedder.embed(incremental=True, index_type=index_type)
+    store = VectorStore(embedder.VECTOR_DIR, embeddings)
+    assert len(store.chunks) == rows_before
+    assert (store.chunks["article"] == DELETED).any()
+
+    # Past the threshold the next save drops them, with their articles and text
+    write_news(news_dir, "news_2026-10-01.json", articles[30:])
+    embedder.embed(incremental=True, index_type=index_type)
+    store = VectorStore(embedder.VECTOR_DIR, embeddings)
+    chunks = np.load(os.path.join(store.path, CHUNKS_FILE))
+    assert (chunks["article"] != DELETED).all()
+    assert len(chunks) < rows_before // 2 + 10 and store.ntotal == len(chunks)
+    assert len(store.articles) == 30
+    assert os.path.getsize(os.path.join(store.path, TEXT_FILE)) == sum(
+        len(a["cleaned_text"].encode("utf-8")) for a in articles[30:]) < text_before
+    assert len(store.bm25.doclen) == len(chunks)
+
+    # Dense and BM25 hits still resolve to the right articles under the new row numbers
+    for article in articles[28:34]:
+        rows, _ = store.search_rows(embeddings.embed_query(article["cleaned_text"]), k=3, nprobe=64)
+        urls = {store.get_document(row).metadata["url"] for row in rows}
+        assert (article["url"] in urls) == (article in articles[30:])
+    for article in articles[30:36]:
+        rows, _ = store.keyword_search_rows(article["cleaned_text"][:300], k=1)
+        assert store.get_document(rows[0]).metadata["url"] == article["url"]
+
+    # The manifest follows the renumbered rows: nothing is re-embedded or removed next time
+    embedded = embeddings.stats.texts
+    assert embedder.embed(incremental=True, index_type=index_type) is None
+    write_news(news_dir, "news_2026-10-01.json", articles[30:] + [make_article("https://example.com/new", "New")])
+    summary = embedder.embed(incremental=True, index_type=index_type)
+    assert summary["removed"] == 0 and summary["embedded"] == embeddings.stats.texts - embedded
+    assert summary["vectors"] == len(chunks) + summary["embedded"]
+
+
+def test_search_returns_the_matching_chunk(embedder, news_dir, embeddings):
+    articles = [make_article(f"https://example.com/{i}", f"Article {i}") for i in range(5)]
+    write_news(news_dir, "news_2026-10-01.json", articles)
+    embedder.embed()
+
+    store = VectorStore(embedder.VECTOR_DIR, embeddings)
+    doc = store.similarity_search(articles[3]["cleaned_text"], k=1)[0]
+    assert doc.metadata["url"] == "https://example.com/3"
+    assert doc.metadata["title"] == "Article 3"
+
+
+def _search_urls(store, filters):
+    vector = store.embeddings.embed_query("quarterly results outlook")
+    rows, _ = store.search_rows(vector, 100, filters)
+    return {store.get_document(row).metadata["url"] for row in rows}
+
+
+def test_filters_by_ticker_source_and_date(embedder, news_dir, embeddings):
+    for day in (1, 2, 3):
+        write_news(news_dir, f"news_2026-10-0{day}.json", [
+            make_article(f"https://economictimes.indiatimes.com/{day}", f"Reliance update {day}"),
+            make_article(f"https://www.moneycontrol.com/{day}", f"TCS update {day}"),
+        ])
+    embedder.embed()
+    store = VectorStore(embedder.VECTOR_DIR, embeddings)
+
+    everything = _search_urls(store, None)
+    assert len(everything) == 6
+    assert _search_urls(store, {"tickers": ["RIL"]}) == {f"https://economictimes.indiatimes.com/{day}" for day in (1, 2, 3)}
+    assert _search_urls(store, {"sources": ["moneycontrol.com"]}) == {f"https://www.moneycontrol.com/{day}" for day in (1, 2, 3)}
+    assert _search_urls(store, {"tickers": ["TCS.NS"], "date_from": "2026-10-02", "date_to": "2026-10-02"}) == {
+        "https://www.moneycontrol.com/2"}
+    # Empty filter values filter nothing
+    assert _search_urls(store, {"tickers": [], "date_from": None}) == everything
+
+    rows, _ = store.keyword_search_rows("revenue margin", k=100, filters={"sources": ["economictimes.indiatimes.com"]})
+    urls = {store.get_document(row).metadata["url"] for row in rows}
+    assert urls and all("economictimes" in url for url in urls)
+
+
+def test_changed_ticker_universe_refreshes_records_without_reembedding(embedder, news_dir, embeddings, monkeypatch):
+    write_news(news_dir, "news_2026-10-01.json", [make_article("https://example.com/a", "Quarterly update")])
+    embedder.embed(incremental=True)
+    before = embeddings.stats.texts
+    store = VectorStore(embedder.VECTOR_DIR, embeddings)
+    assert _search_urls(store, {"tickers": ["ITC.NS"]}) == set()
+
+    monkeypatch.setattr(embedder, "detect_tickers", lambda text: ["ITC.NS"])
+    embedder.embed(incremental=True)
+    assert embeddings.stats.texts == before
+    store = VectorStore(embedder.VECTOR_DIR, embeddings)
+    assert _search_urls(store, {"tickers": ["ITC.NS"]}) == {"https://example.com/a"}
+
+
+def test_mapped_article_records_and_attributes_round_trip(embedder, news_dir, embeddings):
+    articles = [make_article(f"https://example.com/{i}", f"Reliance — Jio update {i} ₹") for i in range(4)]
+    write_news(news_dir, "news_2026-10-01.json", articles)
+    embedder.embed()
+    store = VectorStore(embedder.VECTOR_DIR, embeddings)
+
+    records = load_article_records(store.path)
+    assert isinstance(store.articles, ArticleRecords)
+    assert list(store.articles) == records
+    assert store.articles[-1] == records[-1]
+    assert [record["title"] for record in records] == [a["title"] for a in articles]
+
+    columns, values = article_attributes(records)
+    assert store.attributes["date"].tolist() == columns["date"].tolist()
+    assert store.attributes["tickers"].tolist() == columns["tickers"].tolist()
+    assert (store.attributes["sources"], store.attributes["ticker_list"]) == (values["sources"], values["tickers"])
+
+
+def test_stores_in_the_older_layout_are_read_and_then_rewritten(embedder, news_dir, embeddings):
+    write_news(news_dir, "news_2026-10-01.json", [
+        make_article("https://example.com/reliance", "Reliance Jio tariff hike"),
+        make_article("https://example.com/tcs", "TCS wins a large deal"),
+    ])
+    embedder.embed(incremental=True)
+    store_dir = current_store_dir(embedder.VECTOR_DIR)
+    expected = _search_urls(VectorStore(embedder.VECTOR_DIR, embeddings), {"tickers": ["TCS"]})
+
+    # Back to articles.json, no attribute columns and a JSON BM25 vocabulary
+    with open(os.path.join(store_dir, LEGACY_ARTICLES_FILE), "w", encoding="utf-8") as f:
+        json.dump(load_article_records(store_dir), f)
+    terms = [term for term, _ in TermTable(store_dir).items()]
+    with open(os.path.join(store_dir, LEGACY_VOCAB_FILE), "w", encoding="utf-8") as f:
+        json.dump(terms, f)
+    for name in (ARTICLES_FILE, ARTICLE_OFFSETS_FILE, ATTRIBUTES_FILE, ATTRIBUTE_VALUES_FILE) + TERM_FILES:
+        os.remove(os.path.join(store_dir, name))
+
+    store = VectorStore(embedder.VECTOR_DIR, embeddings)
+    assert isinstance(store.articles, list)
+    assert _search_urls(store, {"tickers": ["TCS"]}) == expected
+    assert store.keyword_search_rows("tariff", k=5)[0].size
+
+    # The next incremental embed writes the current layout, even with nothing to embed
+    before = embeddings.stats.texts
+    embedder.embed(incremental=True)
+    assert embeddings.stats.texts == before
+    store = VectorStore(embedder.VECTOR_DIR, embeddings)
+    assert isinstance(store.articles, ArticleRecords)
+    assert isinstance(store.bm25.vocab, TermTable)
+    assert _search_urls(store, {"tickers": ["TCS"]}) == expected
@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+
+import pytest
+
+from backend.retriever.embeddings import BatchedEmbeddings, HashingEmbeddings
+from backend.retriever.vector_store import (
+    MANIFEST_FILE, STORE_INFO_FILE, TEXT_FILE, EmbeddingModelMismatch, VectorStore, current_store_dir, list_versions
+)
+from backend.retriever.versioned_store import VersionedStore
+
+from tests.conftest import make_article, write_news
+
+
+def add_news(embedder, news_dir, day, n=3):
+    articles = [make_article(f"https://example.com/{day}/{i}", f"Article {day}-{i}") for i in range(n)]
+    write_news(news_dir, f"news_2026-10-{day:02d}.json", articles)
+    embedder.embed(incremental=True)
+    return articles
+
+
+def test_each_save_publishes_a_new_version_and_prunes_old_ones(embedder, news_dir):
+    add_news(embedder, news_dir, 1)
+    assert list_versions(embedder.VECTOR_DIR) == ["v000001"]
+    for day in (2, 3, 4):
+        add_news(embedder, news_dir, day)
+    assert list_versions(embedder.VECTOR_DIR) == ["v000002", "v000003", "v000004"]
+    assert current_store_dir(embedder.VECTOR_DIR).endswith("v000004")
+
+    store_dir = current_store_dir(embedder.VECTOR_DIR)
+    with open(os.path.join(store_dir, STORE_INFO_FILE), encoding="utf-8") as f:
+        info = json.load(f)
+    with open(os.path.join(store_dir, MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert info["model"] == manifest["model"]
+    assert not any(isinstance(value, dict) for value in info.values())
+    assert len(VectorStore(embedder.VECTOR_DIR).articles) == 12
+
+
+def test_published_text_is_not_appended_to(embedder, news_dir):
+    add_news(embedder, news_dir, 1)
+    old_text = os.path.join(current_store_dir(embedder.VECTOR_DIR), TEXT_FILE)
+    with open(old_text, "rb") as f:
+        published = f.read()
+    add_news(embedder, news_dir, 2)
+    new_text = os.path.join(current_store_dir(embedder.VECTOR_DIR), TEXT_FILE)
+    assert os.stat(new_text).st_ino != os.stat(old_text).st_ino
+    assert os.path.getsize(new_text) > len(published)
+    with open(old_text, "rb") as f:
+        assert f.read() == published
+
+
+def test_swap_keeps_leased_searches_on_their_version(embedder, embeddings, news_dir):
+    first = add_news(embedder, news_dir, 1)
+    served = VersionedStore(embedder.VECTOR_DIR, embeddings, poll_seconds=0, drain_seconds=10)
+    assert not served.refresh()
+
+    with served.acquire() as old:
+        add_news(embedder, news_dir, 2)
+        swap = threading.Thread(target=served.refresh)
+        swap.start()
+        swap.join(0.5)
+        # Swapped in for new searches, but the old version stays open until the lease is returned
+        assert served.version == "v000002" and served.swaps == 1
+        assert swap.is_alive()
+        assert old.version == "v000001"
+        assert old.similarity_search(first[0]["cleaned_text"], k=1)[0].metadata["url"] == first[0]["url"]
+    swap.join(5)
+    assert not swap.is_alive()
+    assert old.chunks is None  # closed once drained
+    with served.acquire() as new:
+        assert len(new.articles) == 6
+
+
+def test_version_of_another_model_is_rejected_and_not_retried(embedder, embeddings, news_dir, monkeypatch):
+    add_news(embedder, news_dir, 1)
+    served = VersionedStore(embedder.VECTOR_DIR, embeddings, poll_seconds=0)
+
+    other = BatchedEmbeddings(HashingEmbeddings(dim=384))
+    monkeypatch.setattr(embedder, "get_embeddings", lambda backend=None: other)
+    add_news(embedder, news_dir, 2)
+    with pytest.raises(EmbeddingModelMismatch):
+        served.refresh()
+    assert served.rejected == "v000002"
+    assert served.version == "v000001"
+    assert not served.refresh()